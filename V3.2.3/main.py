@@ -35,10 +35,14 @@ voices = engine.getProperty('voices')
 engine.setProperty('voice', voices[0].id)  # Set to a male voice (0) or female voice (1)
 engine.setProperty('rate', 150)  # Speed of speech
 
+# Surveillance alerts are spoken from their own thread; pyttsx3 runs one utterance at a time
+speech_lock = threading.Lock()
+
 def speak(text: str):
     """Speak the given text using text-to-speech."""
-    engine.say(text)
-    engine.runAndWait()
+    with speech_lock:
+        engine.say(text)
+        engine.runAndWait()
 
 from bs4 import BeautifulSoup
 from gtts import gTTS
@@ -46,7 +50,7 @@ from dateutil import parser
 from dateutil.relativedelta import relativedelta
 
 # importing surveillance system:
-from surv_sys import MultiSurveillanceSystem
+from surv_sys import MultiSurveillanceSystem, MODEL_REGISTRY, DEFAULT_MODEL_PATH, MICROPHONE_SERVICE, WebcamCapture
 
 # random sentences approach 1:
 #RANDOM_SEN = []
@@ -1177,8 +1181,9 @@ surveillance_system = None
 object_recognition_mode = False
 yolo_model = None
 cap = None
+vision_subscription = None
+vision_detections = []  # Detections for the frame vision mode last showed
 detection_thread = None
-detection_queue = Queue()
 stop_event = threading.Event()
 
 def run_surveillance():
@@ -1197,36 +1202,50 @@ def start_surveillance_thread():
 
 def detection_loop():
     """Run continuous object detection and display in a window"""
-    global yolo_model, cap, detection_queue, stop_event
+    global yolo_model, cap, vision_subscription, vision_detections, stop_event
     while not stop_event.is_set():
-        if cap is None or not cap.isOpened():
-            break
-        ret, frame = cap.read()
-        if not ret:
-            continue
-        
-        # Perform object detection
-        results = yolo_model(frame)
-        detected_objects = []
-        for r in results:
-            boxes = r.boxes
-            for box in boxes:
-                cls = int(box.cls[0])
-                label = yolo_model.names[cls]
-                conf = float(box.conf)
-                if conf > 0.5:  # Confidence threshold
-                    detected_objects.append(label)
-                    # Draw bounding box and label
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
-                    cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                    cv2.putText(frame, f"{label} {conf:.2f}", (x1, y1 - 10),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-        
-        # Update detection queue
-        detection_queue.put(detected_objects)
+        if vision_subscription is not None:
+            # Share the surveillance camera frames, so the engine can reuse its result
+            packet = vision_subscription.get(timeout=0.5)
+            if packet is None:
+                if vision_subscription.frame_bus.closed:
+                    break
+                continue
+            # Pooled frames must not be recycled while the model reads them
+            if not packet.retain():
+                continue
+            try:
+                frame = packet.frame.copy()
+                if packet.inference is not None:
+                    # Same letterboxed frame the surveillance detectors use, mapped back for drawing
+                    detections = packet.transform.to_display([dict(d) for d in yolo_model.infer(packet.inference)])
+                else:
+                    detections = yolo_model.infer(packet.frame)
+            finally:
+                packet.release()
+        else:
+            if cap is None or not cap.isOpened():
+                break
+            ret, frame = cap.read()
+            if not ret:
+                continue
+            detections = yolo_model.infer(frame)
+            frame = frame.copy()
+        # The engine's newest result may belong to another camera or an ROI pass; keep this frame's
+        vision_detections = detections
+        
+        # Draw the shared detections
+        for detection in detections:
+            if detection["confidence"] > 0.5:  # Confidence threshold
+                label = detection["class"]
+                conf = detection["confidence"]
+                x, y, w, h = detection["box"]
+                cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+                cv2.putText(frame, f"{label} {conf:.2f}", (x, y - 10),
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
         
         # Display frame
-        cv2.imshow("YOLOv8 Object Detection", frame)
+        cv2.imshow("Object Detection", frame)
         if cv2.waitKey(1) & 0xFF == ord('q'):  # Allow manual window close
             stop_event.set()
         
@@ -1237,14 +1256,20 @@ def detection_loop():
     cleanup_object_recognition()
 
 def init_object_recognition():
-    """Initialize YOLOv8 model, webcam, and detection window"""
-    global yolo_model, cap, detection_thread, object_recognition_mode, stop_event
+    """Initialize the shared YOLO engine, a frame source, and the detection window"""
+    global yolo_model, cap, vision_subscription, detection_thread, object_recognition_mode, stop_event
     try:
-        yolo_model = YOLO("yolov8n.pt")  # Load YOLOv8 nano model
-        cap = cv2.VideoCapture(0)  # Open default webcam
-        if not cap.isOpened():
-            speak("Error: Could not access webcam.")
-            return False
+        # Same weights as surveillance, so the model is only loaded once
+        yolo_model = MODEL_REGISTRY.get(DEFAULT_MODEL_PATH, confidence=0.5)
+        if surveillance_system and surveillance_system.capture_worker is not None:
+            # The surveillance system already owns the webcam
+            vision_subscription = surveillance_system.frame_bus.subscribe("vision")
+        else:
+            # Opened through the capture backends, so it never races another camera's open
+            cap = WebcamCapture(0)  # Open default webcam
+            if not cap.open():
+                speak("Error: Could not access webcam.")
+                return False
         stop_event.clear()  # Reset stop event
         object_recognition_mode = True
         # Start detection thread
@@ -1256,16 +1281,13 @@ def init_object_recognition():
         return False
 
 def describe_objects():
-    """Describe objects from the latest detection"""
-    global object_recognition_mode, detection_queue
+    """Describe objects in the frame vision mode last showed"""
+    global object_recognition_mode, vision_detections
     if not object_recognition_mode:
         return "Object recognition mode is not active."
     
     try:
-        # Get latest detected objects from queue
-        if detection_queue.empty():
-            return "I don't see any objects right now."
-        detected_objects = detection_queue.get()
+        detected_objects = [d["class"] for d in vision_detections if d["confidence"] > 0.5]
         
         if not detected_objects:
             return "I don't see any objects right now."
@@ -1283,14 +1305,16 @@ def describe_objects():
 
 def cleanup_object_recognition():
     """Release webcam, stop detection thread, and close window"""
-    global cap, detection_thread, object_recognition_mode, stop_event
+    global cap, vision_subscription, vision_detections, detection_thread, object_recognition_mode, stop_event
     stop_event.set()  # Signal detection thread to stop
-    if detection_thread is not None:
+    if detection_thread is not None and detection_thread is not threading.current_thread():
         detection_thread.join()
-        detection_thread = None
+    detection_thread = None
     if cap is not None:
         cap.release()
         cap = None
+    vision_subscription = None
+    vision_detections = []
     object_recognition_mode = False
     cv2.destroyAllWindows()
 
@@ -1353,9 +1377,29 @@ def virtual_assistant():
     print(text)"""
 
 # Function to listen to voice input
+class SharedMicrophone(sr.AudioSource):
+    """speech_recognition source backed by the shared microphone service, so the device is opened only once"""
+    def __init__(self, name="voice", service=MICROPHONE_SERVICE):
+        self.service = service
+        self.name = name
+        self.format = pyaudio.paInt16
+        self.SAMPLE_WIDTH = service.sample_width
+        self.SAMPLE_RATE = service.rate
+        self.CHUNK = service.chunk
+        self.stream = None
+
+    def __enter__(self):
+        # A fresh subscription starts at "now", so audio from before the call is never replayed
+        self.stream = self.service.subscribe(self.name)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stream.close()
+        self.stream = None
+
 def listen():
     recognizer = sr.Recognizer()
-    with sr.Microphone() as source:
+    with SharedMicrophone() as source:
         print("Listening...")
         recognizer.adjust_for_ambient_noise(source, duration=1)
         audio = recognizer.listen(source)
@@ -2066,8 +2110,8 @@ def process_command(command):
     # recording the footage:
     elif "start recording" in command:
         if not surveillance_system.is_recording:
-            ret, frame = surveillance_system.cap.read()
-            if ret:
+            frame = surveillance_system.get_latest_frame()
+            if frame is not None:
                 surveillance_system.start_recording(frame)
                 speak("Started recording video.")
             else:
@@ -2082,16 +2126,22 @@ def process_command(command):
         else:
             speak("No recording is in progress.")
 
+    elif "recording storage" in command:
+        report = surveillance_system.segments.get_storage_report()
+        used_gb = report['bytes'] / 1024 ** 3
+        if report['budget_bytes']:
+            speak(f"Recordings use {used_gb:.1f} of {report['budget_bytes'] / 1024 ** 3:.0f} gigabytes "
+                  f"in {report['segments']} segments.")
+        else:
+            speak(f"Recordings use {used_gb:.1f} gigabytes in {report['segments']} segments.")
+        speak(f"{report['disk_free_bytes'] / 1024 ** 3:.0f} gigabytes of disk space are free.")
+
     # taking screenshots:
     elif "take screenshot" in command:
         if surveillance_system.cap and surveillance_system.cap.isOpened():
-            ret, frame = surveillance_system.cap.read()
-            if ret:
-                frame = cv2.resize(frame, (1100, 600))
-                annotated_frames = {method: surveillance_system.current_detections.get(method, ([], frame))[1]
-                                for method in surveillance_system.active_methods}
-                display_frame = surveillance_system.combine_detections(frame, annotated_frames)
-                display_frame = surveillance_system.add_status_overlay(display_frame)
+            frame = surveillance_system.get_latest_frame()
+            if frame is not None:
+                display_frame = surveillance_system.render_frame(frame)
                 surveillance_system.save_screenshot(display_frame)
                 speak("Screenshot saved.")
             else:
@@ -2104,7 +2154,7 @@ def process_command(command):
         if surveillance_system.cap and surveillance_system.cap.isOpened():
             detection_summary = []
             for method_name in surveillance_system.active_methods:
-                detections, _ = surveillance_system.current_detections.get(method_name, ([], None))
+                detections = surveillance_system.current_detections.get(method_name, [])
                 if detections:
                     status_text = surveillance_system.detection_methods[method_name].get_status_text(detections)
                     detection_summary.append(status_text)
@@ -2112,6 +2162,15 @@ def process_command(command):
                 speak("Current detections: " + ", ".join(detection_summary))
             else:
                 speak("No detections at the moment.")
+
+            # History from the event store: today's events, then the last week's
+            midnight = datetime.datetime.combine(datetime.date.today(), datetime.time()).timestamp()
+            today = surveillance_system.event_store.count_by_class(start=midnight)
+            week = surveillance_system.event_store.count_by_class(start=time.time() - 7 * 86400)
+            if today:
+                speak("Today: " + ", ".join(f"{count} {name} events" for name, count in today.items()))
+            if week:
+                speak("In the last seven days: " + ", ".join(f"{count} {name} events" for name, count in week.items()))
         else:
             speak("Surveillance system is not running.")
 
@@ -0,0 +1,279 @@
+# Benchmark harness for the surveillance pipeline
+# replays recorded video files headless and writes machine-readable results
+import cv2
+import numpy as np
+import time
+import os
+import sys
+import json
+import platform
+import argparse
+import itertools
+from datetime import datetime
+import psutil
+
+from surv_sys import (MotionDetection, YOLODetection, PersonDetection, FaceDetection, NoiseDetection,
+                      ResolutionPipeline, FramePacket, StatusOverlayCompositor, LatencyStats,
+                      DEFAULT_MODEL_PATH)
+
+# Same constructors the surveillance system uses
+METHOD_FACTORIES = {
+    "motion": lambda: MotionDetection(threshold=1000),
+    "yolo": lambda: YOLODetection(model_path=DEFAULT_MODEL_PATH, confidence=0.5),
+    "person": lambda: PersonDetection(model_path=DEFAULT_MODEL_PATH, confidence=0.5),
+    "face": lambda: FaceDetection(),
+    "face_fast": lambda: FaceDetection(fast=True),  # Opt-in downscaled, cached face mode
+    "noise": lambda: NoiseDetection(threshold=0.1),
+}
+
+# Video files carry no microphone audio, so noise is only benchmarked when asked for
+DEFAULT_METHODS = ["motion", "yolo", "person", "face"]
+
+# Building the per-run stage timer:
+class StageTimer:
+    """Latency samples per pipeline stage, kept for the whole run"""
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, stage, seconds):
+        """Record one sample for a stage"""
+        if stage not in self.stages:
+            self.stages[stage] = LatencyStats(window=1000000)
+        self.stages[stage].add(seconds)
+
+    def summary(self):
+        """Get the latency summary of every stage"""
+        return {stage: stats.summary() for stage, stats in self.stages.items()}
+
+def build_configurations(methods, combos=None, alone=True, together=True):
+    """
+    List the method combinations to benchmark
+
+    Args:
+        methods: Method names to benchmark
+        combos: Extra combinations, each a list of method names
+        alone: Include every method on its own
+        together: Include all methods at once
+
+    Returns:
+        configurations: List of method name lists without duplicates
+    """
+    configurations = []
+    if alone:
+        configurations += [[method] for method in methods]
+    if together and len(methods) > 1:
+        configurations.append(list(methods))
+    configurations += [list(combo) for combo in (combos or [])]
+
+    unique = []
+    for configuration in configurations:
+        if configuration not in unique:
+            unique.append(configuration)
+    return unique
+
+def benchmark_video(video_path, method_names, display_size=(1100, 600), inference_size=640,
+                    max_frames=None, jpeg_quality=80, warmup_frames=5):
+    """
+    Replay one video through a set of detection methods, one frame at a time
+
+    Stages are timed synchronously, so the numbers are per-frame costs rather
+    than the overlapped throughput of the threaded system.
+
+    Returns:
+        result: Dict with frames, fps, cpu, rss and per-stage latency
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Unable to open video {video_path}")
+
+    # Fresh instances, so stateful methods (motion background, tracks) start clean
+    methods = {name: METHOD_FACTORIES[name]() for name in method_names}
+    pipeline = ResolutionPipeline(display_size, inference_size)
+    compositor = StatusOverlayCompositor()
+    timer = StageTimer()
+    process = psutil.Process()
+    rss_peak = process.memory_info().rss
+
+    frames = 0
+    seq = 0
+    cpu_start = None
+    wall_start = None
+    try:
+        while max_frames is None or frames < max_frames:
+            # Model loading and first-call setup are not part of the steady state
+            if seq == warmup_frames:
+                cpu_times = process.cpu_times()
+                cpu_start = cpu_times.user + cpu_times.system
+                wall_start = time.perf_counter()
+                timer = StageTimer()
+            measuring = seq >= warmup_frames
+
+            stage_start = time.perf_counter()
+            ret, frame = cap.read()
+            if not ret:
+                break
+            capture_time = time.perf_counter() - stage_start
+
+            stage_start = time.perf_counter()
+            display, inference, transform = pipeline.process(frame)
+            resize_time = time.perf_counter() - stage_start
+            packet = FramePacket(seq, display, camera_id=1, inference=inference, transform=transform)
+            seq += 1
+
+            detections = {}
+            detector_times = {}
+            for name, method in methods.items():
+                stage_start = time.perf_counter()
+                detections[name] = method.detect_packet(packet)
+                detector_times[name] = time.perf_counter() - stage_start
+
+            # Combine: every method's overlays onto one copy, as render_detections does
+            stage_start = time.perf_counter()
+            rendered = display.copy()
+            for name, method in methods.items():
+                if detections[name]:
+                    method.draw(rendered, detections[name])
+            combine_time = time.perf_counter() - stage_start
+
+            stage_start = time.perf_counter()
+            statuses = [(method.get_status_text(detections[name]), method.color)
+                        for name, method in methods.items()]
+            compositor.compose(rendered, statuses)
+            overlay_time = time.perf_counter() - stage_start
+
+            stage_start = time.perf_counter()
+            cv2.imencode('.jpg', rendered, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+            encode_time = time.perf_counter() - stage_start
+
+            if not measuring:
+                continue
+            frames += 1
+            timer.add('capture', capture_time)
+            timer.add('resize', resize_time)
+            for name, seconds in detector_times.items():
+                timer.add(f'detect_{name}', seconds)
+            timer.add('combine', combine_time)
+            timer.add('overlay', overlay_time)
+            timer.add('encode', encode_time)
+            timer.add('frame', capture_time + resize_time + sum(detector_times.values()) +
+                      combine_time + overlay_time + encode_time)
+            rss_peak = max(rss_peak, process.memory_info().rss)
+    finally:
+        cap.release()
+        for method in methods.values():
+            if isinstance(method, NoiseDetection):
+                method.stop_audio = True
+
+    wall_time = time.perf_counter() - wall_start if wall_start is not None else 0.0
+    cpu_time = 0.0
+    if cpu_start is not None:
+        cpu_times = process.cpu_times()
+        cpu_time = cpu_times.user + cpu_times.system - cpu_start
+
+    return {
+        'video': os.path.basename(video_path),
+        'methods': list(method_names),
+        'frames': frames,
+        'wall_seconds': wall_time,
+        'fps': frames / wall_time if wall_time > 0 else 0.0,
+        'cpu_percent': 100.0 * cpu_time / wall_time if wall_time > 0 else 0.0,
+        'rss_peak_mb': rss_peak / (1024 * 1024),
+        'stages': timer.summary(),
+    }
+
+def compare_results(current, baseline):
+    """Print the FPS change of every run that is present in both result sets"""
+    baseline_runs = {(run['video'], tuple(run['methods'])): run for run in baseline.get('results', [])}
+    print(f"\nCompared with {baseline.get('label') or baseline.get('timestamp')}:")
+    for run in current['results']:
+        previous = baseline_runs.get((run['video'], tuple(run['methods'])))
+        if previous is None or not previous['fps']:
+            continue
+        change = (run['fps'] - previous['fps']) / previous['fps'] * 100.0
+        print(f"  {run['video']:<24} {'+'.join(run['methods']):<28} "
+              f"{previous['fps']:7.1f} -> {run['fps']:7.1f} FPS ({change:+.1f}%)")
+
+def print_result(result):
+    """Print one run as a short table"""
+    print(f"\n{result['video']} [{' + '.join(result['methods'])}]: {result['frames']} frames, "
+          f"{result['fps']:.1f} FPS, CPU {result['cpu_percent']:.0f}%, RSS {result['rss_peak_mb']:.0f} MB")
+    for stage, stats in result['stages'].items():
+        print(f"  {stage:<16} mean {stats['mean_ms']:8.2f} ms  p50 {stats['p50_ms']:8.2f}  "
+              f"p90 {stats['p90_ms']:8.2f}  p99 {stats['p99_ms']:8.2f}")
+
+def parse_size(value):
+    """Parse WIDTHxHEIGHT, or 'native' for None"""
+    if value == "native":
+        return None
+    return tuple(int(v) for v in value.lower().split('x'))
+
+def main():
+    """Run the benchmark suite from the command line"""
+    parser = argparse.ArgumentParser(description="Replay video files through the surveillance detectors")
+    parser.add_argument('videos', nargs='+', help='Video files to replay')
+    parser.add_argument('--methods', default=",".join(DEFAULT_METHODS),
+                        help=f'Comma separated methods out of {", ".join(METHOD_FACTORIES)}')
+    parser.add_argument('--combo', action='append', default=None,
+                        help='Extra comma separated combination to run (repeatable)')
+    parser.add_argument('--pairs', action='store_true', help='Also run every pair of methods')
+    parser.add_argument('--max-frames', type=int, default=None, help='Frames to measure per run')
+    parser.add_argument('--warmup-frames', type=int, default=5, help='Frames run before measuring')
+    parser.add_argument('--display-size', default="1100x600", help='WIDTHxHEIGHT or "native"')
+    parser.add_argument('--inference-size', type=int, default=640, help='Letterboxed YOLO input size (0 disables)')
+    parser.add_argument('--label', default=None, help='Release label stored with the results')
+    parser.add_argument('--output', default="benchmark_results.json", help='Where to write the JSON results')
+    parser.add_argument('--compare', default=None, help='Earlier results JSON to compare FPS against')
+    args = parser.parse_args()
+
+    methods = [name.strip() for name in args.methods.split(',') if name.strip()]
+    unknown = [name for name in methods if name not in METHOD_FACTORIES]
+    if unknown:
+        parser.error(f"Unknown methods: {', '.join(unknown)}")
+    combos = [[name.strip() for name in combo.split(',')] for combo in (args.combo or [])]
+    if args.pairs:
+        combos += [list(pair) for pair in itertools.combinations(methods, 2)]
+    configurations = build_configurations(methods, combos)
+
+    results = {
+        'label': args.label,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'platform': {
+            'python': sys.version.split()[0],
+            'opencv': cv2.__version__,
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'system': platform.platform(),
+            'cpu_count': psutil.cpu_count(),
+        },
+        'settings': {
+            'display_size': args.display_size,
+            'inference_size': args.inference_size,
+            'max_frames': args.max_frames,
+            'warmup_frames': args.warmup_frames,
+        },
+        'results': [],
+    }
+
+    for video_path in args.videos:
+        for configuration in configurations:
+            print(f"Benchmarking {video_path} with {' + '.join(configuration)}...")
+            try:
+                result = benchmark_video(video_path, configuration, parse_size(args.display_size),
+                                         args.inference_size, args.max_frames,
+                                         warmup_frames=args.warmup_frames)
+            except Exception as e:
+                print(f"Benchmark failed: {e}")
+                continue
+            print_result(result)
+            results['results'].append(result)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare_results(results, json.load(f))
+
+if __name__ == "__main__":
+    main()
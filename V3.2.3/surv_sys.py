@@ -4,20 +4,31 @@ import cv2
 import numpy as np
 import time
 import os
+import sys
 from datetime import datetime
 from ultralytics import YOLO
 import threading
+import multiprocessing
 import pyaudio
-from queue import Queue
+from queue import Queue, Full, Empty
+from multiprocessing import shared_memory
+from collections import deque
 import smtplib
 import ssl
 from email.mime.text import MIMEText
 from email.mime.image import MIMEImage
 from email.mime.multipart import MIMEMultipart
 import json
+import sqlite3
 import asyncio
 import websockets
 import base64
+import struct
+import signal
+import socketserver
+import http.server
+import shutil
+import argparse
 import plyer  # For desktop notifications
 
 # building the class for detection methods
@@ -38,9 +49,28 @@ class DetectionMethod:
             
         Returns:
             detections: List of detection results
-            annotated_frame: Frame with annotations
         """
         raise NotImplementedError("Subclasses must implement detect()")
+
+    def detect_packet(self, packet, rois=None):
+        """Detect on a frame bus packet; methods that can use its inference frame override this"""
+        if rois:
+            return self.detect(packet.frame, rois=rois)
+        return self.detect(packet.frame)
+
+    def draw(self, frame, detections):
+        """
+        Draw the overlays for a set of detections
+
+        Only called when a display or stream actually needs pixels.
+
+        Args:
+            frame: Frame to draw on in place
+            detections: Detections previously returned by detect()
+        """
+        for detection in detections:
+            x, y, w, h = detection["box"]
+            self.draw_fancy_box(frame, x, y, w, h, self.name)
     
     def get_status_text(self, detections):
         """Get status text for display"""
@@ -101,77 +131,333 @@ class DetectionMethod:
 
 # building for motion detection method:
 class MotionDetection(DetectionMethod):
-    """Motion detection using background subtraction"""
-    def __init__(self, threshold=1000, color=(0, 255, 0)):
+    """Motion detection using background subtraction on a downscaled grayscale frame"""
+    def __init__(self, threshold=1000, color=(0, 255, 0), max_width=320, merge_distance=24,
+                 max_regions=8, max_contours=64):
         super().__init__("Motion", color, icon="🔄")
-        self.threshold = threshold
+        self.threshold = threshold  # Minimum contour area in full-frame pixels
+        self.max_width = max_width  # MOG2 runs at this width at most, whatever the capture size
+        self.merge_distance = merge_distance  # Contours closer than this (full-frame pixels) become one region
+        self.max_regions = max_regions  # Cap on reported regions, so downstream cost stays bounded
+        self.max_contours = max_contours  # Largest contours kept before merging in busy scenes
+        self.scale = None  # Full-frame pixels per downscaled pixel
+        self.kernel = np.ones((3, 3), np.uint8)
         self.background_subtractor = cv2.createBackgroundSubtractorMOG2(
             history=500, varThreshold=16, detectShadows=True
         )
-    
+
+    def _prepare(self, frame):
+        """Convert to grayscale and shrink to at most max_width"""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        height, width = gray.shape
+        if width <= self.max_width:
+            self.scale = 1.0
+            return gray
+        self.scale = width / self.max_width
+        return cv2.resize(gray, (self.max_width, max(1, int(round(height / self.scale)))),
+                          interpolation=cv2.INTER_AREA)
+
     def detect(self, frame):
-        # Apply background subtraction
-        fg_mask = self.background_subtractor.apply(frame)
-        
-        # Threshold the mask and apply morphological operations
+        small = self._prepare(frame)
+
+        # Apply background subtraction; shadows (127) fall below the threshold
+        fg_mask = self.background_subtractor.apply(small)
         _, thresh = cv2.threshold(fg_mask, 127, 255, cv2.THRESH_BINARY)
-        kernel = np.ones((5, 5), np.uint8)
-        thresh = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel)
-        thresh = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
-        
-        # Find contours
+        thresh = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, self.kernel)
+        thresh = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, self.kernel)
+
         contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
+
+        # Areas are compared at the downscaled size
+        min_area = self.threshold / (self.scale * self.scale)
+        areas = [(cv2.contourArea(contour), contour) for contour in contours]
+        areas = [item for item in areas if item[0] >= min_area]
+        if not areas:
+            return []
+        if len(areas) > self.max_contours:
+            # Rain and foliage make hundreds of blobs; the largest ones carry the motion
+            areas = sorted(areas, key=lambda item: item[0], reverse=True)[:self.max_contours]
+
+        boxes = []
+        for _, contour in areas:
+            x, y, w, h = cv2.boundingRect(contour)
+            boxes.append([int(x * self.scale), int(y * self.scale),
+                          int(np.ceil(w * self.scale)), int(np.ceil(h * self.scale))])
+
+        # Nearby contours grow into each other by half the merge distance, then the
+        # merged regions are shrunk back to the boxes they contain
+        regions = merge_boxes(boxes, frame.shape, padding=self.merge_distance // 2,
+                              max_regions=self.max_regions)
         detections = []
-        annotated_frame = frame.copy()
-        
-        # Draw rectangles around motion areas
-        for contour in contours:
-            if cv2.contourArea(contour) < self.threshold:
+        for rx, ry, rw, rh in regions:
+            members = [box for box in boxes
+                       if rx <= box[0] + box[2] // 2 <= rx + rw and ry <= box[1] + box[3] // 2 <= ry + rh]
+            if not members:
                 continue
-                
-            (x, y, w, h) = cv2.boundingRect(contour)
+            x1 = min(box[0] for box in members)
+            y1 = min(box[1] for box in members)
+            x2 = max(box[0] + box[2] for box in members)
+            y2 = max(box[1] + box[3] for box in members)
             detections.append({
                 "class": "motion",
                 "confidence": 1.0,
-                "box": [x, y, w, h]
+                "box": [x1, y1, x2 - x1, y2 - y1]
             })
-            
-            # Draw fancy motion box with pulsing effect
-            # Use time to create a pulsing effect on the line thickness
-            pulse = 1 + int(abs(np.sin(time.time() * 3)) * 2)
-            
+
+        return detections
+
+    def draw(self, frame, detections):
+        annotated_frame = frame
+        # Use time to create a pulsing effect on the line thickness
+        pulse = 1 + int(abs(np.sin(time.time() * 3)) * 2)
+
+        # Radar-like concentric circles, collected so they are blended in a single pass
+        circles = []
+        for detection in detections:
+            x, y, w, h = detection["box"]
+
             # Draw the fancy box
             self.draw_fancy_box(annotated_frame, x, y, w, h, "Motion", pulse)
-            
+
             # Add motion flow visualization (simplified)
-            center_x, center_y = x + w//2, y + h//2
             radius = min(w, h) // 4
-            thickness = 1
-            
-            # Draw radar-like concentric circles
-            for r in range(radius, radius*3, radius):
-                alpha = int(255 * (1 - r/(radius*3)))
-                if alpha > 0:
-                    overlay = annotated_frame.copy()
-                    cv2.circle(overlay, (center_x, center_y), r, 
-                              (*self.color, alpha), thickness)
-                    cv2.addWeighted(overlay, 0.5, annotated_frame, 0.5, 0, annotated_frame)
-        
-        return detections, annotated_frame
+            if radius > 0:
+                circles.append((x + w // 2, y + h // 2, radius))
+
+        if not circles:
+            return
+
+        # Blend only the area the circles cover; pixels the circles miss are left unchanged
+        height, width = annotated_frame.shape[:2]
+        x1 = max(0, min(cx - 2 * r - 1 for cx, cy, r in circles))
+        y1 = max(0, min(cy - 2 * r - 1 for cx, cy, r in circles))
+        x2 = min(width, max(cx + 2 * r + 2 for cx, cy, r in circles))
+        y2 = min(height, max(cy + 2 * r + 2 for cx, cy, r in circles))
+        if x2 <= x1 or y2 <= y1:
+            return
+        region = annotated_frame[y1:y2, x1:x2]
+        overlay = region.copy()
+        for cx, cy, radius in circles:
+            for r in (radius, radius * 2):
+                cv2.circle(overlay, (cx - x1, cy - y1), r, self.color, 1)
+        cv2.addWeighted(overlay, 0.5, region, 0.5, 0, region)
     
     def get_status_text(self, detections):
         return f"Motion: {'Detected' if detections else 'None'}"
 
+# Region helpers for cropped inference:
+def _merge_overlapping(regions):
+    """Merge [x1, y1, x2, y2] regions until none overlap"""
+    merged = True
+    while merged:
+        merged = False
+        result = []
+        for region in regions:
+            for other in result:
+                if region[0] <= other[2] and other[0] <= region[2] and region[1] <= other[3] and other[1] <= region[3]:
+                    other[0], other[1] = min(other[0], region[0]), min(other[1], region[1])
+                    other[2], other[3] = max(other[2], region[2]), max(other[3], region[3])
+                    merged = True
+                    break
+            else:
+                result.append(region)
+        regions = result
+    return regions
+
+def merge_boxes(boxes, frame_shape, padding=0, min_size=0, max_regions=None):
+    """
+    Pad, clip and merge [x, y, w, h] boxes into non-overlapping regions
+
+    Args:
+        boxes: Iterable of [x, y, w, h] boxes
+        frame_shape: Shape of the frame the boxes belong to
+        padding: Pixels added on every side of each box
+        min_size: Minimum region width/height, grown around the box centre
+        max_regions: Merge the closest regions until at most this many remain
+
+    Returns:
+        regions: List of [x, y, w, h] regions inside the frame
+    """
+    height, width = frame_shape[:2]
+    regions = []
+    for x, y, w, h in boxes:
+        grow_x = max(padding, (min_size - w + 1) // 2)
+        grow_y = max(padding, (min_size - h + 1) // 2)
+        regions.append([max(0, x - grow_x), max(0, y - grow_y),
+                        min(width, x + w + grow_x), min(height, y + h + grow_y)])
+
+    regions = _merge_overlapping(regions)
+
+    # Merge the pair whose union grows the least until the cap is met
+    while max_regions and len(regions) > max(1, max_regions):
+        boxes_array = np.array(regions, dtype=np.int64)
+        x1 = np.minimum.outer(boxes_array[:, 0], boxes_array[:, 0])
+        y1 = np.minimum.outer(boxes_array[:, 1], boxes_array[:, 1])
+        x2 = np.maximum.outer(boxes_array[:, 2], boxes_array[:, 2])
+        y2 = np.maximum.outer(boxes_array[:, 3], boxes_array[:, 3])
+        areas = (boxes_array[:, 2] - boxes_array[:, 0]) * (boxes_array[:, 3] - boxes_array[:, 1])
+        growth = (x2 - x1) * (y2 - y1) - areas[:, None] - areas[None, :]
+        np.fill_diagonal(growth, np.iinfo(np.int64).max)
+        i, j = np.unravel_index(np.argmin(growth), growth.shape)
+        regions[i] = [int(x1[i, j]), int(y1[i, j]), int(x2[i, j]), int(y2[i, j])]
+        del regions[j]
+        regions = _merge_overlapping(regions)
+
+    return [[x1, y1, x2 - x1, y2 - y1] for x1, y1, x2, y2 in regions]
+
+# Weights shared by object detection, person detection and the assistant's vision mode
+DEFAULT_MODEL_PATH = "yolov10n.pt"
+
+# Shared YOLO inference engine:
+class YOLOInferenceEngine:
+    """Single loaded YOLO model that runs at most one forward pass per frame for all its users"""
+    def __init__(self, model_path=DEFAULT_MODEL_PATH, confidence=0.5, cache_size=4):
+        self.model_path = model_path
+        self.confidence = confidence
+        self.model = YOLO(model_path)
+        self.names = self.model.names
+        self.inferences = 0
+        self.cache_hits = 0
+        # Recent (frame, regions, detections) entries; frames are matched by identity,
+        # and holding the reference keeps the id from being reused while cached
+        self._cache = deque(maxlen=cache_size)
+        self._lock = threading.Lock()
+
+    def _lookup(self, frame, regions=None):
+        """Find a cached result for a frame (and region set); call with the lock held"""
+        for cached_frame, cached_regions, detections in self._cache:
+            if cached_frame is frame and cached_regions == regions:
+                self.cache_hits += 1
+                return detections
+        return None
+
+    def infer(self, frame):
+        """
+        Get the parsed detections for a frame
+
+        Callers that pass the same frame object share one forward pass. The
+        lock also serialises access to the model, which is not thread-safe.
+
+        Returns:
+            detections: List of dicts with class, confidence, box and class_id
+        """
+        with self._lock:
+            detections = self._lookup(frame)
+            if detections is not None:
+                return detections
+
+            results = self.model(frame, conf=self.confidence)
+            detections = self._parse(results[0]) if results else []
+            self._cache.append((frame, None, detections))
+            self.inferences += 1
+            return detections
+
+    def infer_regions(self, frame, regions):
+        """
+        Get the parsed detections for a set of regions of a frame
+
+        Each [x, y, w, h] region is cropped and all crops run as one batch, so
+        small objects are seen at a higher effective resolution. Boxes are
+        mapped back to full-frame coordinates.
+
+        Returns:
+            detections: List of detection dicts in frame coordinates
+        """
+        key = tuple(tuple(region) for region in regions)
+        with self._lock:
+            detections = self._lookup(frame, key)
+            if detections is not None:
+                return detections
+
+            crops = [frame[y:y + h, x:x + w] for x, y, w, h in regions]
+            results = self.model(crops, conf=self.confidence)
+            detections = []
+            for (rx, ry, _, _), result in zip(regions, results):
+                for detection in self._parse(result):
+                    detection["box"][0] += rx
+                    detection["box"][1] += ry
+                    detections.append(detection)
+            self._cache.append((frame, key, detections))
+            self.inferences += 1
+            return detections
+
+    def infer_batch(self, frames):
+        """
+        Get the parsed detections for several frames with one batched forward pass
+
+        Frames already in the cache are not run again.
+
+        Returns:
+            detections: One list of detection dicts per input frame, in order
+        """
+        with self._lock:
+            # Keep the whole batch cached so per-frame infer() calls still hit
+            if len(frames) > self._cache.maxlen:
+                self._cache = deque(self._cache, maxlen=len(frames))
+
+            batch_results = [self._lookup(frame) for frame in frames]
+            misses = [i for i, detections in enumerate(batch_results) if detections is None]
+
+            if misses:
+                results = self.model([frames[i] for i in misses], conf=self.confidence)
+                for i, result in zip(misses, results):
+                    batch_results[i] = self._parse(result)
+                    self._cache.append((frames[i], None, batch_results[i]))
+                self.inferences += 1
+
+            return batch_results
+
+    def _parse(self, result):
+        """Convert an ultralytics result into plain detection dicts"""
+        detections = []
+        for box in result.boxes:
+            # Get box coordinates
+            x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
+            class_id = int(box.cls[0])
+            detections.append({
+                "class": result.names[class_id],
+                "confidence": float(box.conf[0]),
+                "box": [int(x1), int(y1), int(x2 - x1), int(y2 - y1)],
+                "class_id": class_id
+            })
+        return detections
+
+class ModelRegistry:
+    """Loads each weights file once and hands out the shared inference engine"""
+    def __init__(self):
+        self._engines = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_path=DEFAULT_MODEL_PATH, confidence=0.5):
+        """Get the engine for a weights file, loading the model on first use"""
+        key = os.path.normpath(model_path)
+        with self._lock:
+            engine = self._engines.get(key)
+            if engine is None:
+                engine = YOLOInferenceEngine(model_path, confidence)
+                self._engines[key] = engine
+            else:
+                # Run at the lowest threshold any user asked for; users filter upwards
+                engine.confidence = min(engine.confidence, confidence)
+            return engine
+
+    def loaded_models(self):
+        """Get the paths of all loaded weights files"""
+        with self._lock:
+            return list(self._engines.keys())
+
+MODEL_REGISTRY = ModelRegistry()
+
 # YOLO detection method class:
 class YOLODetection(DetectionMethod):
     """Object detection using YOLO models"""
-    def __init__(self, model_path="yolov10n.pt", confidence=0.5, color=(0, 255, 255)):
+    def __init__(self, model_path=DEFAULT_MODEL_PATH, confidence=0.5, color=(0, 255, 255)):
         model_name = os.path.basename(model_path).split('.')[0]
         super().__init__(f"YOLO-{model_name}", color, icon="🔍")
         self.model_path = model_path
         self.confidence = confidence
-        self.object_detector = YOLO(model_path)
+        self.engine = MODEL_REGISTRY.get(model_path, confidence)
+        self.object_detector = self.engine.model
         
         # Color palette for different classes
         self.color_palette = [
@@ -190,115 +476,335 @@ class YOLODetection(DetectionMethod):
         """Get a consistent color for a class ID"""
         return self.color_palette[class_id % len(self.color_palette)]
     
-    def detect(self, frame):
-        # Run YOLO inference on the frame
-        results = self.object_detector(frame, conf=self.confidence)
-        
-        detections = []
-        annotated_frame = frame.copy()
-        
-        # Process the results
-        if results and len(results) > 0:
-            result = results[0]
+    def filter_detections(self, detections):
+        """Select (and copy) this method's detections from a shared engine result"""
+        return [dict(d) for d in detections if d["confidence"] >= self.confidence]
+
+    def get_detections(self, frame, rois=None, packet=None):
+        """Get this method's detections from the shared engine's result for the frame"""
+        if rois:
+            return self.filter_detections(self.engine.infer_regions(frame, rois))
+        if packet is not None and packet.inference is not None:
+            # The letterboxed frame is already model-sized; map the boxes back to the display frame
+            return packet.transform.to_display(self.filter_detections(self.engine.infer(packet.inference)))
+        return self.filter_detections(self.engine.infer(frame))
+
+    def detect(self, frame, rois=None, packet=None):
+        # Run (or reuse) YOLO inference on the frame, or only on the regions of interest
+        return self.get_detections(frame, rois, packet)
+
+    def detect_packet(self, packet, rois=None):
+        return self.detect(packet.frame, rois, packet)
+
+    def draw(self, frame, detections):
+        annotated_frame = frame
+        for detection in detections:
+            x, y, w, h = detection["box"]
+            confidence = detection["confidence"]
+            class_id = detection["class_id"]
+            class_name = detection["class"]
+
+            # Get color for this class
+            class_color = self.get_class_color(class_id)
+
+            # Create label with emoji icons for common objects
+            icon = "📦" # Default box icon
+            if class_name == "person":
+                icon = "👤"
+            elif class_name == "car" or class_name == "truck":
+                icon = "🚗"
+            elif class_name == "dog":
+                icon = "🐕"
+            elif class_name == "cat":
+                icon = "🐈"
+            elif class_name == "bird":
+                icon = "🐦"
             
-            # Extract detections
-            for box in result.boxes:
-                # Get box coordinates
-                x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                x, y, w, h = int(x1), int(y1), int(x2 - x1), int(y2 - y1)
-                
-                # Get confidence
-                confidence = float(box.conf[0])
-                
-                # Get class ID and name
-                class_id = int(box.cls[0])
-                class_name = result.names[class_id]
-                
-                # Get color for this class
-                class_color = self.get_class_color(class_id)
-                
-                # Store detection info
-                detections.append({
-                    "class": class_name,
-                    "confidence": confidence,
-                    "box": [x, y, w, h],
-                    "class_id": class_id
-                })
-                
-                # Create label with emoji icons for common objects
-                icon = "📦" # Default box icon
-                if class_name == "person":
-                    icon = "👤"
-                elif class_name == "car" or class_name == "truck":
-                    icon = "🚗"
-                elif class_name == "dog":
-                    icon = "🐕"
-                elif class_name == "cat":
-                    icon = "🐈"
-                elif class_name == "bird":
-                    icon = "🐦"
-                
-                label = f"{icon} {class_name}: {confidence:.2f}"
-                
-                # Draw fancy bounding box with class-specific color
-                self.draw_fancy_box(annotated_frame, x, y, w, h, label)
-                
-                # Add decoration based on object type
-                if class_name == "person":
-                    # Add head indicator
-                    head_y = y + int(h * 0.2)
-                    head_size = int(min(w, h) * 0.15)
-                    cv2.circle(annotated_frame, (x + w//2, head_y), head_size, class_color, 1)
-                
-                # Draw confidence meter
-                meter_width = 40
-                meter_height = 4
-                meter_x = x + w - meter_width - 5
-                meter_y = y + h + 15
-                
-                # Background
-                cv2.rectangle(annotated_frame, 
-                             (meter_x, meter_y), 
-                             (meter_x + meter_width, meter_y + meter_height), 
-                             (100, 100, 100), -1)
-                
-                # Filled portion based on confidence
-                filled_width = int(meter_width * confidence)
-                cv2.rectangle(annotated_frame, 
-                             (meter_x, meter_y), 
-                             (meter_x + filled_width, meter_y + meter_height), 
-                             class_color, -1)
-        
-        return detections, annotated_frame
+            label = f"{icon} {class_name}: {confidence:.2f}"
+            
+            # Draw fancy bounding box with class-specific color
+            self.draw_fancy_box(annotated_frame, x, y, w, h, label)
+            
+            # Add decoration based on object type
+            if class_name == "person":
+                # Add head indicator
+                head_y = y + int(h * 0.2)
+                head_size = int(min(w, h) * 0.15)
+                cv2.circle(annotated_frame, (x + w//2, head_y), head_size, class_color, 1)
+            
+            # Draw confidence meter
+            meter_width = 40
+            meter_height = 4
+            meter_x = x + w - meter_width - 5
+            meter_y = y + h + 15
+            
+            # Background
+            cv2.rectangle(annotated_frame, 
+                         (meter_x, meter_y), 
+                         (meter_x + meter_width, meter_y + meter_height), 
+                         (100, 100, 100), -1)
+            
+            # Filled portion based on confidence
+            filled_width = int(meter_width * confidence)
+            cv2.rectangle(annotated_frame, 
+                         (meter_x, meter_y), 
+                         (meter_x + filled_width, meter_y + meter_height), 
+                         class_color, -1)
+
+# Building the Kalman-filtered track used by the person tracker:
+class KalmanBoxTrack:
+    """Constant-velocity Kalman filter over a box, with a fixed-size position history"""
+    # State: [cx, cy, w, h, vx, vy]; one step per detector pass
+    TRANSITION = np.eye(6)
+    TRANSITION[0, 4] = TRANSITION[1, 5] = 1.0
+    MEASUREMENT = np.eye(4, 6)
+    PROCESS_NOISE = np.diag([1.0, 1.0, 1.0, 1.0, 0.5, 0.5])
+    MEASUREMENT_NOISE = np.diag([4.0, 4.0, 10.0, 10.0])
+
+    def __init__(self, track_id, box, confidence, history_size=30):
+        x, y, w, h = box
+        self.track_id = track_id
+        self.state = np.array([x + w / 2.0, y + h / 2.0, w, h, 0.0, 0.0])
+        self.covariance = np.diag([10.0, 10.0, 10.0, 10.0, 100.0, 100.0])
+        self.confidence = confidence
+        self.hits = 1
+        self.misses = 0
+        self.confirmed = False
+
+        # Foot positions, oldest overwritten first
+        self.history = np.zeros((history_size, 2), dtype=np.int32)
+        self.history_index = 0
+        self.history_count = 0
+        self._record()
+
+    def predict(self):
+        """Advance the state by one detector pass"""
+        self.state = self.TRANSITION @ self.state
+        self.covariance = self.TRANSITION @ self.covariance @ self.TRANSITION.T + self.PROCESS_NOISE
+        self.state[2:4] = np.maximum(self.state[2:4], 1.0)
+
+    def update(self, box, confidence):
+        """Correct the prediction with a matched detection"""
+        x, y, w, h = box
+        measurement = np.array([x + w / 2.0, y + h / 2.0, w, h])
+        residual = measurement - self.MEASUREMENT @ self.state
+        innovation = self.MEASUREMENT @ self.covariance @ self.MEASUREMENT.T + self.MEASUREMENT_NOISE
+        gain = self.covariance @ self.MEASUREMENT.T @ np.linalg.inv(innovation)
+        self.state = self.state + gain @ residual
+        self.covariance = (np.eye(6) - gain @ self.MEASUREMENT) @ self.covariance
+        self.confidence = confidence
+        self.hits += 1
+        self.misses = 0
+        self._record()
+
+    def _record(self):
+        """Append the current foot position to the history ring"""
+        cx, cy, _, h = self.state[:4]
+        self.history[self.history_index] = (int(cx), int(cy + h / 2))
+        self.history_index = (self.history_index + 1) % len(self.history)
+        self.history_count = min(self.history_count + 1, len(self.history))
+
+    def get_box(self):
+        """Current [x, y, w, h] estimate"""
+        cx, cy, w, h = self.state[:4]
+        return [int(cx - w / 2), int(cy - h / 2), int(w), int(h)]
+
+    def get_trail(self):
+        """Foot positions oldest-to-newest"""
+        if self.history_count < len(self.history):
+            return self.history[:self.history_count].tolist()
+        return np.concatenate((self.history[self.history_index:],
+                               self.history[:self.history_index])).tolist()
+
+# Building the multi-object tracker for people:
+class PersonTracker:
+    """Associates detections with Kalman tracks by IoU, falling back to centroid distance"""
+    def __init__(self, iou_threshold=0.3, centroid_threshold=0.5, min_hits=2, max_age=15, max_coast=3,
+                 history_size=30):
+        self.iou_threshold = iou_threshold
+        self.centroid_threshold = centroid_threshold  # Centre distance relative to the track's diagonal
+        self.min_hits = min_hits  # Detections needed before a track gets reported
+        self.max_age = max_age  # Missed passes before a track is dropped
+        self.max_coast = max_coast  # Missed passes a track is still reported on its prediction
+        self.history_size = history_size
+        self.tracks = []
+        self.next_id = 1
+        self.total_tracks = 0  # Confirmed tracks ever seen
+
+    @staticmethod
+    def _iou_matrix(track_boxes, detection_boxes):
+        """Pairwise IoU between two arrays of [x, y, w, h] boxes"""
+        tx1, ty1 = track_boxes[:, 0:1], track_boxes[:, 1:2]
+        tx2, ty2 = tx1 + track_boxes[:, 2:3], ty1 + track_boxes[:, 3:4]
+        dx1, dy1 = detection_boxes[:, 0], detection_boxes[:, 1]
+        dx2, dy2 = dx1 + detection_boxes[:, 2], dy1 + detection_boxes[:, 3]
+        inter = (np.clip(np.minimum(tx2, dx2) - np.maximum(tx1, dx1), 0, None) *
+                 np.clip(np.minimum(ty2, dy2) - np.maximum(ty1, dy1), 0, None))
+        union = (track_boxes[:, 2:3] * track_boxes[:, 3:4] +
+                 detection_boxes[:, 2] * detection_boxes[:, 3] - inter)
+        return inter / np.maximum(union, 1e-9)
+
+    @staticmethod
+    def _greedy_pairs(cost, limit, free_tracks, free_detections):
+        """Pair the cheapest (track, detection) entries first"""
+        pairs = []
+        for flat in np.argsort(cost, axis=None):
+            track_index, detection_index = divmod(int(flat), cost.shape[1])
+            if cost[track_index, detection_index] > limit:
+                break
+            if track_index in free_tracks and detection_index in free_detections:
+                pairs.append((track_index, detection_index))
+                free_tracks.discard(track_index)
+                free_detections.discard(detection_index)
+        return pairs
+
+    def _associate(self, detections):
+        """Match predicted tracks to detections"""
+        free_tracks = set(range(len(self.tracks)))
+        free_detections = set(range(len(detections)))
+        if not self.tracks or not detections:
+            return [], free_tracks, free_detections
+
+        track_boxes = np.array([track.get_box() for track in self.tracks], dtype=np.float64)
+        detection_boxes = np.array([d["box"] for d in detections], dtype=np.float64)
+        pairs = self._greedy_pairs(1.0 - self._iou_matrix(track_boxes, detection_boxes),
+                                   1.0 - self.iou_threshold, free_tracks, free_detections)
+
+        # Fast movers or YOLO box jitter can leave no overlap; fall back to centre distance
+        if free_tracks and free_detections:
+            track_centres = track_boxes[:, :2] + track_boxes[:, 2:4] / 2
+            detection_centres = detection_boxes[:, :2] + detection_boxes[:, 2:4] / 2
+            distance = np.linalg.norm(track_centres[:, None, :] - detection_centres[None, :, :], axis=2)
+            distance /= np.maximum(np.hypot(track_boxes[:, 2], track_boxes[:, 3]), 1.0)[:, None]
+            pairs += self._greedy_pairs(distance, self.centroid_threshold, free_tracks, free_detections)
+        return pairs, free_tracks, free_detections
+
+    @staticmethod
+    def _in_regions(track, rois):
+        """Whether the detector looked at the track's predicted centre"""
+        if not rois:
+            return True
+        cx, cy = track.state[0], track.state[1]
+        return any(x <= cx <= x + w and y <= cy <= y + h for x, y, w, h in rois)
+
+    def update(self, detections, rois=None):
+        """
+        Advance every track by one detector pass and match it against new detections
+
+        Args:
+            detections: Person detections from this pass
+            rois: Regions the detector was restricted to; tracks outside them are not aged
+
+        Returns:
+            detections: One detection per reported track, with 'track_id' and 'trail'
+        """
+        for track in self.tracks:
+            track.predict()
+
+        pairs, free_tracks, free_detections = self._associate(detections)
+        for track_index, detection_index in pairs:
+            detection = detections[detection_index]
+            track = self.tracks[track_index]
+            track.update(detection["box"], detection["confidence"])
+            if not track.confirmed and track.hits >= self.min_hits:
+                track.confirmed = True
+                self.total_tracks += 1
+
+        for track_index in free_tracks:
+            track = self.tracks[track_index]
+            track.state[4:] *= 0.5  # Don't let an unobserved track drift off on old velocity
+            if self._in_regions(track, rois):
+                track.misses += 1
+
+        for detection_index in sorted(free_detections):
+            detection = detections[detection_index]
+            track = KalmanBoxTrack(self.next_id, detection["box"], detection["confidence"], self.history_size)
+            self.next_id += 1
+            if self.min_hits <= 1:
+                track.confirmed = True
+                self.total_tracks += 1
+            self.tracks.append(track)
+
+        # Tentative tracks die on their first miss, confirmed ones after max_age
+        self.tracks = [track for track in self.tracks
+                       if track.misses <= (self.max_age if track.confirmed else 0)]
+        return self.get_tracked_detections()
+
+    def coast(self):
+        """Carry tracks forward on their predictions for a pass without detection"""
+        for track in self.tracks:
+            track.predict()
+            track._record()
+        return self.get_tracked_detections()
+
+    def get_tracked_detections(self):
+        """Detections for confirmed tracks that are currently visible or briefly coasting"""
+        return [{
+            "class": "person",
+            "class_id": 0,
+            "confidence": float(track.confidence),
+            "box": track.get_box(),
+            "track_id": track.track_id,
+            "trail": track.get_trail(),
+            "predicted": track.misses > 0,
+        } for track in self.tracks if track.confirmed and track.misses <= self.max_coast]
+
+    @property
+    def active_count(self):
+        """Number of people currently tracked"""
+        return sum(1 for track in self.tracks if track.confirmed and track.misses <= self.max_coast)
 
 # building the detection mode for person datection mode:
 class PersonDetection(YOLODetection):
     """Specialized detection for people only"""
-    def __init__(self, model_path="yolov10n.pt", confidence=0.5, color=(255, 0, 0)):
+    def __init__(self, model_path=DEFAULT_MODEL_PATH, confidence=0.5, color=(255, 0, 0), detect_interval=1):
         super().__init__(model_path, confidence, color)
         self.name = "Person"
         self.icon = "👤"
         self.person_count = 0
-        self.last_count_update = time.time()
+        self.detect_interval = max(1, int(detect_interval))  # Run YOLO every Nth pass; tracks fill the gaps
+        self.frame_index = 0
+        self.trackers = {}  # camera_id -> PersonTracker; None is the primary camera's detect() path
+
+    def filter_detections(self, detections):
+        """Filter for only person detections"""
+        return [d for d in super().filter_detections(detections) if d["class"] == "person"]
+
+    def get_tracker(self, camera_id=None):
+        """Get (or create) the tracker for one camera"""
+        if camera_id not in self.trackers:
+            self.trackers[camera_id] = PersonTracker()
+        return self.trackers[camera_id]
+
+    def track(self, person_detections, camera_id=None, rois=None):
+        """Turn raw person detections into tracked detections with stable IDs"""
+        tracker = self.get_tracker(camera_id)
+        tracked = tracker.update(person_detections, rois)
+        if camera_id is None:
+            self.person_count = tracker.active_count
+        return tracked
     
-    def detect(self, frame):
-        detections, _ = super().detect(frame)
-        
-        # Filter for only person detections
-        person_detections = [d for d in detections if d["class"] == "person"]
-        
-        # Update person counter with smoothing
-        current_time = time.time()
-        if current_time - self.last_count_update > 1.0:  # Update count every second
-            self.person_count = len(person_detections)
-            self.last_count_update = current_time
-        
-        # Clear and create new annotated frame
-        annotated_frame = frame.copy()
+    def detect(self, frame, rois=None, packet=None):
+        self.frame_index += 1
+        tracker = self.get_tracker()
+        if tracker.tracks and (self.frame_index - 1) % self.detect_interval:
+            # Between YOLO passes the tracks carry the positions forward
+            return tracker.coast()
+
+        # Reuse the shared inference result instead of drawing every YOLO class first
+        return self.track(self.get_detections(frame, rois, packet), rois=rois)
+
+    @property
+    def total_count(self):
+        """People seen since start on the primary camera"""
+        return self.get_tracker().total_tracks
+
+    def draw(self, frame, person_detections):
+        annotated_frame = frame
         
         # Add person counter in corner
-        if self.person_count > 0:
-            counter_text = f"👤 {self.person_count}"
+        if person_detections:
+            counter_text = f"👤 {len(person_detections)}"
             cv2.putText(
                 annotated_frame,
                 counter_text,
@@ -314,8 +820,8 @@ class PersonDetection(YOLODetection):
             x, y, w, h = detection["box"]
             confidence = detection["confidence"]
             
-            # Create label with person ID number
-            person_id = person_detections.index(detection) + 1
+            # Create label with the track's stable ID
+            person_id = detection.get("track_id", person_detections.index(detection) + 1)
             label = f"👤 Person #{person_id}: {confidence:.2f}"
             
             # Draw fancy box
@@ -341,25 +847,14 @@ class PersonDetection(YOLODetection):
             cv2.line(annotated_frame, (x + w//2, body_bottom_y), (x + int(w * 0.35), y + h), self.color, 2)  # Left leg
             cv2.line(annotated_frame, (x + w//2, body_bottom_y), (x + int(w * 0.65), y + h), self.color, 2)  # Right leg
             
-            # Draw trail (would need tracking in real implementation)
-            # Here we just simulate with random points
-            np.random.seed(person_id)  # Make trail consistent for same person ID
-            trail_points = []
-            for i in range(5):
-                offset_x = np.random.randint(-30, 30)
-                offset_y = np.random.randint(-30, 30)
-                trail_points.append((x + w//2 + offset_x, y + h + offset_y))
-            
-            # Draw trail with fading effect
-            for i in range(len(trail_points)-1):
-                alpha = 0.7 - (i * 0.15)  # Fade out
-                thickness = 3 - i
-                if thickness > 0 and alpha > 0:
-                    cv2.line(annotated_frame, trail_points[i], trail_points[i+1], 
-                            (int(self.color[0] * alpha), int(self.color[1] * alpha), int(self.color[2] * alpha)), 
-                            thickness)
-        
-        return person_detections, annotated_frame
+            # Draw the track's recent foot positions, fading towards the oldest
+            trail_points = detection.get("trail", [])[-10:]
+            for i in range(1, len(trail_points)):
+                alpha = i / len(trail_points)
+                thickness = max(1, int(3 * alpha))
+                cv2.line(annotated_frame, tuple(trail_points[i-1]), tuple(trail_points[i]),
+                        (int(self.color[0] * alpha), int(self.color[1] * alpha), int(self.color[2] * alpha)),
+                        thickness)
         
     def get_status_text(self, detections):
         """Override status text to include person counter"""
@@ -368,14 +863,180 @@ class PersonDetection(YOLODetection):
             return f"👤 Person: {count}"
         return f"👤 Person: None"
 
+# Building the shared microphone capture service:
+class MicrophoneSubscription:
+    """One consumer's cursor into the shared microphone ring buffer"""
+    def __init__(self, service, name, cursor):
+        self.service = service
+        self.name = name
+        self.cursor = cursor  # Absolute sample position of the next read
+        self.overruns = 0  # Samples lost because this consumer fell too far behind
+        self.closed = False
+
+    def read_samples(self, count, timeout=None, out=None):
+        """Block until `count` new samples are available; None on timeout or when capture stops"""
+        return self.service._read(self, count, timeout, out)
+
+    def read(self, count, exception_on_overflow=False):
+        """PyAudio-style read returning raw int16 bytes, as used by speech_recognition"""
+        samples = self.read_samples(count, timeout=1.0)
+        return b"" if samples is None else samples.tobytes()
+
+    def seek_latest(self):
+        """Skip everything captured so far"""
+        with self.service.condition:
+            self.cursor = self.service.write_position
+
+    def close(self):
+        """Stop consuming; the microphone itself stays open for the other subscribers"""
+        self.service.unsubscribe(self)
+
+class MicrophoneService:
+    """Single always-open microphone stream fanned out to any number of subscribers"""
+    def __init__(self, rate=16000, chunk=1024, buffer_seconds=10.0):
+        self.rate = rate
+        self.chunk = chunk
+        self.channels = 1
+        self.sample_width = 2  # paInt16
+        self.capacity = int(rate * buffer_seconds)
+        self.buffer = np.zeros(self.capacity, dtype=np.int16)  # Ring buffer of the latest samples
+        self.write_position = 0  # Total samples captured so far
+        self.condition = threading.Condition()
+        self.subscribers = set()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        """Open the device on first use; later calls are no-ops"""
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+        self.thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self.thread.start()
+
+    def _capture_loop(self):
+        """The only reader of the audio device"""
+        audio = None
+        stream = None
+        try:
+            audio = pyaudio.PyAudio()
+            stream = audio.open(
+                format=pyaudio.paInt16,
+                channels=self.channels,
+                rate=self.rate,
+                input=True,
+                frames_per_buffer=self.chunk
+            )
+            while self.running:
+                data = stream.read(self.chunk, exception_on_overflow=False)
+                self._write(np.frombuffer(data, dtype=np.int16))
+        except Exception as e:
+            print(f"Microphone capture error: {e}")
+        finally:
+            if stream is not None:
+                stream.stop_stream()
+                stream.close()
+            if audio is not None:
+                audio.terminate()
+            with self.condition:
+                self.running = False
+                self.condition.notify_all()
+
+    def _write(self, samples):
+        """Append captured samples to the ring and wake the readers"""
+        count = len(samples)
+        with self.condition:
+            start = self.write_position % self.capacity
+            first = min(count, self.capacity - start)
+            self.buffer[start:start + first] = samples[:first]
+            self.buffer[:count - first] = samples[first:]
+            self.write_position += count
+            self.condition.notify_all()
+
+    def subscribe(self, name):
+        """Start reading from now on"""
+        self.start()
+        with self.condition:
+            subscription = MicrophoneSubscription(self, name, self.write_position)
+            self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Remove a subscriber and release any read it is blocked in"""
+        with self.condition:
+            subscription.closed = True
+            self.subscribers.discard(subscription)
+            self.condition.notify_all()
+
+    def _read(self, subscription, count, timeout, out):
+        """Copy the next `count` samples after a subscriber's cursor"""
+        deadline = None if timeout is None else time.time() + timeout
+        with self.condition:
+            while not subscription.closed and self.write_position - subscription.cursor < count:
+                if not self.running:
+                    return None
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+            if subscription.closed:
+                return None
+
+            # A consumer that fell behind skips to the oldest audio still in the ring
+            oldest = self.write_position - self.capacity
+            if subscription.cursor < oldest:
+                subscription.overruns += oldest - subscription.cursor
+                subscription.cursor = oldest
+
+            if out is None:
+                out = np.empty(count, dtype=np.int16)
+            start = subscription.cursor % self.capacity
+            first = min(count, self.capacity - start)
+            out[:first] = self.buffer[start:start + first]
+            out[first:count] = self.buffer[:count - first]
+            subscription.cursor += count
+            return out[:count]
+
+    def stop(self):
+        """Close the device and release every subscriber"""
+        with self.condition:
+            self.running = False
+            for subscription in self.subscribers:
+                subscription.closed = True
+            self.subscribers.clear()
+            self.condition.notify_all()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1.0)
+        self.thread = None
+
+    def get_stats(self):
+        """Get capture position and per-subscriber lag"""
+        with self.condition:
+            return {
+                'running': self.running,
+                'captured_seconds': self.write_position / self.rate,
+                'subscribers': {subscription.name: {
+                    'lag_samples': self.write_position - subscription.cursor,
+                    'overruns': subscription.overruns,
+                } for subscription in self.subscribers},
+            }
+
+# Shared microphone used by noise detection and voice commands
+MICROPHONE_SERVICE = MicrophoneService()
+
 # Building face detection method:
 class NoiseDetection(DetectionMethod):
     """Audio noise detection using microphone input"""
-    def __init__(self, threshold=0.1, color=(255, 105, 180)):  # Hot pink color
+    def __init__(self, threshold=0.1, color=(255, 105, 180),  # Hot pink color
+                 spectral=False, band=(300.0, 4000.0), flux_threshold=0.5,
+                 adaptive_floor=True, floor_multiplier=3.0, floor_alpha=0.05):
         super().__init__("Noise", color, icon="🔊")
         self.threshold = threshold
-        self.energy_history = []
         self.max_history_size = 100
+        self.energy_history = np.zeros(self.max_history_size, dtype=np.float32)  # Ring buffer
+        self.history_index = 0
+        self.history_count = 0
         self.current_energy = 0
         self.audio_thread = None
         self.stop_audio = False
@@ -383,12 +1044,39 @@ class NoiseDetection(DetectionMethod):
         self.detection_time = None
         self.cooldown_period = 3  # Seconds that noise detection remains shown after detection
         
-        # Audio parameters
-        self.format = pyaudio.paInt16
-        self.channels = 1
-        self.rate = 16000
-        self.chunk = 1024
-        self.audio = pyaudio.PyAudio()
+        # Audio comes from the shared microphone instead of a device of our own
+        self.microphone = MICROPHONE_SERVICE
+        self.subscription = None
+        self.rate = self.microphone.rate
+        self.chunk = self.microphone.chunk
+
+        # Preallocated work buffers, reused for every chunk
+        self.raw_samples = np.zeros(self.chunk, dtype=np.int16)
+        self.samples = np.zeros(self.chunk, dtype=np.float32)
+
+        # Adaptive noise floor: the trigger level follows the background level
+        self.adaptive_floor = adaptive_floor
+        self.floor_multiplier = floor_multiplier
+        self.floor_alpha = floor_alpha
+        self.noise_floor = 0.0
+
+        # Optional band-limited energy / spectral flux over a rolling FFT window
+        self.spectral = spectral
+        self.flux_threshold = flux_threshold
+        self.spectral_flux = 0.0
+        self.fft_size = 2048
+        self.fft_window = np.hanning(self.fft_size).astype(np.float32)
+        self.fft_ring = np.zeros(self.fft_size, dtype=np.float32)  # Latest samples, written in place
+        self.fft_index = 0
+        self.fft_input = np.zeros(self.fft_size, dtype=np.float32)
+        frequencies = np.fft.rfftfreq(self.fft_size, 1.0 / self.rate)
+        self.band_start = int(np.searchsorted(frequencies, band[0]))
+        self.band_end = max(self.band_start + 1, int(np.searchsorted(frequencies, band[1], side='right')))
+        band_bins = self.band_end - self.band_start
+        self.band_magnitude = np.zeros(band_bins, dtype=np.float32)
+        self.previous_magnitude = np.zeros(band_bins, dtype=np.float32)
+        self.flux_diff = np.zeros(band_bins, dtype=np.float32)
+        self.band_scale = 2.0 / (self.fft_size * float(np.dot(self.fft_window, self.fft_window)))
         
         # Initialize audio processing thread
         self.audio_thread = threading.Thread(target=self._process_audio)
@@ -398,52 +1086,95 @@ class NoiseDetection(DetectionMethod):
     def _process_audio(self):
         """Process audio stream in a separate thread"""
         try:
-            stream = self.audio.open(
-                format=self.format,
-                channels=self.channels,
-                rate=self.rate,
-                input=True,
-                frames_per_buffer=self.chunk
-            )
+            self.subscription = self.microphone.subscribe("noise")
             
             while not self.stop_audio:
-                # Read audio chunk
-                data = stream.read(self.chunk, exception_on_overflow=False)
-                
-                # Convert to numpy array
-                audio_data = np.frombuffer(data, dtype=np.int16)
-                
-                # Calculate RMS energy
-                energy = np.sqrt(np.mean(np.square(audio_data))) / 32768.0  # Normalize to [0,1]
-                
-                # Update current energy and history
-                self.current_energy = energy
-                self.energy_history.append(energy)
-                if len(self.energy_history) > self.max_history_size:
-                    self.energy_history.pop(0)
-                
-                # Check for noise detection (spike in energy)
-                if energy > self.threshold:
-                    self.noise_detected = True
-                    self.detection_time = time.time()
-                
-                # Check if we should reset detection after cooldown
-                if self.noise_detected and self.detection_time and time.time() - self.detection_time > self.cooldown_period:
-                    self.noise_detected = False
-                
-                time.sleep(0.01)  # Small sleep to reduce CPU usage
+                # Read audio chunk (blocks until the chunk is ready)
+                audio_data = self.subscription.read_samples(self.chunk, timeout=1.0, out=self.raw_samples)
+                if audio_data is None:
+                    if not self.microphone.running or self.subscription.closed:
+                        break
+                    continue
+                self._process_chunk(audio_data)
                 
         except Exception as e:
             print(f"Audio processing error: {e}")
         finally:
-            if 'stream' in locals():
-                stream.stop_stream()
-                stream.close()
+            if self.subscription is not None:
+                self.subscription.close()
     
+    def _process_chunk(self, audio_data):
+        """Update energy, history and detection state from one chunk of int16 samples"""
+        count = min(len(audio_data), self.chunk)
+        samples = self.samples[:count]
+        # Normalize to [-1, 1] in float32 so squaring cannot overflow
+        np.multiply(audio_data[:count], 1.0 / 32768.0, out=samples, casting='unsafe')
+
+        if self.spectral:
+            energy = self._band_energy(samples)
+        else:
+            energy = float(np.sqrt(np.dot(samples, samples) / max(count, 1)))
+
+        # Update current energy and history
+        self.current_energy = energy
+        self.energy_history[self.history_index] = energy
+        self.history_index = (self.history_index + 1) % self.max_history_size
+        self.history_count = min(self.history_count + 1, self.max_history_size)
+
+        # Check for noise detection (spike in energy above the background)
+        limit = self.threshold
+        if self.adaptive_floor:
+            limit = max(limit, self.noise_floor * self.floor_multiplier)
+        triggered = energy > limit
+        if self.spectral:
+            triggered = triggered and self.spectral_flux > self.flux_threshold
+        if triggered:
+            self.noise_detected = True
+            self.detection_time = time.time()
+        elif self.adaptive_floor:
+            # Only learn the background while nothing is happening
+            self.noise_floor += self.floor_alpha * (energy - self.noise_floor)
+
+        # Check if we should reset detection after cooldown
+        if self.noise_detected and self.detection_time and time.time() - self.detection_time > self.cooldown_period:
+            self.noise_detected = False
+
+    def _band_energy(self, samples):
+        """Band-limited RMS of the rolling FFT window; also updates the spectral flux"""
+        # Write the new samples into the ring
+        count = min(len(samples), self.fft_size)
+        samples = samples[-count:]
+        first = min(count, self.fft_size - self.fft_index)
+        self.fft_ring[self.fft_index:self.fft_index + first] = samples[:first]
+        self.fft_ring[:count - first] = samples[first:]
+        self.fft_index = (self.fft_index + count) % self.fft_size
+
+        # Unroll oldest-to-newest while applying the window
+        tail = self.fft_size - self.fft_index
+        np.multiply(self.fft_ring[self.fft_index:], self.fft_window[:tail], out=self.fft_input[:tail])
+        np.multiply(self.fft_ring[:self.fft_index], self.fft_window[tail:], out=self.fft_input[tail:])
+
+        spectrum = np.fft.rfft(self.fft_input)
+        np.abs(spectrum[self.band_start:self.band_end], out=self.band_magnitude)
+
+        # Spectral flux: relative rise in band magnitude since the previous window
+        np.subtract(self.band_magnitude, self.previous_magnitude, out=self.flux_diff)
+        np.maximum(self.flux_diff, 0.0, out=self.flux_diff)
+        self.spectral_flux = float(self.flux_diff.sum() / (self.previous_magnitude.sum() + 1e-9))
+        self.previous_magnitude[:] = self.band_magnitude
+
+        return float(np.sqrt(np.dot(self.band_magnitude, self.band_magnitude) * self.band_scale))
+
+    def get_energy_history(self):
+        """Get the energy history oldest-to-newest"""
+        if self.history_count < self.max_history_size:
+            return self.energy_history[:self.history_count]
+        return np.concatenate((self.energy_history[self.history_index:],
+                               self.energy_history[:self.history_index]))
+
     def detect(self, frame):
-        """Detect noise and annotate the frame"""
+        """Detect noise from the latest audio energy"""
         detections = []
-        annotated_frame = frame.copy()
         height, width, _ = frame.shape
         
         # If noise is detected, add a detection
@@ -453,7 +1184,15 @@ class NoiseDetection(DetectionMethod):
                 "confidence": self.current_energy,
                 "box": [0, 0, width, height]  # Full frame "detection"
             })
-            
+        
+        return detections
+
+    def draw(self, frame, detections):
+        """Draw the noise visualisation"""
+        annotated_frame = frame
+        height, width, _ = frame.shape
+        
+        if detections:
             # Add visualizations for noise detection
             # Get time since detection for fade effect
             time_since_detection = 0
@@ -479,23 +1218,15 @@ class NoiseDetection(DetectionMethod):
             )
             
             # Draw waveform
-            if self.energy_history:
-                points = []
-                for i, energy in enumerate(self.energy_history[-waveform_width:]):
-                    x = waveform_x + i
-                    y = waveform_y + waveform_height - int(energy * waveform_height)
-                    points.append((x, y))
+            history = self.get_energy_history()[-waveform_width:]
+            if len(history) > 1:
+                points = np.empty((len(history), 2), dtype=np.int32)
+                points[:, 0] = waveform_x + np.arange(len(history))
+                points[:, 1] = waveform_y + waveform_height - (history * waveform_height).astype(np.int32)
                 
                 # Connect points with lines
-                for i in range(1, len(points)):
-                    intensity = int(255 * fade_factor)
-                    cv2.line(
-                        annotated_frame,
-                        points[i-1],
-                        points[i],
-                        (0, intensity, intensity),
-                        1
-                    )
+                intensity = int(255 * fade_factor)
+                cv2.polylines(annotated_frame, [points], False, (0, intensity, intensity), 1)
             
             # Draw noise indicator in the corner
             indicator_size = int(80 * fade_factor)
@@ -549,8 +1280,6 @@ class NoiseDetection(DetectionMethod):
                     self.color,
                     1
                 )
-        
-        return detections, annotated_frame
     
     def get_status_text(self, detections):
         """Get status text for display"""
@@ -562,32 +1291,111 @@ class NoiseDetection(DetectionMethod):
     def __del__(self):
         """Clean up resources"""
         self.stop_audio = True
+        if self.subscription is not None:
+            self.subscription.close()
         if self.audio_thread and self.audio_thread.is_alive():
             self.audio_thread.join(timeout=1.0)
-        self.audio.terminate()
 
 # building the class for detection faces
 class FaceDetection(DetectionMethod):
     """Face detection using Haar cascades"""
-    def __init__(self, color=(0, 0, 255)):
+    def __init__(self, color=(0, 0, 255), fast=False, scale=0.5, cache_frames=5, verify_threshold=0.6):
         super().__init__("Face", color)
         # Load Haar cascade for face detection
         self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+
+        # Fast mode (opt-in): cascade on a downscaled image, then follow the faces by template matching.
+        # It trades recall for speed: the cascade's 24 px window means faces under 24 / scale pixels
+        # are missed, and a new face next to a cached one waits for the next cascade run
+        self.scale = scale if fast else 1.0
+        self.cache_frames = cache_frames if fast else 0  # Passes that may reuse verified boxes
+        self.verify_threshold = verify_threshold  # Minimum normalised correlation to keep a cached face
+        self.cached_faces = []  # (box, template) from the last cascade run
+        self.frames_since_detection = 0
+        self.full_detections = 0
+        self.cached_results = 0
     
-    def detect(self, frame):
-        # Convert to grayscale for face detection
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        
-        # Detect faces
-        faces = self.face_cascade.detectMultiScale(
-            gray, 
-            scaleFactor=1.1, 
-            minNeighbors=5, 
-            minSize=(30, 30)
-        )
+    def _to_gray(self, image):
+        """Grayscale at the working scale"""
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        if self.scale != 1.0:
+            gray = cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        return gray
+
+    def find_faces(self, frame, rois=None):
+        """Run the cascade over the whole frame, or only over the regions of interest"""
+        if not rois:
+            rois = [[0, 0, frame.shape[1], frame.shape[0]]]
+
+        min_side = max(1, int(round(30 * self.scale)))
+        faces = []
+        for rx, ry, rw, rh in rois:
+            # Convert to grayscale for face detection
+            gray = self._to_gray(frame[ry:ry + rh, rx:rx + rw])
+
+            # Detect faces, mapping the boxes back to full resolution
+            for (x, y, w, h) in self.face_cascade.detectMultiScale(
+                gray, 
+                scaleFactor=1.1, 
+                minNeighbors=5, 
+                minSize=(min_side, min_side)
+            ):
+                faces.append((int(x / self.scale) + rx, int(y / self.scale) + ry,
+                              int(w / self.scale), int(h / self.scale)))
+        return faces
+
+    @staticmethod
+    def _intersects(a, b):
+        """Check whether two [x, y, w, h] boxes overlap"""
+        return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+    def _verify_cached(self, frame, rois=None):
+        """Re-locate every cached face near its last position; None as soon as one is lost"""
+        cached = self.cached_faces
+        if rois:
+            # Motion where no face is cached may be a new face, which only the cascade can find
+            if not all(any(self._intersects(roi, box) for box, _ in cached) for roi in rois):
+                return None
+            # Report only faces inside the regions, as a cascade run over them would
+            cached = [(box, template) for box, template in cached
+                      if any(self._intersects(roi, box) for roi in rois)]
+
+        height, width = frame.shape[:2]
+        faces = []
+        for (x, y, w, h), template in cached:
+            # Search a window of half a face around the last box
+            x1, y1 = max(0, x - w // 2), max(0, y - h // 2)
+            x2, y2 = min(width, x + w + w // 2), min(height, y + h + h // 2)
+            window = self._to_gray(frame[y1:y2, x1:x2])
+            if window.shape[0] < template.shape[0] or window.shape[1] < template.shape[1]:
+                return None
+            _, score, _, (bx, by) = cv2.minMaxLoc(cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED))
+            if score < self.verify_threshold:
+                return None
+            faces.append((x1 + int(bx / self.scale), y1 + int(by / self.scale), w, h))
+
+        # Keep the original templates so the boxes can't drift onto the background
+        moved = {id(template): box for box, (_, template) in zip(faces, cached)}
+        self.cached_faces = [(moved.get(id(template), box), template) for box, template in self.cached_faces]
+        return faces
+
+    def detect(self, frame, rois=None):
+        faces = None
+        if self.cached_faces and self.frames_since_detection < self.cache_frames:
+            faces = self._verify_cached(frame, rois)
+
+        if faces is None:
+            faces = self.find_faces(frame, rois)
+            self.frames_since_detection = 0
+            self.full_detections += 1
+            if self.cache_frames:
+                self.cached_faces = [((x, y, w, h), self._to_gray(frame[y:y + h, x:x + w]))
+                                     for x, y, w, h in faces if min(w, h) * self.scale >= 8]
+        else:
+            self.frames_since_detection += 1
+            self.cached_results += 1
         
         detections = []
-        annotated_frame = frame.copy()
         
         # Process detections
         for (x, y, w, h) in faces:
@@ -596,7 +1404,14 @@ class FaceDetection(DetectionMethod):
                 "confidence": 1.0,  # Haar cascade doesn't provide confidence scores
                 "box": [x, y, w, h]
             })
-            
+        
+        return detections
+
+    def draw(self, frame, detections):
+        annotated_frame = frame
+        for detection in detections:
+            x, y, w, h = detection["box"]
+
             # Draw rectangle around face
             cv2.rectangle(annotated_frame, (x, y), (x + w, y + h), self.color, 2)
             
@@ -610,8 +1425,6 @@ class FaceDetection(DetectionMethod):
                 self.color,
                 2,
             )
-        
-        return detections, annotated_frame
 
 
 # Update the MultiSurveillanceSystem class to include the new noise detection
@@ -627,210 +1440,3080 @@ def update_multi_surveillance_system():
     # elif key == ord('5'):
     #     self.toggle_detection_method("noise")
 
-# Building the class for Async detector:
-class AsyncDetector:
-    """Handles asynchronous detection to improve performance"""
-    def __init__(self, detection_method):
-        self.detection_method = detection_method
-        self.frame = None
-        self.results = None
-        self.processing = False
-        self.thread = None
-    
-    def process_frame(self, frame):
-        """Process a new frame if not currently processing"""
-        if not self.processing:
-            self.frame = frame.copy()
-            self.processing = True
-            self.thread = threading.Thread(target=self._process)
-            self.thread.daemon = True
-            self.thread.start()
-    
-    def _process(self):
-        """Process the frame in a separate thread"""
-        if self.frame is not None:
-            self.results = self.detection_method.detect(self.frame)
-            self.processing = False
-    
-    def get_results(self):
-        """Get the latest detection results"""
+# Building the shared-memory frame pool:
+class PooledFrame:
+    """One checked-out slot of a SharedFramePool; the slot is recycled when its last reference is released"""
+    def __init__(self, pool, index, generation):
+        self.pool = pool
+        self.index = index
+        self.generation = generation
+        # A fresh view per checkout, so identity-keyed caches never mistake a recycled slot for an old frame
+        self.array = np.ndarray(pool.shape, dtype=pool.dtype, buffer=pool.blocks[index].buf)
+
+    def retain(self):
+        """Take another reference; False if the slot was already recycled"""
+        return self.pool._retain(self.index, self.generation)
+
+    def release(self):
+        """Drop one reference"""
+        self.pool._release(self.index, self.generation)
+
+    def descriptor(self):
+        """Everything another process needs to map this frame (see attach_shared_frame)"""
+        return {'name': self.pool.blocks[self.index].name, 'shape': self.pool.shape,
+                'dtype': self.pool.dtype.str, 'generation': self.generation}
+
+class SharedFramePool:
+    """Preallocated frame-sized shared-memory buffers handed out with reference counts"""
+    def __init__(self, shape, slots=24, dtype=np.uint8):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.slots = slots
+        nbytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self.blocks = [shared_memory.SharedMemory(create=True, size=nbytes) for _ in range(slots)]
+        self.refcounts = [0] * slots
+        self.generations = [0] * slots  # Bumped on every checkout, so stale references can't revive a slot
+        self.free = deque(range(slots))
+        self.lock = threading.Lock()
+        self.closed = False
+
+        # Statistics
+        self.acquired = 0
+        self.exhausted = 0  # Checkouts that found every slot in use
+
+    def acquire(self):
+        """Check out a free slot with one reference, or None when every slot is still referenced"""
+        with self.lock:
+            if self.closed or not self.free:
+                self.exhausted += 1
+                return None
+            index = self.free.popleft()
+            self.refcounts[index] = 1
+            self.generations[index] += 1
+            self.acquired += 1
+            return PooledFrame(self, index, self.generations[index])
+
+    def _retain(self, index, generation):
+        """Add a reference to a slot that is still checked out"""
+        with self.lock:
+            if self.generations[index] != generation or self.refcounts[index] <= 0:
+                return False
+            self.refcounts[index] += 1
+            return True
+
+    def _release(self, index, generation):
+        """Drop a reference, returning the slot to the free list at zero"""
+        with self.lock:
+            if self.generations[index] != generation or self.refcounts[index] <= 0:
+                return
+            self.refcounts[index] -= 1
+            if self.refcounts[index] == 0:
+                self.free.append(index)
+
+    def close(self):
+        """Stop handing out slots and unlink the shared memory"""
+        with self.lock:
+            self.closed = True
+        for block in self.blocks:
+            try:
+                block.close()
+            except BufferError:
+                # A consumer still holds a view; the mapping goes away with the last one
+                pass
+            try:
+                block.unlink()
+            except FileNotFoundError:
+                pass
+
+    def get_stats(self):
+        """Get slot usage and how often the pool ran dry"""
+        with self.lock:
+            return {
+                'slots': self.slots,
+                'in_use': self.slots - len(self.free),
+                'acquired': self.acquired,
+                'exhausted': self.exhausted,
+                'slot_bytes': self.blocks[0].size if self.blocks else 0,
+            }
+
+def attach_shared_frame(descriptor):
+    """
+    Map a pooled frame published by another process
+
+    Args:
+        descriptor: Dict from PooledFrame.descriptor()
+
+    Returns:
+        block: The SharedMemory handle; close it once the frame is no longer used
+        frame: Read-only ndarray view of the frame, without a copy
+    """
+    try:
+        # The publishing process owns the segment, so this process must not unlink it on exit
+        block = shared_memory.SharedMemory(name=descriptor['name'], track=False)
+    except TypeError:
+        block = shared_memory.SharedMemory(name=descriptor['name'])
+    frame = np.ndarray(descriptor['shape'], dtype=np.dtype(descriptor['dtype']), buffer=block.buf)
+    frame.flags.writeable = False
+    return block, frame
+
+# Building the frame bus shared by every frame consumer:
+class FramePacket:
+    """A single captured frame as published on the frame bus"""
+    def __init__(self, seq, frame, timestamp=None, camera_id=1, inference=None, transform=None, buffers=()):
+        self.seq = seq
+        self.frame = frame  # Display-sized frame
+        self.timestamp = timestamp if timestamp is not None else time.time()
+        self.camera_id = camera_id
+        self.inference = inference  # Letterboxed model-sized frame, if the pipeline makes one
+        self.transform = transform  # LetterboxTransform from inference to display coordinates
+        self.buffers = tuple(buffers)  # PooledFrames backing frame/inference, if they come from a pool
+
+    def retain(self):
+        """
+        Keep the packet's pixels from being recycled while they are in use
+
+        Consumers that hold a packet beyond the frame bus ring (worker mailboxes,
+        encoder queues) retain it and release it when done. Packets that aren't
+        backed by a frame pool always succeed.
+
+        Returns:
+            retained: False if the pool already recycled the frame, which must then be skipped
+        """
+        for i, buffer in enumerate(self.buffers):
+            if not buffer.retain():
+                for retained in self.buffers[:i]:
+                    retained.release()
+                return False
+        return True
+
+    def release(self):
+        """Drop a reference taken with retain()"""
+        for buffer in self.buffers:
+            buffer.release()
+
+class FrameBus:
+    """Ring buffer that publishes each captured frame once to any number of subscribers"""
+    def __init__(self, capacity=8):
+        self.capacity = capacity
+        self._ring = [None] * capacity
+        self._next_seq = 0
+        self._cond = threading.Condition()
+        self.closed = False
+
+    def publish(self, frame, timestamp=None, camera_id=1, inference=None, transform=None, buffers=()):
+        """Publish a frame to all subscribers, overwriting the oldest slot"""
+        # Subscribers share the same array, so nobody may draw on it in place
+        frame.flags.writeable = False
+        if inference is not None:
+            inference.flags.writeable = False
+        with self._cond:
+            # The ring holds the pooled buffers' first reference until the slot is overwritten
+            packet = FramePacket(self._next_seq, frame, timestamp, camera_id, inference, transform, buffers)
+            evicted = self._ring[self._next_seq % self.capacity]
+            self._ring[self._next_seq % self.capacity] = packet
+            self._next_seq += 1
+            self._cond.notify_all()
+        if evicted is not None:
+            evicted.release()
+        return packet
+
+    @property
+    def frames_published(self):
+        """Number of frames published so far"""
+        return self._next_seq
+
+    def latest(self):
+        """Get the newest packet on the bus, or None if nothing was published yet"""
+        with self._cond:
+            if self._next_seq == 0:
+                return None
+            return self._ring[(self._next_seq - 1) % self.capacity]
+
+    def subscribe(self, name, latest_only=True):
+        """Create a subscription that starts at the next published frame"""
+        return FrameSubscription(self, name, latest_only)
+
+    def close(self):
+        """Wake up all waiting subscribers; no more frames will be published"""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def _read(self, cursor, latest_only, timeout):
+        """Return (packet, skipped) for the first packet at or after cursor"""
+        with self._cond:
+            if self._next_seq <= cursor and not self.closed and timeout != 0:
+                self._cond.wait_for(lambda: self._next_seq > cursor or self.closed, timeout)
+            if self._next_seq <= cursor:
+                return None, 0
+
+            if latest_only:
+                seq = self._next_seq - 1
+            else:
+                # Frames older than the ring capacity have already been overwritten
+                seq = max(cursor, self._next_seq - self.capacity)
+            return self._ring[seq % self.capacity], seq - cursor
+
+class FrameSubscription:
+    """A consumer's cursor into the frame bus"""
+    def __init__(self, frame_bus, name, latest_only=True):
+        self.frame_bus = frame_bus
+        self.name = name
+        self.latest_only = latest_only
+        self.cursor = frame_bus._next_seq
+        self.received = 0
+        self.skipped = 0
+
+    def get(self, timeout=None):
+        """
+        Get the next frame packet for this subscriber
+
+        Args:
+            timeout: Seconds to wait for a new frame (0 polls, None waits forever)
+
+        Returns:
+            packet: The newest unseen packet (or the next one in order when
+                    latest_only is False), or None if no new frame arrived
+        """
+        packet, skipped = self.frame_bus._read(self.cursor, self.latest_only, timeout)
+        if packet is None:
+            return None
+        self.cursor = packet.seq + 1
+        self.received += 1
+        self.skipped += skipped
+        return packet
+
+    def seek_latest(self):
+        """Jump past every frame already published without counting them as skipped"""
+        self.cursor = self.frame_bus._next_seq
+
+# Building the metrics registry for per-stage timing:
+class SurveillanceMetrics:
+    """Per-stage timers for the surveillance pipeline; every call is a no-op while disabled"""
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.stages = {}
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Start timing a stage; hand the result to observe()"""
+        return time.perf_counter() if self.enabled else None
+
+    def observe(self, stage, start):
+        """Record the time elapsed since start() for a stage"""
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        stats = self.stages.get(stage)
+        if stats is None:
+            with self.lock:
+                stats = self.stages.setdefault(stage, LatencyStats())
+        stats.add(elapsed)
+
+    def get_stage_stats(self):
+        """Get the latency summary of every stage timed so far"""
+        return {stage: stats.summary() for stage, stats in list(self.stages.items())}
+
+class PrometheusText:
+    """Collects samples and renders them in the Prometheus text exposition format"""
+    def __init__(self, prefix="surveillance"):
+        self.prefix = prefix
+        self.families = {}  # name -> [kind, help, [(sample_name, labels, value)]]
+
+    def add(self, name, value, labels=None, kind="gauge", help_text="", suffix=""):
+        """Add one sample to a metric family"""
+        if value is None:
+            return
+        family = self.families.setdefault(name, [kind, help_text, []])
+        family[2].append((name + suffix, labels or {}, float(value)))
+
+    def add_summary(self, name, summary, labels=None, help_text=""):
+        """Add a LatencyStats summary (milliseconds) as a summary in seconds"""
+        labels = labels or {}
+        for quantile, key in (("0.5", "p50_ms"), ("0.9", "p90_ms"), ("0.99", "p99_ms")):
+            self.add(name, summary[key] / 1000.0, {**labels, 'quantile': quantile}, "summary", help_text)
+        self.add(name, summary['mean_ms'] * summary['count'] / 1000.0, labels, "summary", help_text, "_sum")
+        self.add(name, summary['count'], labels, "summary", help_text, "_count")
+
+    @staticmethod
+    def _labels(labels):
+        """Format a label set"""
+        if not labels:
+            return ""
+        escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+                   for value in labels.values())
+        return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels.keys(), escaped)) + "}"
+
+    def render(self):
+        """Render every family with its HELP and TYPE lines"""
+        lines = []
+        for name, (kind, help_text, samples) in self.families.items():
+            full_name = f"{self.prefix}_{name}"
+            if help_text:
+                lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{self.prefix}_{sample_name}{self._labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+# Building the local HTTP endpoint for Prometheus scrapes:
+class MetricsHTTPServer:
+    """Serves GET /metrics in Prometheus text format on a local port"""
+    def __init__(self, render, host="127.0.0.1", port=9108):
+        self.render = render
+        self.host = host
+        self.port = port
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        """Start serving scrapes on a background thread"""
+        render = self.render
+
+        class MetricsRequestHandler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # No console line per scrape
+
+        class MetricsServer(http.server.ThreadingHTTPServer):
+            allow_reuse_address = True
+            daemon_threads = True
+
+        self.server = MetricsServer((self.host, self.port), MetricsRequestHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        print(f"Metrics endpoint listening on http://{self.host}:{self.port}/metrics")
+
+    def stop(self):
+        """Stop the metrics server"""
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+# Building the resolution pipeline that sizes each captured frame once per consumer:
+class LetterboxTransform:
+    """Maps boxes from a letterboxed inference frame to display coordinates"""
+    def __init__(self, scale_x, scale_y, pad_x, pad_y, display_size):
+        self.scale_x = scale_x  # Display pixels per inference pixel
+        self.scale_y = scale_y
+        self.pad_x = pad_x
+        self.pad_y = pad_y
+        self.display_size = display_size
+
+    def box_to_display(self, box):
+        """Map one [x, y, w, h] box, clipped to the display frame"""
+        x, y, w, h = box
+        width, height = self.display_size
+        x1 = min(max(int((x - self.pad_x) * self.scale_x), 0), width)
+        y1 = min(max(int((y - self.pad_y) * self.scale_y), 0), height)
+        x2 = min(max(int((x + w - self.pad_x) * self.scale_x), 0), width)
+        y2 = min(max(int((y + h - self.pad_y) * self.scale_y), 0), height)
+        return [x1, y1, x2 - x1, y2 - y1]
+
+    def to_display(self, detections):
+        """Replace each detection's box with its display-space box (boxes are never mutated in place)"""
+        for detection in detections:
+            detection["box"] = self.box_to_display(detection["box"])
+        return detections
+
+class ResolutionPipeline:
+    """Resizes each captured frame once into a display frame and a letterboxed model-sized inference frame"""
+    def __init__(self, display_size=(1100, 600), inference_size=640, pad_value=114, pool_slots=0):
+        self.display_size = tuple(display_size) if display_size else None  # None keeps the capture size
+        self.inference_size = inference_size  # None or 0 disables the inference frame
+        self.pad_value = pad_value  # Same grey ultralytics pads with
+        self.source_size = None
+        self.layout = None  # (resized_width, resized_height, pad_x, pad_y) for the current source size
+        self.transform = None
+
+        # Shared-memory frame pools per output, so outputs can be read from other processes
+        self.pool_slots = pool_slots  # 0 allocates a fresh array per frame
+        self.pools = {}  # 'display' / 'inference' -> SharedFramePool
+        self.padded_slots = set()  # Inference slots whose letterbox padding is already filled in
+        self.fallback_frames = 0  # Frames allocated normally because a pool was exhausted
+
+    def _configure(self, source_size):
+        """Work out the letterbox layout once per source resolution"""
+        source_width, source_height = source_size
+        display_width, display_height = self.display_size or source_size
+        if self.inference_size:
+            size = self.inference_size
+            ratio = min(size / source_width, size / source_height)
+            resized_width = max(1, int(round(source_width * ratio)))
+            resized_height = max(1, int(round(source_height * ratio)))
+            pad_x, pad_y = (size - resized_width) // 2, (size - resized_height) // 2
+            self.layout = (resized_width, resized_height, pad_x, pad_y)
+            self.transform = LetterboxTransform(display_width / resized_width, display_height / resized_height,
+                                                pad_x, pad_y, (display_width, display_height))
+        self.source_size = source_size
+        self.padded_slots.clear()
+
+    def _checkout(self, output, shape, buffers):
+        """Get a pooled array for an output, or None to allocate one normally"""
+        if buffers is None or not self.pool_slots:
+            return None
+        pool = self.pools.get(output)
+        if pool is None or pool.shape != shape:
+            if pool is not None:
+                pool.close()
+            pool = self.pools[output] = SharedFramePool(shape, self.pool_slots)
+            if output == 'inference':
+                self.padded_slots.clear()
+        pooled = pool.acquire()
+        if pooled is None:
+            # Consumers are holding every slot; never stall capture waiting for one
+            self.fallback_frames += 1
+            return None
+        buffers.append(pooled)
+        return pooled
+
+    def process(self, frame, buffers=None):
+        """
+        Size a captured frame for display and for inference
+
+        Args:
+            frame: Captured frame
+            buffers: List that receives the PooledFrames used for the outputs; None
+                     (or pool_slots=0) allocates plain arrays instead
+
+        Returns:
+            display: Display-sized frame (the capture itself when no resize or pooling is needed)
+            inference: Letterboxed inference frame, or None
+            transform: LetterboxTransform for the inference frame, or None
+        """
+        source_size = (frame.shape[1], frame.shape[0])
+        if source_size != self.source_size:
+            self._configure(source_size)
+
+        display = frame
+        width, height = self.display_size or source_size
+        pooled = self._checkout('display', (height, width) + frame.shape[2:], buffers)
+        if pooled is not None:
+            if (width, height) != source_size:
+                cv2.resize(frame, (width, height), dst=pooled.array)
+            else:
+                np.copyto(pooled.array, frame)
+            display = pooled.array
+        elif self.display_size and self.display_size != source_size:
+            display = cv2.resize(frame, self.display_size)
+
+        if not self.inference_size:
+            return display, None, None
+
+        # Published frames are shared with every subscriber, so each gets its own canvas
+        resized_width, resized_height, pad_x, pad_y = self.layout
+        pooled = self._checkout('inference', (self.inference_size, self.inference_size, 3), buffers)
+        if pooled is not None:
+            inference = pooled.array
+            # The letterbox layout only changes with the source size, so a slot's padding is filled once
+            if pooled.index not in self.padded_slots:
+                inference[:] = self.pad_value
+                self.padded_slots.add(pooled.index)
+        else:
+            inference = np.full((self.inference_size, self.inference_size, 3), self.pad_value, dtype=np.uint8)
+        cv2.resize(frame, (resized_width, resized_height),
+                   dst=inference[pad_y:pad_y + resized_height, pad_x:pad_x + resized_width])
+        return display, inference, self.transform
+
+    def get_pool_stats(self):
+        """Get the usage of each output's frame pool"""
+        stats = {output: pool.get_stats() for output, pool in self.pools.items()}
+        stats['fallback_frames'] = self.fallback_frames
+        return stats
+
+    def close(self):
+        """Release the shared memory of every frame pool"""
+        for pool in self.pools.values():
+            pool.close()
+        self.pools = {}
+
+# Building the pluggable capture backends:
+class CaptureBackend:
+    """A frame source with the cv2.VideoCapture read()/isOpened()/release() interface"""
+    kind = "capture"
+    reconnecting = False  # True if read failures are retried forever rather than ending the feed
+
+    def __init__(self, source):
+        self.source = source
+        self.frame_interval = 0.0  # Seconds between replayed frames, 0 for as fast as possible
+        self.next_frame_time = None
+
+    def open(self):
+        """Open the source; False if it can't be opened"""
+        raise NotImplementedError
+
+    def read(self):
+        """Get (ok, frame) for the next frame"""
+        raise NotImplementedError
+
+    def isOpened(self):
+        """Check if the source is open"""
+        raise NotImplementedError
+
+    def release(self):
+        """Close the source"""
+        pass
+
+    def describe(self):
+        """Short description for logs and status"""
+        return f"{self.kind}:{self.source}"
+
+    def _pace(self):
+        """Sleep until the next replayed frame is due, without accumulating drift"""
+        now = time.perf_counter()
+        if self.next_frame_time is None or now - self.next_frame_time > 1.0:
+            self.next_frame_time = now
+        delay = self.next_frame_time - now
+        if delay > 0:
+            time.sleep(delay)
+        self.next_frame_time += self.frame_interval
+
+class OpenCVCapture(CaptureBackend):
+    """cv2.VideoCapture with an explicit API preference and capture properties"""
+    kind = "opencv"
+    # Every open is serialised, so options RTSP puts in the environment never reach another open
+    _open_lock = threading.Lock()
+
+    def __init__(self, source, api_preference=cv2.CAP_ANY, properties=None):
+        super().__init__(source)
+        self.api_preference = api_preference
+        self.properties = properties or {}  # cv2.CAP_PROP_* -> value, applied after opening
+        self.cap = None
+
+    def open(self):
+        with self._open_lock:
+            self.cap = self._create_capture()
+        if not self.cap.isOpened():
+            return False
+        for prop, value in self.properties.items():
+            self.cap.set(prop, value)
+        return True
+
+    def _create_capture(self):
+        """Construct the cv2.VideoCapture; called with the open lock held"""
+        return cv2.VideoCapture(self.source, self.api_preference)
+
+    def read(self):
+        if self.cap is None:
+            return False, None
+        return self.cap.read()
+
+    def isOpened(self):
+        return self.cap is not None and self.cap.isOpened()
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+
+    def get(self, prop):
+        """Read a capture property"""
+        return self.cap.get(prop) if self.cap is not None else 0.0
+
+class WebcamCapture(OpenCVCapture):
+    """Local camera by index or /dev/video path, through V4L2 on Linux"""
+    kind = "webcam"
+
+    def __init__(self, source=0, width=None, height=None, fps=None, fourcc="MJPG", buffer_size=1):
+        # V4L2 directly avoids the GStreamer probing OpenCV otherwise tries first
+        api = cv2.CAP_V4L2 if sys.platform.startswith("linux") else cv2.CAP_ANY
+        properties = {}
+        if fourcc:
+            # MJPG lets USB cameras deliver full resolution at full frame rate
+            properties[cv2.CAP_PROP_FOURCC] = cv2.VideoWriter_fourcc(*fourcc)
+        if width:
+            properties[cv2.CAP_PROP_FRAME_WIDTH] = width
+        if height:
+            properties[cv2.CAP_PROP_FRAME_HEIGHT] = height
+        if fps:
+            properties[cv2.CAP_PROP_FPS] = fps
+        if buffer_size:
+            properties[cv2.CAP_PROP_BUFFERSIZE] = buffer_size  # Keep the driver queue short
+        super().__init__(source, api, properties)
+
+    def open(self):
+        if super().open():
+            return True
+        # Fall back to whatever backend OpenCV picks (e.g. a V4L2-less build)
+        self.api_preference = cv2.CAP_ANY
+        return super().open()
+
+class RTSPCapture(OpenCVCapture):
+    """Network stream through FFmpeg with low-latency options and reconnects"""
+    kind = "rtsp"
+    reconnecting = True
+    # FFmpeg demuxer options: no input buffering, no reordering delay, TCP to avoid UDP packet loss smears
+    LOW_LATENCY_OPTIONS = "rtsp_transport;tcp|fflags;nobuffer|flags;low_delay|max_delay;0|reorder_queue_size;0"
+
+    def __init__(self, source, transport="tcp", reconnect_interval=2.0, options=None):
+        super().__init__(source, cv2.CAP_FFMPEG, {cv2.CAP_PROP_BUFFERSIZE: 1})
+        self.options = options or self.LOW_LATENCY_OPTIONS.replace("tcp", transport)
+        self.reconnect_interval = reconnect_interval
+        self.last_reconnect = 0.0
+        self.reconnects = 0
+
+    def _create_capture(self):
+        # OpenCV only takes demuxer options from the environment, read while the capture opens;
+        # the shared open lock keeps them away from every other backend's open
+        previous = os.environ.get("OPENCV_FFMPEG_CAPTURE_OPTIONS")
+        os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = self.options
+        try:
+            return super()._create_capture()
+        finally:
+            if previous is None:
+                os.environ.pop("OPENCV_FFMPEG_CAPTURE_OPTIONS", None)
+            else:
+                os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = previous
+
+    def describe(self):
+        # Keep stream credentials out of logs and status replies
+        scheme, _, rest = str(self.source).partition("://")
+        return f"{self.kind}:{scheme}://{rest.rsplit('@', 1)[-1]}"
+
+    def read(self):
+        ret, frame = super().read()
+        if ret:
+            return ret, frame
+        # Streams drop; reopen at most once per reconnect interval instead of giving up
+        now = time.time()
+        if now - self.last_reconnect >= self.reconnect_interval:
+            self.last_reconnect = now
+            self.reconnects += 1
+            print(f"Reconnecting to {self.describe()}")
+            self.release()
+            self.open()
+        return False, None
+
+class VideoFileCapture(OpenCVCapture):
+    """Video file replay, optionally paced to the file's frame rate and looped"""
+    kind = "file"
+
+    def __init__(self, source, realtime=True, loop=False):
+        super().__init__(source)
+        self.realtime = realtime  # Pace like a live camera rather than decoding flat out
+        self.loop = loop
+
+    def open(self):
+        if not super().open():
+            return False
+        fps = self.get(cv2.CAP_PROP_FPS)
+        self.frame_interval = 1.0 / fps if self.realtime and fps > 0 else 0.0
+        self.next_frame_time = None
+        return True
+
+    def read(self):
+        ret, frame = super().read()
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = super().read()
+        if ret and self.frame_interval:
+            self._pace()
+        return ret, frame
+
+class ImageSequenceCapture(CaptureBackend):
+    """Directory of still images replayed in name order as a camera"""
+    kind = "images"
+    EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp")
+
+    def __init__(self, source, fps=10.0, loop=False):
+        super().__init__(source)
+        self.frame_interval = 1.0 / fps if fps else 0.0
+        self.loop = loop
+        self.paths = []
+        self.position = 0
+
+    def open(self):
+        if not os.path.isdir(self.source):
+            return False
+        self.paths = sorted(os.path.join(self.source, name) for name in os.listdir(self.source)
+                            if name.lower().endswith(self.EXTENSIONS))
+        self.position = 0
+        self.next_frame_time = None
+        return bool(self.paths)
+
+    def read(self):
+        while self.position < len(self.paths) or (self.loop and self.paths):
+            if self.position >= len(self.paths):
+                self.position = 0
+            path = self.paths[self.position]
+            self.position += 1
+            frame = cv2.imread(path, cv2.IMREAD_COLOR)
+            if frame is None:
+                continue  # Skip unreadable files
+            if self.frame_interval:
+                self._pace()
+            return True, frame
+        return False, None
+
+    def isOpened(self):
+        return bool(self.paths)
+
+    def release(self):
+        self.paths = []
+
+def open_capture(source, **options):
+    """
+    Pick and open a capture backend for a camera source
+
+    Args:
+        source: Device index or /dev/video path, rtsp:// (or http/rtmp) URL, image directory,
+                video file, or a CaptureBackend instance
+        options: Keyword arguments for the chosen backend (unknown ones are ignored)
+
+    Returns:
+        backend: The opened CaptureBackend
+
+    Raises:
+        ValueError: If the source can't be opened
+    """
+    if isinstance(source, CaptureBackend):
+        backend = source
+    else:
+        if isinstance(source, int) or (isinstance(source, str) and (source.isdigit() or source.startswith("/dev/video"))):
+            backend_class = WebcamCapture
+            source = int(source) if isinstance(source, str) and source.isdigit() else source
+        elif isinstance(source, str) and source.split("://", 1)[0].lower() in ("rtsp", "rtsps", "rtmp", "http", "https"):
+            backend_class = RTSPCapture
+        elif isinstance(source, str) and os.path.isdir(source):
+            backend_class = ImageSequenceCapture
+        else:
+            backend_class = VideoFileCapture
+        code = backend_class.__init__.__code__
+        accepted = code.co_varnames[1:code.co_argcount]
+        backend = backend_class(source, **{key: value for key, value in options.items() if key in accepted})
+
+    if not backend.open():
+        backend.release()
+        raise ValueError(f"Unable to open camera source {backend.describe()}")
+    return backend
+
+# Building the capture thread that feeds the frame bus:
+class CaptureWorker:
+    """Reads frames from a single capture device and publishes them to a frame bus"""
+    def __init__(self, cap, frame_bus, frame_size=(1100, 600), camera_id=1, max_read_failures=30,
+                 inference_size=None, metrics=None, pool_slots=0):
+        self.cap = cap
+        self.frame_bus = frame_bus
+        self.frame_size = frame_size
+        self.pipeline = ResolutionPipeline(frame_size, inference_size, pool_slots=pool_slots)
+        self.metrics = metrics if metrics is not None else SurveillanceMetrics()
+        self.camera_id = camera_id
+        self.max_read_failures = max_read_failures
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        """Start the capture thread"""
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        """Capture loop: the only place that calls cap.read()"""
+        failures = 0
+        while self.running:
+            start = self.metrics.start()
+            ret, frame = self.cap.read()
+            self.metrics.observe('capture', start)
+            if not ret:
+                failures += 1
+                if failures >= self.max_read_failures:
+                    if not getattr(self.cap, "reconnecting", False):
+                        print("Failed to read frame")
+                        break
+                    # Network streams keep reconnecting; just back off
+                    time.sleep(0.1)
+                    continue
+                time.sleep(0.01)
+                continue
+            failures = 0
+
+            # One resize per output straight from the captured frame, into pooled buffers when enabled
+            start = self.metrics.start()
+            buffers = []
+            display, inference, transform = self.pipeline.process(frame, buffers)
+            self.metrics.observe('resize', start)
+            self.frame_bus.publish(display, camera_id=self.camera_id, inference=inference, transform=transform,
+                                   buffers=buffers)
+
+        self.running = False
+        self.frame_bus.close()
+
+    def stop(self):
+        """Stop the capture thread and free the frame pools"""
+        self.running = False
+        if self.thread and self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1.0)
+        self.pipeline.close()
+
+# Building the camera feed used for single and multi-camera setups:
+class CameraFeed:
+    """One capture source with its own frame bus and capture thread"""
+    def __init__(self, camera_id, source, frame_size=(1100, 600), inference_size=None, metrics=None,
+                 capture_options=None, pool_slots=0):
+        self.camera_id = camera_id
+        self.source = source
+        self.frame_size = frame_size
+        self.inference_size = inference_size
+        self.metrics = metrics
+        self.capture_options = capture_options or {}  # Keyword arguments for the capture backend
+        self.cap = None
+        self.frame_bus = FrameBus(capacity=8)
+        # Shared-memory frame slots per output, 0 to disable; the bus ring alone holds capacity of them
+        self.pool_slots = max(pool_slots, self.frame_bus.capacity + 8) if pool_slots else 0
+        self.capture_worker = None
+
+    def open(self):
+        """Open the capture backend and start publishing frames on a fresh bus"""
+        self.cap = open_capture(self.source, **self.capture_options)
+        self.frame_bus = FrameBus(capacity=8)
+        self.capture_worker = CaptureWorker(self.cap, self.frame_bus, self.frame_size, self.camera_id,
+                                            inference_size=self.inference_size, metrics=self.metrics,
+                                            pool_slots=self.pool_slots)
+        self.capture_worker.start()
+
+    def get_stats(self):
+        """Get the backend, frame count and frame pool usage"""
+        stats = {
+            'open': self.is_open(),
+            'backend': self.cap.describe() if self.cap is not None else None,
+            'frames': self.frame_bus.frames_published,
+        }
+        if self.pool_slots and self.capture_worker is not None:
+            stats['frame_pool'] = self.capture_worker.pipeline.get_pool_stats()
+        return stats
+
+    def is_open(self):
+        """Check if the feed is currently capturing"""
+        return self.capture_worker is not None and self.capture_worker.running
+
+    def close(self):
+        """Stop the capture thread and release the device"""
+        if self.capture_worker is not None:
+            self.capture_worker.stop()
+            self.capture_worker = None
+        self.frame_bus.close()
+        if self.cap is not None:
+            self.cap.release()
+
+# Building the latency tracker used for detector statistics:
+class LatencyStats:
+    """Rolling window of latency samples with percentile summaries"""
+    def __init__(self, window=200):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, seconds):
+        """Record one latency sample in seconds"""
+        with self.lock:
+            self.samples.append(seconds)
+            self.count += 1
+            self.total += seconds
+
+    def percentile(self, pct):
+        """Get a latency percentile over the recent window in milliseconds"""
+        with self.lock:
+            if not self.samples:
+                return 0.0
+            return float(np.percentile(np.fromiter(self.samples, dtype=np.float64), pct)) * 1000.0
+
+    def summary(self):
+        """Get count, mean and p50/p90/p99 latency in milliseconds"""
+        return {
+            'count': self.count,
+            'mean_ms': (self.total / self.count * 1000.0) if self.count else 0.0,
+            'p50_ms': self.percentile(50),
+            'p90_ms': self.percentile(90),
+            'p99_ms': self.percentile(99),
+        }
+
+# Building the class for Async detector:
+class AsyncDetector:
+    """Runs a detection method on a long-lived worker thread fed by a latest-frame-wins mailbox"""
+    def __init__(self, detection_method, frame_bus=None):
+        self.detection_method = detection_method
+        self.results = None
+        self.thread = None
+        self.subscription = None
+
+        # Mailbox holding at most one frame; a newer frame replaces an unprocessed one
+        self._pending = None
+        self._busy = False
+        self._generation = 0  # Bumped by stop() so a lingering worker never resumes
+        self._cond = threading.Condition()
+
+        # Statistics
+        self.frames_submitted = 0
+        self.frames_processed = 0
+        self.frames_dropped = 0
+        self.errors = 0
+        self.latency = LatencyStats()
+
+        if frame_bus is not None:
+            self.attach(frame_bus)
+
+    def attach(self, frame_bus):
+        """Subscribe this detector to a frame bus"""
+        self.subscription = frame_bus.subscribe(self.detection_method.name)
+
+    def poll(self, rois=None):
+        """Post the newest frame from the bus if the mailbox is empty; True if one was posted"""
+        if self.subscription is None or not self.is_ready():
+            return False
+        packet = self.subscription.get(timeout=0)
+        if packet is None:
+            return False
+        return self.process_packet(packet, rois)
+
+    def process_frame(self, frame, rois=None):
+        """Post a bare frame (and optional regions of interest) to the mailbox"""
+        self.process_packet(FramePacket(-1, frame), rois)
+
+    def process_packet(self, packet, rois=None):
+        """Post a frame bus packet to the mailbox, replacing any packet still waiting; False if it was stale"""
+        # The mailbox holds a reference so a pooled frame isn't recycled before it is processed
+        if not packet.retain():
+            return False
+        replaced = None
+        with self._cond:
+            if self._pending is not None:
+                self.frames_dropped += 1
+                replaced = self._pending[0]
+            # Frames from the bus are read-only and shared, so no copy is needed
+            self._pending = (packet, rois)
+            self.frames_submitted += 1
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, args=(self._generation,), daemon=True)
+                self.thread.start()
+            self._cond.notify()
+        if replaced is not None:
+            replaced.release()
+        return True
+
+    def _run(self, generation):
+        """Worker loop: process mailbox frames until stopped"""
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending is not None or self._generation != generation)
+                if self._generation != generation:
+                    return
+                packet, rois = self._pending
+                self._pending = None
+                self._busy = True
+
+            start_time = time.perf_counter()
+            try:
+                results = self._detect(packet, rois)
+            except Exception as e:
+                print(f"{self.detection_method.name} detection error: {e}")
+                results = None
+            finally:
+                packet.release()
+            self.latency.add(time.perf_counter() - start_time)
+
+            with self._cond:
+                if results is not None:
+                    self.results = results
+                else:
+                    self.errors += 1
+                self.frames_processed += 1
+                self._busy = False
+
+    def _detect(self, packet, rois):
+        """Run the detection method on one packet"""
+        return self.detection_method.detect_packet(packet, rois)
+
+    def stop(self):
+        """Stop the worker thread and discard any waiting frame"""
+        with self._cond:
+            self._generation += 1
+            pending, self._pending = self._pending, None
+            self._cond.notify_all()
+        if pending is not None:
+            pending[0].release()
+        if self.thread and self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1.0)
+        self.thread = None
+
+    def get_results(self):
+        """Get the latest detection results"""
         return self.results
-    
+
     def is_ready(self):
-        """Check if detector is ready to process a new frame"""
-        return not self.processing
-    
+        """Check if the mailbox can take a new frame without dropping one"""
+        return self._pending is None
+
+    def get_stats(self):
+        """Get queue depth, dropped-frame counts and inference latency percentiles"""
+        with self._cond:
+            stats = {
+                'queue_depth': int(self._pending is not None),
+                'busy': self._busy,
+                'submitted': self.frames_submitted,
+                'processed': self.frames_processed,
+                'dropped': self.frames_dropped,
+                'errors': self.errors,
+            }
+        # Frames the detector never saw because it skipped ahead on the bus
+        stats['skipped'] = self.subscription.skipped if self.subscription else 0
+        stats['latency'] = self.latency.summary()
+        return stats
+
+# Building the detector worker processes:
+def _map_frame(reference, blocks):
+    """Turn a frame reference from the parent into an array, mapping pool slots once per process"""
+    if reference is None or isinstance(reference, np.ndarray):
+        return reference  # No frame, or a copy sent over the pipe
+    block = blocks.get(reference['name'])
+    if block is None:
+        if len(blocks) >= 128:
+            # Pools are recreated when the frame size changes; forget the old slots
+            for stale in blocks.values():
+                try:
+                    stale.close()
+                except BufferError:
+                    pass
+            blocks.clear()
+        block, frame = attach_shared_frame(reference)
+        blocks[reference['name']] = block
+        return frame
+    frame = np.ndarray(reference['shape'], dtype=np.dtype(reference['dtype']), buffer=block.buf)
+    frame.flags.writeable = False
+    return frame
+
+def _detector_process_main(conn, method_specs):
+    """Worker process: build its detection methods and run them on frames sent over conn"""
+    methods = {}
+    for key, (method_class, method_kwargs) in method_specs.items():
+        try:
+            methods[key] = method_class(**method_kwargs)
+        except Exception as e:
+            conn.send(('error', f"Failed to create {method_class.__name__}: {e}", 0.0))
+            return
+    conn.send(('ready', None, 0.0))
+
+    blocks = {}  # Shared memory name -> SharedMemory, kept mapped between frames
+    # Recent (camera_id, seq) -> mapped frames. Every method gets the same array objects
+    # for a frame, so methods sharing a YOLO engine hit its cache instead of inferring again
+    frames = {}
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message[0] == 'stop':
+            break
+        _, key, seq, frame_ref, inference_ref, transform, rois, camera_id, timestamp = message
+        start_time = time.perf_counter()
+        try:
+            mapped = frames.get((camera_id, seq))
+            if mapped is None:
+                mapped = (_map_frame(frame_ref, blocks), _map_frame(inference_ref, blocks))
+                frames[(camera_id, seq)] = mapped
+                while len(frames) > 4:
+                    del frames[next(iter(frames))]
+            packet = FramePacket(seq, mapped[0], timestamp, camera_id, mapped[1], transform)
+            reply = ('result', methods[key].detect_packet(packet, rois), time.perf_counter() - start_time)
+        except Exception as e:
+            reply = ('error', str(e), time.perf_counter() - start_time)
+        try:
+            conn.send(reply)
+        except (BrokenPipeError, OSError):
+            break
+
+    frames.clear()
+    for block in blocks.values():
+        try:
+            block.close()
+        except BufferError:
+            pass
+
+class DetectorProcess:
+    """
+    Worker process hosting one or more detection methods
+
+    Methods that load the same YOLO weights share a process, so they also share
+    its inference engine and run one forward pass per frame between them.
+    Requests from every ProcessDetector using the process are serialised.
+    """
+    def __init__(self, name, method_specs=None, start_method="spawn", load_timeout=120.0, frame_timeout=10.0):
+        self.name = name
+        self.method_specs = dict(method_specs or {})  # Method key -> (class, kwargs) built in the worker
+        # spawn gives the worker a clean interpreter: forking a threaded process that
+        # has already run torch/OpenMP code can deadlock the child
+        self.start_method = start_method
+        self.load_timeout = load_timeout  # Seconds to build the methods, including model loading
+        self.frame_timeout = frame_timeout  # Seconds per frame before the worker is restarted
+        self.process = None
+        self.conn = None
+        self.lock = threading.Lock()
+        self.users = 0  # ProcessDetectors that haven't stopped yet
+
+        # Statistics
+        self.restarts = 0
+        self.latency = LatencyStats()  # Detection time inside the worker, without IPC
+
+    def launch(self):
+        """Start the worker process now instead of on the first frame"""
+        with self.lock:
+            self._ensure_process()
+
+    def _ensure_process(self):
+        """Start (or restart) the worker and wait until its methods are built; call with the lock held"""
+        if self.process is not None and self.process.is_alive():
+            return
+        if self.process is not None:
+            self.restarts += 1
+            self._close_process()
+        context = multiprocessing.get_context(self.start_method)
+        parent_conn, child_conn = context.Pipe()
+        process = context.Process(target=_detector_process_main, args=(child_conn, self.method_specs),
+                                  name=self.name, daemon=True)
+        try:
+            process.start()
+        except Exception:
+            parent_conn.close()
+            raise
+        finally:
+            child_conn.close()
+        # Only a started process is kept, so _close_process never joins one that never ran
+        self.process = process
+        self.conn = parent_conn
+        if not self.conn.poll(self.load_timeout):
+            self._close_process()
+            raise TimeoutError(f"{self.name} did not start")
+        kind, payload, _ = self.conn.recv()
+        if kind != 'ready':
+            self._close_process()
+            raise RuntimeError(payload)
+
+    def detect(self, key, packet, frame_ref, inference_ref, rois):
+        """Run one method on a frame in the worker; the caller holds the packet until this returns"""
+        with self.lock:
+            self._ensure_process()
+            self.conn.send(('detect', key, packet.seq, frame_ref, inference_ref,
+                            packet.transform, rois, packet.camera_id, packet.timestamp))
+            if not self.conn.poll(self.frame_timeout):
+                # A hung worker would pin the pool slot forever; replace it
+                self.restarts += 1
+                self._close_process()
+                raise TimeoutError(f"{self.name} timed out")
+            kind, payload, elapsed = self.conn.recv()
+        if kind == 'error':
+            raise RuntimeError(payload)
+        self.latency.add(elapsed)
+        return payload
+
+    def _close_process(self):
+        """Stop the worker process; call with the lock held"""
+        if self.process is None:
+            return
+        try:
+            self.conn.send(('stop',))
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=2.0)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout=1.0)
+        self.conn.close()
+        self.process = None
+        self.conn = None
+
+    def release(self):
+        """Drop one user; the worker process stops once the last one has"""
+        with self.lock:
+            self.users -= 1
+            if self.users > 0:
+                return
+        if self.lock.acquire(timeout=self.frame_timeout):
+            try:
+                self._close_process()
+            finally:
+                self.lock.release()
+        elif self.process is not None:
+            self.process.terminate()
+
+    def get_stats(self):
+        """Get the worker's pid, methods, restarts and in-worker latency"""
+        return {
+            'name': self.name,
+            'pid': self.process.pid if self.process is not None else None,
+            'alive': self.process is not None and self.process.is_alive(),
+            'methods': list(self.method_specs),
+            'restarts': self.restarts,
+            'latency': self.latency.summary(),
+        }
+
+class ProcessDetector(AsyncDetector):
+    """
+    AsyncDetector whose detection method runs in a DetectorProcess
+
+    Frames from a shared-memory frame pool are passed by name, so the worker maps
+    them without a copy; other frames are pickled over the pipe. Detections come
+    back over the same pipe. The local detection method instance is still used
+    for drawing and status text.
+    """
+    def __init__(self, detection_method, worker, method_key, frame_bus=None):
+        super().__init__(detection_method, frame_bus)
+        self.worker = worker
+        self.method_key = method_key  # Which of the worker's methods runs this detector's frames
+        with worker.lock:
+            worker.users += 1
+        self._released = False
+
+        # Statistics
+        self.frames_shared = 0  # Frames passed by shared-memory name
+        self.frames_copied = 0  # Frames pickled because they didn't come from a pool
+
+    def launch(self):
+        """Start the worker process now instead of on the first frame"""
+        self.worker.launch()
+
+    def _frame_reference(self, frame, packet):
+        """Describe a frame by its pool slot, or fall back to sending the array itself"""
+        if frame is None:
+            return None
+        for buffer in packet.buffers:
+            if buffer.array is frame:
+                self.frames_shared += 1
+                return buffer.descriptor()
+        self.frames_copied += 1
+        return frame
+
+    def _detect(self, packet, rois):
+        """Run the detection method in the worker process"""
+        return self.worker.detect(self.method_key, packet, self._frame_reference(packet.frame, packet),
+                                  self._frame_reference(packet.inference, packet), rois)
+
+    def stop(self):
+        """Stop the worker thread and, if no other detector uses it, the worker process"""
+        super().stop()
+        if not self._released:
+            self._released = True
+            self.worker.release()
+
+    def get_stats(self):
+        """Get the AsyncDetector statistics plus worker process details"""
+        stats = super().get_stats()
+        stats['process'] = dict(self.worker.get_stats(), frames_shared=self.frames_shared,
+                                frames_copied=self.frames_copied)
+        return stats
+
+# Building the batched inference worker for multi-camera mode:
+class BatchInferenceWorker:
+    """Runs one batched YOLO pass over the latest frame of every camera"""
+    def __init__(self, engine, cameras, on_results, max_batch_size=16):
+        self.engine = engine
+        self.cameras = cameras
+        self.on_results = on_results
+        self.max_batch_size = max_batch_size
+        self.subscriptions = []
+        self.running = False
+        self.thread = None
+        self.batches = 0
+        self.frames = 0
+        self.latency = LatencyStats()
+
+    def start(self):
+        """Subscribe to every camera and start the batching thread"""
+        self.subscriptions = [feed.frame_bus.subscribe("batch") for feed in self.cameras]
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        """Collect the newest frame per camera and run them as one batch"""
+        while self.running:
+            # Held for the whole batch so pooled frames aren't recycled mid-inference
+            packets = [packet for packet in (sub.get(timeout=0) for sub in self.subscriptions)
+                       if packet is not None and packet.retain()]
+            if not packets:
+                if all(sub.frame_bus.closed for sub in self.subscriptions):
+                    break
+                time.sleep(0.005)
+                continue
+
+            try:
+                self._run_batches(packets)
+            finally:
+                for packet in packets:
+                    packet.release()
+
+        self.running = False
+
+    def _run_batches(self, packets):
+        """Infer the packets in batches of at most max_batch_size and route the results"""
+        for i in range(0, len(packets), self.max_batch_size):
+            batch = packets[i:i + self.max_batch_size]
+            start_time = time.perf_counter()
+            try:
+                results = self.engine.infer_batch([packet.frame if packet.inference is None else packet.inference
+                                                   for packet in batch])
+            except Exception as e:
+                print(f"Batch inference error: {e}")
+                continue
+            self.latency.add(time.perf_counter() - start_time)
+            self.batches += 1
+            self.frames += len(batch)
+
+            for packet, detections in zip(batch, results):
+                if packet.transform is not None:
+                    # Copies, so the engine's cached boxes stay in inference coordinates
+                    detections = packet.transform.to_display([dict(d) for d in detections])
+                self.on_results(packet, detections)
+
+    def stop(self):
+        """Stop the batching thread"""
+        self.running = False
+        if self.thread and self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1.0)
+
+    def get_stats(self):
+        """Get batch count, mean batch size and batch latency"""
+        return {
+            'batches': self.batches,
+            'frames': self.frames,
+            'mean_batch_size': self.frames / self.batches if self.batches else 0.0,
+            'latency': self.latency.summary(),
+        }
+
+# Building the motion-gated scheduler for the expensive detectors:
+class MotionGatedScheduler:
+    """Runs expensive detectors only while there is motion, plus a keep-alive pass for static scenes"""
+    def __init__(self, gated_methods=("yolo", "person", "face"), keepalive_interval=5.0, hold_time=1.0):
+        self.gated_methods = set(gated_methods)
+        self.keepalive_interval = keepalive_interval  # Seconds between runs when nothing moves
+        self.hold_time = hold_time  # Seconds to keep running after motion stops
+        self.last_motion_time = None
+        self.last_dispatch = {}
+        self.dispatched = {}
+        self.gated = {}
+
+    def update_motion(self, motion_detections, now=None):
+        """Feed the latest motion detector result"""
+        if motion_detections:
+            self.last_motion_time = time.time() if now is None else now
+
+    def motion_active(self, now=None):
+        """Check if motion was seen within the hold time"""
+        now = time.time() if now is None else now
+        return self.last_motion_time is not None and now - self.last_motion_time <= self.hold_time
+
+    def should_run(self, method_name, now=None):
+        """Decide whether a detector may take a new frame now"""
+        if method_name not in self.gated_methods:
+            return True
+        now = time.time() if now is None else now
+        if self.motion_active(now):
+            return True
+        last = self.last_dispatch.get(method_name)
+        return last is None or now - last >= self.keepalive_interval
+
+    def mark_dispatched(self, method_name, now=None):
+        """Record that a detector was given a frame"""
+        self.last_dispatch[method_name] = time.time() if now is None else now
+        self.dispatched[method_name] = self.dispatched.get(method_name, 0) + 1
+
+    def mark_gated(self, method_name):
+        """Record a frame a ready detector did not run on because the scene was static"""
+        self.gated[method_name] = self.gated.get(method_name, 0) + 1
+
+    def get_stats(self):
+        """Get per-method dispatched and gated frame counts"""
+        return {
+            'motion_active': self.motion_active(),
+            'dispatched': dict(self.dispatched),
+            'gated': dict(self.gated),
+        }
+
+# Retention priority of a recording segment by what triggered it; higher is kept longer
+SEGMENT_PRIORITIES = {"motion": 0, "noise": 0, "yolo": 1, "face": 2, "person": 2}
+MANUAL_SEGMENT_PRIORITY = 3
+
+# Building the recording segment manager with retention:
+class RecordingSegmentManager:
+    """Indexes fixed-length recording segments and evicts them in the background to stay within a disk budget"""
+    def __init__(self, folder, segment_seconds=60.0, max_storage_gb=20.0, max_age_days=30.0,
+                 min_free_gb=1.0, check_interval=30.0):
+        self.folder = folder
+        self.segment_seconds = segment_seconds  # Video length of one file
+        self.max_bytes = int(max_storage_gb * 1024 ** 3) if max_storage_gb else None
+        self.max_age = max_age_days * 86400 if max_age_days else None
+        self.min_free_bytes = int(min_free_gb * 1024 ** 3) if min_free_gb else 0  # Free space kept on the disk
+        self.check_interval = check_interval
+        self.open_paths = set()  # Segments still being written are never evicted
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.running = False
+        self.thread = None
+
+        # Statistics
+        self.evicted = 0
+        self.evicted_bytes = 0
+        self.on_evict = None  # Called with the path of each deleted segment
+
+        os.makedirs(folder, exist_ok=True)
+        self.connection = sqlite3.connect(os.path.join(folder, "segments.db"), check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                """CREATE TABLE IF NOT EXISTS segments (
+                       path TEXT PRIMARY KEY,
+                       start_time REAL NOT NULL,
+                       end_time REAL,
+                       frames INTEGER NOT NULL DEFAULT 0,
+                       bytes INTEGER NOT NULL DEFAULT 0,
+                       priority INTEGER NOT NULL DEFAULT 0,
+                       triggers TEXT NOT NULL DEFAULT '')""")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS segments_eviction ON segments (priority, start_time)")
+        self._adopt_files()
+
+    def _adopt_files(self):
+        """Index recordings the index doesn't know yet (e.g. from older versions), and drop rows whose file is gone"""
+        with self.lock, self.connection:
+            known = {row[0] for row in self.connection.execute("SELECT path FROM segments")}
+            for path in known:
+                if not os.path.exists(path):
+                    self.connection.execute("DELETE FROM segments WHERE path = ?", (path,))
+            for root, _, names in os.walk(self.folder):
+                for name in names:
+                    path = os.path.join(root, name)
+                    if name.startswith("recording_") and name.endswith(".mp4") and path not in known:
+                        stat = os.stat(path)
+                        self.connection.execute(
+                            "INSERT INTO segments (path, start_time, end_time, bytes) VALUES (?, ?, ?, ?)",
+                            (path, stat.st_mtime, stat.st_mtime, stat.st_size))
+            # A segment left open by a crash ended when its file was last written
+            for path, in self.connection.execute("SELECT path FROM segments WHERE end_time IS NULL").fetchall():
+                stat = os.stat(path)
+                self.connection.execute("UPDATE segments SET end_time = ?, bytes = ? WHERE path = ?",
+                                        (stat.st_mtime, stat.st_size, path))
+
+    def start(self):
+        """Start the background eviction thread"""
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._janitor, daemon=True)
+        self.thread.start()
+
+    def open_segment(self, start_time=None):
+        """Create the index row for a new segment and get its path"""
+        start_time = time.time() if start_time is None else start_time
+        stamp = datetime.fromtimestamp(start_time)
+        day_folder = os.path.join(self.folder, stamp.strftime("%Y%m%d"))
+        os.makedirs(day_folder, exist_ok=True)
+        path = os.path.join(day_folder, f"recording_{stamp.strftime('%Y%m%d_%H%M%S')}.mp4")
+        suffix = 1
+        while os.path.exists(path) or path in self.open_paths:
+            path = os.path.join(day_folder, f"recording_{stamp.strftime('%Y%m%d_%H%M%S')}_{suffix}.mp4")
+            suffix += 1
+        with self.lock, self.connection:
+            self.open_paths.add(path)
+            self.connection.execute("INSERT OR REPLACE INTO segments (path, start_time) VALUES (?, ?)",
+                                    (path, start_time))
+        return path
+
+    def close_segment(self, path, frames, priority=0, triggers=()):
+        """Record a finished segment's size, priority and what triggered it"""
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        with self.lock, self.connection:
+            self.open_paths.discard(path)
+            self.connection.execute(
+                "UPDATE segments SET end_time = ?, frames = ?, bytes = ?, priority = ?, triggers = ? WHERE path = ?",
+                (time.time(), frames, size, priority, ",".join(sorted(triggers)), path))
+        self.wake.set()  # Re-check the budget now that the total grew
+
+    def _janitor(self):
+        """Background loop: evict segments until the age, size and free-space limits hold"""
+        while self.running:
+            try:
+                self.enforce()
+            except (OSError, sqlite3.Error) as e:
+                print(f"Recording retention error: {e}")
+            self.wake.wait(self.check_interval)
+            self.wake.clear()
+
+    def enforce(self):
+        """Delete segments over the limits; lowest priority first, oldest first within a priority"""
+        now = time.time()
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT path, start_time, bytes FROM segments WHERE end_time IS NOT NULL"
+                " ORDER BY priority, start_time").fetchall()
+            rows = [row for row in rows if row[0] not in self.open_paths]
+            total = self.connection.execute("SELECT COALESCE(SUM(bytes), 0) FROM segments").fetchone()[0]
+
+        free = shutil.disk_usage(self.folder).free
+        victims = [row for row in rows if self.max_age and now - row[1] > self.max_age]
+        excess = max(total - self.max_bytes if self.max_bytes else 0,
+                     self.min_free_bytes - free if self.min_free_bytes else 0)
+        excess -= sum(row[2] for row in victims)
+        expired = {row[0] for row in victims}
+        for row in rows:
+            if excess <= 0:
+                break
+            if row[0] not in expired:
+                victims.append(row)
+                excess -= row[2]
+
+        for path, _, size in victims:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            with self.lock, self.connection:
+                self.connection.execute("DELETE FROM segments WHERE path = ?", (path,))
+            self.evicted += 1
+            self.evicted_bytes += size
+            if self.on_evict is not None:
+                self.on_evict(path)
+        return len(victims)
+
+    def get_segments(self, start=None, end=None, min_priority=0):
+        """Get indexed segments overlapping a time range, oldest first"""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT path, start_time, end_time, frames, bytes, priority, triggers FROM segments"
+                " WHERE priority >= ? AND (end_time IS NULL OR end_time >= ?) AND start_time < ?"
+                " ORDER BY start_time",
+                (min_priority, start or 0, end or float('inf'))).fetchall()
+        return [{'path': row[0], 'start_time': row[1], 'end_time': row[2], 'frames': row[3], 'bytes': row[4],
+                 'priority': row[5], 'triggers': row[6].split(",") if row[6] else []} for row in rows]
+
+    def get_storage_report(self):
+        """Get recorded bytes per priority, the budget, free disk space and eviction totals"""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT priority, COUNT(*), COALESCE(SUM(bytes), 0), MIN(start_time), MAX(start_time)"
+                " FROM segments GROUP BY priority").fetchall()
+        disk = shutil.disk_usage(self.folder)
+        return {
+            'segments': sum(row[1] for row in rows),
+            'bytes': sum(row[2] for row in rows),
+            'by_priority': {row[0]: {'segments': row[1], 'bytes': row[2]} for row in rows},
+            'oldest': min((row[3] for row in rows), default=None),
+            'newest': max((row[4] for row in rows), default=None),
+            'budget_bytes': self.max_bytes,
+            'max_age_days': self.max_age / 86400 if self.max_age else None,
+            'disk_free_bytes': disk.free,
+            'disk_total_bytes': disk.total,
+            'evicted': self.evicted,
+            'evicted_bytes': self.evicted_bytes,
+        }
+
+    def stop(self):
+        """Stop the eviction thread"""
+        self.running = False
+        self.wake.set()
+        if self.thread and self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout=2.0)
+        self.thread = None
+
+# Building the event recorder with pre-roll and a background encoder:
+class EventRecorder:
+    """Records camera frames with a compressed pre-roll buffer and a background video encoder"""
+    def __init__(self, output_folder, fps=20.0, pre_roll_seconds=5.0, post_roll_seconds=3.0,
+                 quiet_period=5.0, jpeg_quality=85, queue_size=120, metrics=None, segments=None):
+        self.output_folder = output_folder
+        self.segments = segments  # RecordingSegmentManager, or None for one unmanaged file per recording
+        self.metrics = metrics if metrics is not None else SurveillanceMetrics()
+        self.fps = fps
+        self.pre_roll_seconds = pre_roll_seconds
+        self.post_roll_seconds = post_roll_seconds  # Extra seconds kept after an event ends
+        self.quiet_period = quiet_period  # Seconds without detections before an event ends
+        self.jpeg_quality = jpeg_quality
+
+        self.pre_roll = deque()  # (timestamp, JPEG bytes) of the last pre_roll_seconds
+        self.write_queue = Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+
+        self.is_recording = False
+        self.manual = False  # Manual recordings never stop on their own
+        self.recording_start_time = None
+        self.last_trigger_time = None
+        self.output_path = None
+        self.frame_size = None
+        self.frames_written = 0
+        self.frames_dropped = 0
+        # What triggered the current segment; snapshotted into the message that closes it
+        self.segment_priority = 0
+        self.segment_triggers = set()
+        self.segment_started = None  # Capture time of the current segment's first live frame
+        self.segment_seconds = segments.segment_seconds if segments is not None else 0
+
+        self.running = False
+        self.capture_thread = None
+        self.writer_thread = None
+
+    def start(self, frame_bus):
+        """Start buffering frames from the bus and the background encoder"""
+        self.running = True
+        self.capture_thread = threading.Thread(target=self._capture_loop, args=(frame_bus,), daemon=True)
+        self.capture_thread.start()
+        if self.writer_thread is None or not self.writer_thread.is_alive():
+            self.writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
+            self.writer_thread.start()
+
+    def _capture_loop(self, frame_bus):
+        """Consume every published frame: pre-roll while idle, encoder queue while recording"""
+        subscription = frame_bus.subscribe("recorder", latest_only=False)
+        while self.running and not frame_bus.closed:
+            packet = subscription.get(timeout=0.5)
+            if packet is None or not packet.retain():
+                continue
+            frame = packet.frame
+            self.frame_size = (frame.shape[1], frame.shape[0])
+
+            with self.lock:
+                recording = self.is_recording
+                if recording and not self.manual:
+                    # Auto-stop once the event has been quiet for the quiet period plus post-roll
+                    if packet.timestamp - self.last_trigger_time > self.quiet_period + self.post_roll_seconds:
+                        self._stop_locked()
+                        recording = False
+
+            start = self.metrics.start()
+            if recording:
+                # The queued frame keeps its reference until the encoder has written it
+                if self._enqueue(('frame', frame, packet)):
+                    # Tracked under the lock, as _start_locked resets it
+                    with self.lock:
+                        if self.segment_started is None:
+                            # Timed from the first live frame, so the pre-roll doesn't shorten the segment
+                            self.segment_started = packet.timestamp
+                        elif (self.is_recording and self.segment_seconds
+                              and packet.timestamp - self.segment_started >= self.segment_seconds):
+                            # Fixed-length segments keep every file small enough to evict on its own;
+                            # measured in capture time, whatever the camera's actual frame rate
+                            self.write_queue.put(('rotate',) + self._take_segment_locked())
+                            self.segment_started = None
+                else:
+                    packet.release()
+            else:
+                self._buffer_pre_roll(packet.timestamp, frame)
+                packet.release()
+            self.metrics.observe('record', start)
+
+    def _buffer_pre_roll(self, timestamp, frame):
+        """Keep the last pre_roll_seconds of frames as JPEG bytes"""
+        if self.pre_roll_seconds <= 0:
+            return
+        ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not ok:
+            return
+        with self.lock:
+            self.pre_roll.append((timestamp, buffer.tobytes()))
+            while self.pre_roll and timestamp - self.pre_roll[0][0] > self.pre_roll_seconds:
+                self.pre_roll.popleft()
+
+    def _enqueue(self, item):
+        """Queue a frame for the encoder, dropping it rather than stalling capture; False if dropped"""
+        try:
+            self.write_queue.put_nowait(item)
+            return True
+        except Full:
+            self.frames_dropped += 1
+            return False
+
+    def trigger(self, methods=()):
+        """Report a detection by the given methods: starts an event recording or extends the current one"""
+        with self.lock:
+            self.last_trigger_time = time.time()
+            self.segment_triggers.update(methods)
+            self.segment_priority = max([self.segment_priority] + [SEGMENT_PRIORITIES.get(m, 0) for m in methods])
+            if not self.is_recording:
+                self._start_locked(manual=False)
+
+    def start_recording(self, manual=True):
+        """Start recording now, including the pre-roll"""
+        with self.lock:
+            self.last_trigger_time = time.time()
+            if manual:
+                self.segment_triggers.add("manual")
+                self.segment_priority = MANUAL_SEGMENT_PRIORITY
+            if self.is_recording:
+                self.manual = self.manual or manual
+                return
+            self._start_locked(manual)
+
+    def stop_recording(self):
+        """Stop the current recording"""
+        with self.lock:
+            self._stop_locked()
+
+    def _start_locked(self, manual):
+        """Open a new file on the encoder and flush the pre-roll into it; call with the lock held"""
+        if self.frame_size is None:
+            return
+        self.output_path = None  # Set by the encoder once it has opened the file
+        self.is_recording = True
+        self.manual = manual
+        self.recording_start_time = time.time()
+
+        # Control messages must not be dropped, so they block briefly if the queue is full
+        self.write_queue.put(('open', self.frame_size))
+        self.segment_started = None
+        for _, jpeg in self.pre_roll:
+            self._enqueue(('jpeg', jpeg))
+        self.pre_roll.clear()
+
+    def _stop_locked(self):
+        """Close the current file on the encoder; call with the lock held"""
+        if not self.is_recording:
+            return
+        self.is_recording = False
+        self.write_queue.put(('close',) + self._take_segment_locked())
+        duration = time.time() - self.recording_start_time
+        print(f"Recording stopped. Duration: {duration:.2f} seconds")
+
+    def _take_segment_locked(self):
+        """Snapshot what triggered the segment being closed and reset for the next; call with the lock held"""
+        snapshot = (self.segment_priority, self.segment_triggers)
+        if self.is_recording:
+            # A recording that carries on into the next segment keeps its priority, so an
+            # event's later segments (post-roll included) aren't evicted before its first
+            self.segment_triggers = set(self.segment_triggers)
+        else:
+            self.segment_priority = 0
+            self.segment_triggers = set()
+        return snapshot
+
+    def _open_file(self, frame_size):
+        """Open the next output file; call on the encoder thread"""
+        if self.segments is not None:
+            path = self.segments.open_segment()
+        else:
+            path = os.path.join(self.output_folder, f"recording_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mp4")
+        self.output_path = path
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        return cv2.VideoWriter(path, fourcc, self.fps, frame_size), path
+
+    def _close_file(self, video_writer, path, frames, priority=0, triggers=()):
+        """Finish a file and hand the segment, with what triggered it, to the segment index"""
+        video_writer.release()
+        if self.segments is not None:
+            self.segments.close_segment(path, frames, priority, triggers)
+
+    def _writer_loop(self):
+        """Background encoder: the only place that touches cv2.VideoWriter"""
+        video_writer = None
+        path = None
+        frame_size = None
+        segment_frames = 0
+        continuing = False  # A segment ended mid-recording; the next one opens with the next frame
+        while True:
+            item = self.write_queue.get()
+            kind = item[0]
+            if kind == 'open':
+                if video_writer is not None:
+                    self._close_file(video_writer, path, segment_frames)
+                frame_size = item[1]
+                video_writer, path = self._open_file(frame_size)
+                segment_frames = 0
+                continuing = False
+                print(f"Started recording: {path}")
+            elif kind == 'close' or kind == 'rotate' or kind == 'exit':
+                if video_writer is not None:
+                    self._close_file(video_writer, path, segment_frames, *item[1:])
+                    video_writer = None
+                continuing = kind == 'rotate'
+                if kind == 'exit':
+                    return
+            elif video_writer is not None or continuing:
+                frame = cv2.imdecode(np.frombuffer(item[1], np.uint8), cv2.IMREAD_COLOR) if kind == 'jpeg' else item[1]
+                if frame is not None:
+                    if video_writer is None:
+                        video_writer, path = self._open_file(frame_size)
+                        segment_frames = 0
+                        continuing = False
+                    start = self.metrics.start()
+                    video_writer.write(frame)
+                    self.metrics.observe('record_write', start)
+                    self.frames_written += 1
+                    segment_frames += 1
+            if kind == 'frame':
+                item[2].release()
+
+    def stop(self):
+        """Stop buffering, finish the current file and wait for the encoder to drain"""
+        self.running = False
+        if self.capture_thread and self.capture_thread.is_alive() and self.capture_thread is not threading.current_thread():
+            self.capture_thread.join(timeout=1.0)
+        self.stop_recording()
+        if self.writer_thread and self.writer_thread.is_alive():
+            self.write_queue.put(('exit',))
+            self.writer_thread.join(timeout=5.0)
+        self.writer_thread = None
+        with self.lock:
+            self.pre_roll.clear()
+
+    def get_stats(self):
+        """Get recorder state and encoder queue statistics"""
+        return {
+            'recording': self.is_recording,
+            'output_path': self.output_path,
+            'pre_roll_frames': len(self.pre_roll),
+            'queue_depth': self.write_queue.qsize(),
+            'frames_written': self.frames_written,
+            'frames_dropped': self.frames_dropped,
+        }
+
+# Lower number = spoken first
+ALERT_PRIORITIES = {"person": 0, "face": 1, "yolo": 2, "noise": 3, "motion": 4}
+
+# Building the speech alert dispatcher:
+class AlertDispatcher:
+    """Speaks detection alerts on a dedicated worker so a blocking TTS call never stalls the video loop"""
+    def __init__(self, speak_callback, rate_limit=10.0, max_age=10.0, priorities=None):
+        self.speak_callback = speak_callback
+        self.rate_limit = rate_limit  # Minimum seconds between two alerts of the same class
+        self.max_age = max_age  # Alerts waiting longer than this are dropped as stale
+        self.priorities = priorities or ALERT_PRIORITIES
+        self.pending = {}  # method_name -> (priority, queued_at, text); one alert per class
+        self.last_spoken = {}
+        self.condition = threading.Condition()
+        self.running = False
+        self.thread = None
+
+        # Statistics
+        self.submitted = 0
+        self.spoken = 0
+        self.coalesced = 0
+        self.rate_limited = 0
+        self.expired = 0
+        self.errors = 0
+
+    def start(self):
+        """Start the speech worker"""
+        if self.speak_callback is None or (self.thread is not None and self.thread.is_alive()):
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.thread.start()
+
+    def submit(self, method_name, text):
+        """
+        Queue an alert without blocking
+
+        Returns:
+            queued: False when the alert was rate limited or no speaker is attached
+        """
+        if self.speak_callback is None:
+            return False
+        now = time.time()
+        with self.condition:
+            self.submitted += 1
+            if now - self.last_spoken.get(method_name, float('-inf')) < self.rate_limit:
+                self.rate_limited += 1
+                return False
+            if method_name in self.pending:
+                # Same class already waiting: keep its place in line, speak the newest text
+                priority, queued_at, _ = self.pending[method_name]
+                self.pending[method_name] = (priority, queued_at, text)
+                self.coalesced += 1
+                return True
+            self.pending[method_name] = (self.priorities.get(method_name, len(self.priorities)), now, text)
+            self.condition.notify()
+        return True
+
+    def _worker(self):
+        """Speak the most important pending alert, one at a time"""
+        while True:
+            with self.condition:
+                while self.running and not self.pending:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                method_name = min(self.pending, key=lambda name: self.pending[name][:2])
+                _, queued_at, text = self.pending.pop(method_name)
+                now = time.time()
+                if now - queued_at > self.max_age:
+                    self.expired += 1
+                    continue
+                self.last_spoken[method_name] = now
+
+            try:
+                self.speak_callback(text)
+                self.spoken += 1
+            except Exception as e:
+                self.errors += 1
+                print(f"Error speaking alert: {e}")
+
+    def stop(self):
+        """Drop pending alerts and stop the worker after the current one"""
+        with self.condition:
+            self.running = False
+            self.pending.clear()
+            self.condition.notify_all()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1.0)
+        self.thread = None
+
+    def get_stats(self):
+        """Get alert counters"""
+        with self.condition:
+            return {
+                'pending': len(self.pending),
+                'submitted': self.submitted,
+                'spoken': self.spoken,
+                'coalesced': self.coalesced,
+                'rate_limited': self.rate_limited,
+                'expired': self.expired,
+                'errors': self.errors,
+            }
+
+# Building the detection event aggregator:
+class DetectionEventAggregator:
+    """Turns per-frame detections into debounced start/update/end events with per-day counters"""
+    def __init__(self, grid=(3, 3), end_timeout=3.0, update_interval=5.0, min_update_gap=1.0):
+        self.grid = grid  # (columns, rows) of the coarse region grid used to tell events apart
+        self.end_timeout = end_timeout  # Seconds an event survives without being seen
+        self.update_interval = update_interval  # Heartbeat for long-running events
+        self.min_update_gap = min_update_gap  # Rate limit for count-change updates
+        self.active = {}  # (camera_id, method, class, region) -> event
+        self.next_event_id = 1
+        self.day = datetime.now().date()
+        self.daily_counts = {}  # (camera_id, class) -> events started today
+        self.lock = threading.Lock()
+
+    def _region(self, box, frame_shape):
+        """Map a box centre to a cell of the coarse region grid"""
+        x, y, w, h = box
+        height, width = frame_shape[:2]
+        columns, rows = self.grid
+        column = min(columns - 1, max(0, int((x + w / 2) * columns / width)))
+        row = min(rows - 1, max(0, int((y + h / 2) * rows / height)))
+        return row * columns + column
+
+    def _follow(self, key, seen, now):
+        """
+        Move an open event that left a neighbouring cell into this key; call with the lock held
+
+        Someone walking across the frame changes cell, but it is still one visit.
+
+        Returns:
+            event: The moved event, or None if nothing nearby matches
+        """
+        columns = self.grid[0]
+        row, column = divmod(key[3], columns)
+        best_key = None
+        for other_key, event in self.active.items():
+            # Same camera, method and class, not seen in its own cell this frame, and not yet ended
+            if other_key[:3] != key[:3] or other_key in seen or now - event['last_seen'] > self.end_timeout:
+                continue
+            other_row, other_column = divmod(other_key[3], columns)
+            if abs(other_row - row) <= 1 and abs(other_column - column) <= 1:
+                if best_key is None or event['last_seen'] > self.active[best_key]['last_seen']:
+                    best_key = other_key
+        if best_key is None:
+            return None
+        event = self.active.pop(best_key)
+        event['region'] = key[3]
+        self.active[key] = event
+        return event
+
+    def _roll_day(self):
+        """Reset the per-day counters at midnight"""
+        today = datetime.now().date()
+        if today != self.day:
+            self.day = today
+            self.daily_counts = {}
+
+    def update(self, camera_id, detections_by_method, frame_shape, now=None):
+        """
+        Feed the latest detections for one camera
+
+        Args:
+            camera_id: Camera the detections belong to
+            detections_by_method: {method_name: detections}; missing methods count as empty
+            frame_shape: Shape of the frame the boxes refer to
+            now: Timestamp, defaults to the current time
+
+        Returns:
+            events: List of (kind, event) with kind 'start', 'update' or 'end'
+        """
+        now = time.time() if now is None else now
+        seen = {}
+        for method_name, detections in detections_by_method.items():
+            for detection in detections:
+                key = (camera_id, method_name, detection["class"], self._region(detection["box"], frame_shape))
+                observation = seen.setdefault(key, {'count': 0, 'confidence': 0.0, 'box': detection["box"]})
+                observation['count'] += 1
+                if detection["confidence"] >= observation['confidence']:
+                    observation['confidence'] = float(detection["confidence"])
+                    observation['box'] = [int(v) for v in detection["box"]]
+
+        events = []
+        with self.lock:
+            self._roll_day()
+            for key, observation in seen.items():
+                event = self.active.get(key)
+                if event is None:
+                    event = self._follow(key, seen, now)
+                if event is None:
+                    event = {
+                        'id': self.next_event_id,
+                        'camera_id': camera_id,
+                        'method': key[1],
+                        'class': key[2],
+                        'region': key[3],
+                        'start_time': now,
+                        'last_seen': now,
+                        'last_update': now,
+                        **observation,
+                    }
+                    self.next_event_id += 1
+                    self.active[key] = event
+                    counter_key = (camera_id, key[2])
+                    self.daily_counts[counter_key] = self.daily_counts.get(counter_key, 0) + 1
+                    events.append(('start', dict(event)))
+                    continue
+
+                changed = observation['count'] != event['count']
+                event.update(observation)
+                event['last_seen'] = now
+                since_update = now - event['last_update']
+                if (changed and since_update >= self.min_update_gap) or since_update >= self.update_interval:
+                    event['last_update'] = now
+                    events.append(('update', dict(event)))
+
+            for key, event in list(self.active.items()):
+                if key[0] == camera_id and key not in seen and now - event['last_seen'] > self.end_timeout:
+                    del self.active[key]
+                    events.append(('end', dict(event)))
+        return events
+
+    def get_daily_count(self, camera_id, class_name):
+        """Get how many events of a class started today on a camera"""
+        with self.lock:
+            self._roll_day()
+            return self.daily_counts.get((camera_id, class_name), 0)
+
+    def get_daily_counts(self):
+        """Get today's event counts per class, summed over all cameras"""
+        with self.lock:
+            self._roll_day()
+            totals = {}
+            for (_, class_name), count in self.daily_counts.items():
+                totals[class_name] = totals.get(class_name, 0) + count
+            return totals
+
+# Building the persistent detection event store:
+class DetectionEventStore:
+    """SQLite history of detection events, written in batches by a background thread"""
+    SCHEMA = [
+        """CREATE TABLE IF NOT EXISTS events (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               camera_id INTEGER NOT NULL,
+               method TEXT NOT NULL,
+               class TEXT NOT NULL,
+               region INTEGER,
+               start_time REAL NOT NULL,
+               end_time REAL,
+               last_seen REAL NOT NULL,
+               max_count INTEGER NOT NULL,
+               confidence REAL NOT NULL,
+               box TEXT,
+               recording_path TEXT,
+               screenshot_path TEXT)""",
+        "CREATE INDEX IF NOT EXISTS events_time ON events (start_time)",
+        "CREATE INDEX IF NOT EXISTS events_class_time ON events (class, start_time)",
+        "CREATE INDEX IF NOT EXISTS events_camera_time ON events (camera_id, start_time)",
+        "CREATE INDEX IF NOT EXISTS events_open ON events (camera_id) WHERE end_time IS NULL",
+        "CREATE INDEX IF NOT EXISTS events_recording ON events (recording_path) WHERE recording_path IS NOT NULL",
+    ]
+
+    def __init__(self, path, batch_size=200, flush_interval=1.0, queue_size=10000):
+        self.path = path
+        self.batch_size = batch_size  # Most operations committed in one transaction
+        self.flush_interval = flush_interval  # Seconds a queued operation may wait for its batch
+        self.queue = Queue(maxsize=queue_size)
+        self.thread = None
+
+        # Statistics
+        self.events_written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def _connect(self):
+        """Open a connection with the schema in place"""
+        connection = sqlite3.connect(self.path, timeout=5.0)
+        connection.row_factory = sqlite3.Row
+        # WAL lets queries read while the writer commits
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        for statement in self.SCHEMA:
+            connection.execute(statement)
+        return connection
+
+    def start(self):
+        """Start the writer thread"""
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self.thread.start()
+
+    def record(self, kind, event, recording_path=None):
+        """
+        Queue an aggregator event for writing
+
+        Args:
+            kind: 'start', 'update' or 'end' from DetectionEventAggregator.update()
+            event: The event dict
+            recording_path: Recording in progress while the event was seen, if any
+        """
+        self._put(('event', kind, dict(event), recording_path))
+
+    def link_screenshot(self, path):
+        """Attach a screenshot to every event that is still open"""
+        self._put(('screenshot', path))
+
+    def unlink_recording(self, path):
+        """Forget a recording that retention deleted"""
+        self._put(('unlink', path))
+
+    def _put(self, item):
+        """Queue an operation, dropping it rather than stalling the frame loop"""
+        try:
+            self.queue.put_nowait(item)
+        except Full:
+            self.dropped += 1
+
+    def _writer_loop(self):
+        """Background writer: the only thread that writes to the database"""
+        connection = self._connect()
+        # Events left open by an earlier run ended when they were last seen
+        with connection:
+            connection.execute("UPDATE events SET end_time = last_seen WHERE end_time IS NULL")
+        rows = {}  # Aggregator event id -> row id of this run's events
+        running = True
+        while running:
+            item = self.queue.get()
+            batch = [item]
+            deadline = time.time() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1][0] not in ('flush', 'exit'):
+                try:
+                    batch.append(self.queue.get(timeout=max(0.0, deadline - time.time())))
+                except Empty:
+                    break
+
+            try:
+                with connection:
+                    for item in batch:
+                        if item[0] == 'event':
+                            self._write_event(connection, rows, *item[1:])
+                        elif item[0] == 'screenshot':
+                            # Operations apply in order, so open rows are the events on screen
+                            connection.execute("UPDATE events SET screenshot_path = COALESCE(screenshot_path, ?)"
+                                               " WHERE end_time IS NULL", (item[1],))
+                        elif item[0] == 'unlink':
+                            connection.execute("UPDATE events SET recording_path = NULL WHERE recording_path = ?",
+                                               (item[1],))
+                self.batches += 1
+            except sqlite3.Error as e:
+                self.errors += 1
+                print(f"Event store error: {e}")
+
+            for item in batch:
+                if item[0] == 'flush':
+                    item[1].set()
+                elif item[0] == 'exit':
+                    running = False
+        connection.close()
+
+    def _write_event(self, connection, rows, kind, event, recording_path):
+        """Insert a started event or update its row"""
+        if kind == 'start':
+            cursor = connection.execute(
+                "INSERT INTO events (camera_id, method, class, region, start_time, last_seen, max_count,"
+                " confidence, box, recording_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (event['camera_id'], event['method'], event['class'], event['region'], event['start_time'],
+                 event['last_seen'], event['count'], event['confidence'], json.dumps(event['box']),
+                 recording_path))
+            rows[event['id']] = cursor.lastrowid
+            self.events_written += 1
+            return
+
+        row_id = rows.pop(event['id'], None) if kind == 'end' else rows.get(event['id'])
+        if row_id is None:
+            return
+        connection.execute(
+            "UPDATE events SET last_seen = ?, end_time = ?, max_count = MAX(max_count, ?),"
+            " confidence = MAX(confidence, ?), recording_path = COALESCE(recording_path, ?) WHERE id = ?",
+            (event['last_seen'], event['last_seen'] if kind == 'end' else None, event['count'],
+             event['confidence'], recording_path, row_id))
+
+    def flush(self, timeout=5.0):
+        """Wait until everything queued so far is committed"""
+        if self.thread is None or not self.thread.is_alive():
+            return False
+        done = threading.Event()
+        self.queue.put(('flush', done))
+        return done.wait(timeout)
+
+    def stop(self):
+        """Commit what is queued and stop the writer"""
+        if self.thread is not None and self.thread.is_alive():
+            self.queue.put(('exit',))
+            self.thread.join(timeout=5.0)
+        self.thread = None
+
+    def _where(self, start=None, end=None, class_name=None, camera_id=None, method=None):
+        """Build the WHERE clause shared by the queries"""
+        clauses, params = [], []
+        for clause, value in (("start_time >= ?", start), ("start_time < ?", end), ("class = ?", class_name),
+                              ("camera_id = ?", camera_id), ("method = ?", method)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def _read(self, sql, params):
+        """Run a read-only query on its own connection"""
+        if not os.path.exists(self.path):
+            return []
+        connection = self._connect()
+        try:
+            return connection.execute(sql, params).fetchall()
+        finally:
+            connection.close()
+
+    def query(self, start=None, end=None, class_name=None, camera_id=None, method=None, limit=100):
+        """
+        Get stored events, newest first
+
+        Args:
+            start: Earliest start time (epoch seconds), or None
+            end: Start times before this (epoch seconds), or None
+            class_name: Detected class such as 'person', or None for all
+            camera_id: Camera, or None for all
+            method: Detection method name such as 'person' or 'motion', or None for all
+            limit: Most events returned
+
+        Returns:
+            events: List of dicts with the stored columns (box decoded)
+        """
+        where, params = self._where(start, end, class_name, camera_id, method)
+        rows = self._read(f"SELECT * FROM events{where} ORDER BY start_time DESC LIMIT ?", params + [int(limit)])
+        events = []
+        for row in rows:
+            event = dict(row)
+            event['box'] = json.loads(event['box']) if event['box'] else None
+            events.append(event)
+        return events
+
+    def count(self, start=None, end=None, class_name=None, camera_id=None, method=None):
+        """Get how many events match"""
+        where, params = self._where(start, end, class_name, camera_id, method)
+        rows = self._read(f"SELECT COUNT(*) FROM events{where}", params)
+        return rows[0][0] if rows else 0
+
+    def count_by_class(self, start=None, end=None, camera_id=None, method=None):
+        """Get event counts per class, most frequent first"""
+        where, params = self._where(start, end, None, camera_id, method)
+        rows = self._read(f"SELECT class, COUNT(*) FROM events{where} GROUP BY class ORDER BY COUNT(*) DESC",
+                          params)
+        return {row[0]: row[1] for row in rows}
+
+    def get_stats(self):
+        """Get writer throughput and queue state"""
+        return {
+            'path': self.path,
+            'queued': self.queue.qsize(),
+            'events_written': self.events_written,
+            'batches': self.batches,
+            'dropped': self.dropped,
+            'errors': self.errors,
+        }
+
+# Building the cached status overlay compositor:
+class StatusOverlayCompositor:
+    """Draws the status header from cached layers, blending only the header strip"""
+    def __init__(self, title="MULTI-DETECTION SURVEILLANCE", header_height=60, opacity=0.7,
+                 background=(30, 30, 30)):
+        self.title = title
+        self.header_height = header_height + 1  # The bar has always covered its bottom edge row too
+        self.opacity = opacity
+        self.background = background
+        self.width = None
+        self.background_layer = None  # Solid bar, built once per resolution
+        self.static_layer = None  # Title text, built once per resolution
+        self.static_mask = None
+        self.layer = None  # Title plus the current status text
+        self.mask = None
+        self.content_key = None
+        self.renders = 0
+
+    @staticmethod
+    def _put_text(layer, mask, text, org, font, scale, color, thickness):
+        """Draw text onto a layer and its coverage mask"""
+        cv2.putText(layer, text, org, font, scale, color, thickness)
+        cv2.putText(mask, text, org, font, scale, 255, thickness)
+
+    @staticmethod
+    def _rectangle(layer, mask, top_left, bottom_right, color, thickness):
+        """Draw a rectangle onto a layer and its coverage mask"""
+        cv2.rectangle(layer, top_left, bottom_right, color, thickness)
+        cv2.rectangle(mask, top_left, bottom_right, 255, thickness)
+
+    def _render_static(self, width):
+        """Pre-render the bar and the title for a frame width"""
+        self.width = width
+        self.background_layer = np.full((self.header_height, width, 3), self.background, dtype=np.uint8)
+        layer = np.zeros((self.header_height, width, 3), dtype=np.uint8)
+        mask = np.zeros((self.header_height, width), dtype=np.uint8)
+
+        title_size = cv2.getTextSize(self.title, cv2.FONT_HERSHEY_TRIPLEX, 0.7, 2)[0]
+        title_x = (width - title_size[0]) // 2
+        self._put_text(layer, mask, self.title, (title_x + 2, 22), cv2.FONT_HERSHEY_TRIPLEX, 0.7, (0, 0, 0), 2)
+        self._put_text(layer, mask, self.title, (title_x, 20), cv2.FONT_HERSHEY_TRIPLEX, 0.7, (255, 255, 255), 2)
+        self.static_layer, self.static_mask = layer, mask
+        self.content_key = None
+
+    def _render_dynamic(self, statuses, recording_text):
+        """Re-render the status text on top of the static title"""
+        layer = self.static_layer.copy()
+        mask = self.static_mask.copy()
+        width = self.width
+
+        x_offset = 10
+        for status_text, color in statuses:
+            self._rectangle(layer, mask, (x_offset, 35), (x_offset + 10, 45), color, -1)
+            self._rectangle(layer, mask, (x_offset, 35), (x_offset + 10, 45), (255, 255, 255), 1)
+            self._put_text(layer, mask, status_text, (x_offset + 15, 44), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2)
+            self._put_text(layer, mask, status_text, (x_offset + 14, 43), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+            text_width = cv2.getTextSize(status_text, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)[0][0]
+            x_offset += text_width + 35
+
+        if recording_text is not None:
+            cv2.circle(layer, (width - 30, 20), 10, (0, 0, 255), -1)
+            cv2.circle(mask, (width - 30, 20), 10, 255, -1)
+            cv2.circle(layer, (width - 30, 20), 10, (255, 255, 255), 1)
+            self._put_text(layer, mask, "REC", (width - 70, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+            self._put_text(layer, mask, recording_text, (width - 70, 45), cv2.FONT_HERSHEY_SIMPLEX, 0.5,
+                           (255, 255, 255), 1)
+
+        self.layer = layer
+        self.mask = mask.astype(bool)[:, :, None]
+        self.renders += 1
+
+    def compose(self, frame, statuses, recording_text=None):
+        """
+        Draw the header onto the frame in place
+
+        Args:
+            frame: Frame to draw on; only its top header_height rows are touched
+            statuses: List of (status_text, color) for the active methods
+            recording_text: Elapsed recording time to show, or None to hide the REC badge
+        """
+        width = frame.shape[1]
+        if width != self.width:
+            self._render_static(width)
+        key = (tuple(statuses), recording_text)
+        if key != self.content_key:
+            self._render_dynamic(statuses, recording_text)
+            self.content_key = key
+
+        header = frame[:self.header_height]
+        rows = header.shape[0]
+        cv2.addWeighted(header, 1.0 - self.opacity, self.background_layer[:rows], self.opacity, 0, dst=header)
+        np.copyto(header, self.layer[:rows], where=self.mask[:rows])
+
+# Building the per-client websocket stream:
+class StreamClient:
+    """
+    Stream settings and bounded send queues for one websocket client
+
+    Clients negotiate with a {"type": "stream_config", "binary": true,
+    "quality": 60, "fps": 10, "cameras": [1, 2]} message. Binary frame
+    messages are BINARY_HEADER (message type, camera id, frame sequence,
+    capture timestamp) followed by the raw JPEG bytes. Clients that never
+    negotiate keep receiving the JSON/base64 'frame' messages.
+    """
+    BINARY_HEADER = struct.Struct('!BHQd')
+    FRAME_MESSAGE = 1
+
+    def __init__(self, websocket, quality=80, fps=15.0, binary=False, max_messages=100):
+        self.websocket = websocket
+        self.quality = quality
+        self.fps = fps
+        self.binary = binary
+        self.cameras = None  # None means every camera
+        self.metrics = False  # Periodic 'metrics' messages, opted into through stream_config
+        address = getattr(websocket, 'remote_address', None)
+        self.name = f"{address[0]}:{address[1]}" if address else str(id(websocket))
+
+        # Only the newest frame per camera waits to be sent; stale frames are replaced
+        self.pending_frames = {}
+        self.messages = deque()  # JSON event messages, bounded by max_messages
+        self.max_messages = max_messages
+        self.wake = asyncio.Event()
+        self.last_frame_time = {}
+        self.closed = False
+
+        # Statistics
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.messages_dropped = 0
+        self.bytes_sent = 0
+        self.send_latency = LatencyStats()
+
+    def configure(self, settings):
+        """Apply a stream_config request and return the accepted settings"""
+        if 'quality' in settings:
+            self.quality = int(min(95, max(10, int(settings['quality']))))
+        if 'fps' in settings:
+            self.fps = float(min(30.0, max(0.5, float(settings['fps']))))
+        if 'binary' in settings:
+            self.binary = bool(settings['binary'])
+        if 'cameras' in settings:
+            cameras = settings['cameras']
+            self.cameras = None if cameras is None else {int(camera_id) for camera_id in cameras}
+        if 'metrics' in settings:
+            self.metrics = bool(settings['metrics'])
+        return {
+            'quality': self.quality,
+            'fps': self.fps,
+            'binary': self.binary,
+            'cameras': None if self.cameras is None else sorted(self.cameras),
+            'metrics': self.metrics,
+        }
+
+    def wants_frame(self, camera_id, now):
+        """Check if this client is subscribed to the camera and due for a frame"""
+        if self.closed or (self.cameras is not None and camera_id not in self.cameras):
+            return False
+        last = self.last_frame_time.get(camera_id)
+        return last is None or now - last >= 1.0 / self.fps
+
+    def offer_frame(self, camera_id, message, now):
+        """Queue a frame, replacing any unsent frame from the same camera"""
+        if camera_id in self.pending_frames:
+            self.frames_dropped += 1
+        self.pending_frames[camera_id] = message
+        self.last_frame_time[camera_id] = now
+        self.wake.set()
+
+    def offer_message(self, text):
+        """Queue a JSON message, dropping the oldest one if the client has fallen too far behind"""
+        if len(self.messages) >= self.max_messages:
+            self.messages.popleft()
+            self.messages_dropped += 1
+        self.messages.append(text)
+        self.wake.set()
+
+    async def run(self):
+        """Send queued messages to this client only, so a slow client never stalls the others"""
+        try:
+            while not self.closed:
+                await self.wake.wait()
+                self.wake.clear()
+                while self.messages:
+                    await self._send(self.messages.popleft())
+                frames, self.pending_frames = self.pending_frames, {}
+                for message in frames.values():
+                    await self._send(message)
+                    self.frames_sent += 1
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            self.closed = True
+
+    async def _send(self, message):
+        """Send one message and record how long the client took to accept it"""
+        start_time = time.perf_counter()
+        await self.websocket.send(message)
+        self.send_latency.add(time.perf_counter() - start_time)
+        self.bytes_sent += len(message)
+
+    def get_stats(self):
+        """Get this client's settings and send statistics"""
+        return {
+            'client': self.name,
+            'quality': self.quality,
+            'fps': self.fps,
+            'binary': self.binary,
+            'frames_sent': self.frames_sent,
+            'frames_dropped': self.frames_dropped,
+            'messages_dropped': self.messages_dropped,
+            'bytes_sent': self.bytes_sent,
+            'send_latency': self.send_latency.summary(),
+        }
+
+# Building the local control socket for headless deployments:
+class ControlSocketServer:
+    """Line-based control channel on a local TCP port
+
+    Each line is either a JSON command such as {"command": "toggle", "method": "yolo"}
+    or plain words such as "toggle yolo"; each reply is one JSON line.
+    """
+    def __init__(self, command_handler, host="127.0.0.1", port=8766):
+        self.command_handler = command_handler
+        self.host = host
+        self.port = port
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        """Start serving control connections on a background thread"""
+        command_handler = self.command_handler
+
+        class ControlRequestHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    line = line.decode("utf-8", errors="replace").strip()
+                    if not line:
+                        continue
+                    try:
+                        command = json.loads(line)
+                    except json.JSONDecodeError:
+                        words = line.split()
+                        command = {"command": words[0].lower()}
+                        if len(words) > 1:
+                            command["method" if command["command"] == "toggle" else "value"] = words[1]
+                    try:
+                        reply = command_handler(command)
+                    except Exception as e:
+                        # Keep the connection, so a later command (e.g. shutdown) still arrives
+                        reply = {"ok": False, "error": str(e)}
+                    self.wfile.write((json.dumps(reply) + "\n").encode("utf-8"))
+
+        class ControlTCPServer(socketserver.ThreadingTCPServer):
+            allow_reuse_address = True
+            daemon_threads = True
+
+        self.server = ControlTCPServer((self.host, self.port), ControlRequestHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        print(f"Control socket listening on {self.host}:{self.port}")
+
+    def stop(self):
+        """Stop the control server"""
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
 class MultiSurveillanceSystem:
-    def __init__(self, camera_source=0, output_folder="multi_surveillance", speak_callback=None):
+    # Methods served by the shared YOLO engine, which can run them as one batch
+    BATCHED_METHODS = ("yolo", "person")
+    # Methods that can run on motion regions instead of the full frame
+    ROI_METHODS = ("yolo", "person", "face")
+    # Methods that can run in worker processes; noise reads this process's microphone service
+    PROCESS_METHODS = ("motion", "yolo", "person", "face")
+    # Keyboard shortcuts in the display window, mapped to control commands
+    KEY_COMMANDS = {
+        ord('r'): {'command': 'record'},
+        ord('1'): {'command': 'toggle', 'method': 'motion'},
+        ord('2'): {'command': 'toggle', 'method': 'yolo'},
+        ord('3'): {'command': 'toggle', 'method': 'person'},
+        ord('4'): {'command': 'toggle', 'method': 'face'},
+        ord('5'): {'command': 'toggle', 'method': 'noise'},
+    }
+
+    def __init__(self, camera_source=0, output_folder="multi_surveillance", speak_callback=None,
+                 camera_sources=None, batch_inference=None, max_batch_size=16,
+                 motion_gating=True, keepalive_interval=5.0, motion_hold_time=1.0,
+                 roi_inference=False, roi_padding=32, roi_min_size=96, roi_max_coverage=0.5,
+                 roi_max_regions=8, headless=False, control_port=None,
+                 pre_roll_seconds=5.0, post_roll_seconds=3.0, quiet_period=5.0,
+                 person_detect_interval=1, display_size=(1100, 600), inference_size=640,
+                 metrics=False, metrics_port=None, metrics_interval=5.0,
+                 capture_options=None, frame_pool_slots=0, detector_processes=None, event_db_path=None,
+                 segment_seconds=60.0, max_storage_gb=20.0, max_age_days=30.0):
         self.speak_callback = speak_callback  # Add callback for Trinity's speak function
+        self.alert_dispatcher = AlertDispatcher(speak_callback)  # Speaks alerts off the video loop
     # ... rest of __init__
 
-        self.camera_source = camera_source
+        # A list of sources (RTSP URLs, files or device indexes) enables multi-camera mode;
+        # camera IDs are assigned 1..N in list order and camera 1 drives the display
+        if camera_sources is None:
+            camera_sources = list(camera_source) if isinstance(camera_source, (list, tuple)) else [camera_source]
+        self.camera_source = camera_sources[0]
+        # Per-stage timers; disabled timers cost one attribute check per stage
+        self.metrics = SurveillanceMetrics(enabled=metrics or metrics_port is not None)
+        self.metrics_port = metrics_port  # Local Prometheus endpoint, or None to disable
+        self.metrics_interval = metrics_interval  # Seconds between pushes to subscribed websocket clients
+        self.metrics_server = None
+
+        # Frames are sized once in the capture thread: display_size for drawing and streaming,
+        # inference_size (square, letterboxed) for YOLO
+        self.display_size = display_size
+        self.inference_size = inference_size
+        # Sources go through pluggable capture backends (webcam, RTSP, video file, image directory);
+        # frame_pool_slots > 0 publishes frames from reference-counted shared-memory buffers
+        if detector_processes and not frame_pool_slots:
+            frame_pool_slots = 32  # Worker processes map pooled frames by name instead of unpickling copies
+        self.frame_pool_slots = frame_pool_slots
+        self.cameras = {camera_id: CameraFeed(camera_id, source, display_size, inference_size, self.metrics,
+                                              capture_options, frame_pool_slots)
+                        for camera_id, source in enumerate(camera_sources, start=1)}
+        self.primary_camera_id = 1
+        # Batch YOLO over all cameras by default once there is more than one
+        self.batch_inference = len(self.cameras) > 1 if batch_inference is None else batch_inference
+        self.max_batch_size = max_batch_size
+        self.batch_worker = None
+        self.camera_detections = {}  # camera_id -> {method_name: detections} for secondary cameras
+
         self.output_folder = output_folder
         self.cap = None
         self.websocket_clients = set()  # Track connected WebSocket clients
+        self.stream_clients = {}  # websocket -> StreamClient with its own queues and settings
         self.armed = True  # Add armed state
         self.loop = None  # Asyncio event loop for WebSocket
         self.websocket_server = None  # WebSocket server instance
         self.running = True  # Control flag for broadcast loop
+        self.websocket_thread = None
+
+        # Headless mode: no display window; control comes over the websocket or control socket
+        self.headless = headless
+        self.control_port = control_port  # Local control socket port, or None to disable
+        self.control_server = None
+        self.window_open = False
+        self.frame_latency = LatencyStats()  # Per-frame cost of the surveillance loop
+
+        # Frame bus: a single capture thread publishes, every consumer subscribes
+        self.frame_bus = FrameBus(capacity=8)
+        self.capture_worker = None
 
         # Create output folder if it doesn't exist
         if not os.path.exists(output_folder):
             os.makedirs(output_folder)
 
-        # Recording variables
-        self.is_recording = False
-        self.video_writer = None
-        self.recording_start_time = None
+        # Recording: pre-roll buffer, background encoder and automatic stop after a quiet period,
+        # written as fixed-length segments that are evicted to stay within the disk budget
+        self.segments = RecordingSegmentManager(output_folder, segment_seconds=segment_seconds,
+                                                max_storage_gb=max_storage_gb, max_age_days=max_age_days)
+        self.recorder = EventRecorder(output_folder, pre_roll_seconds=pre_roll_seconds,
+                                      post_roll_seconds=post_roll_seconds, quiet_period=quiet_period,
+                                      metrics=self.metrics, segments=self.segments)
 
-        # Create detection methods
-        self.detection_methods = {
-            "motion": MotionDetection(threshold=1000),
-            "yolo": YOLODetection(model_path="yolov10n.pt", confidence=0.5),
-            "person": PersonDetection(model_path="yolov10n.pt", confidence=0.5),
-            "face": FaceDetection(),
-            "noise": NoiseDetection(threshold=0.1)
+        # Create detection methods; (class, kwargs) so worker processes can build their own copy
+        self.method_specs = {
+            "motion": (MotionDetection, {"threshold": 1000}),
+            "yolo": (YOLODetection, {"model_path": DEFAULT_MODEL_PATH, "confidence": 0.5}),
+            "person": (PersonDetection, {"model_path": DEFAULT_MODEL_PATH, "confidence": 0.5,
+                                         "detect_interval": person_detect_interval}),
+            "face": (FaceDetection, {}),
+            "noise": (NoiseDetection, {"threshold": 0.1}),
         }
+        self.detection_methods = {name: method_class(**kwargs)
+                                  for name, (method_class, kwargs) in self.method_specs.items()}
+
+        # Detector isolation: True (or a list of method names) runs detectors in worker processes,
+        # so their Python work doesn't contend for this process's GIL. Workers are spawned, which
+        # re-imports the launching script, so that script must be safe to import.
+        self.process_methods = self._select_process_methods(detector_processes)
+        self.detector_workers = self._create_detector_workers()
 
         # Initialize async detectors for each method
         self.async_detectors = {}
         for name, method in self.detection_methods.items():
-            self.async_detectors[name] = AsyncDetector(method)
+            if name in self.process_methods:
+                self.async_detectors[name] = ProcessDetector(method, self.detector_workers[name], name)
+            else:
+                self.async_detectors[name] = AsyncDetector(method)
 
         # Active detection methods
         self.active_methods = ["motion", "yolo"]  # Default active methods
 
+        # Motion-gated scheduling: MOG2 runs on every frame, YOLO/person/face only when needed
+        self.scheduler = MotionGatedScheduler(keepalive_interval=keepalive_interval,
+                                              hold_time=motion_hold_time) if motion_gating else None
+
+        # ROI mode: run YOLO/person/face only on merged, padded motion regions
+        self.roi_inference = roi_inference
+        self.roi_padding = roi_padding
+        self.roi_min_size = roi_min_size
+        self.roi_max_coverage = roi_max_coverage  # Above this fraction of the frame, use the full frame
+        self.roi_max_regions = roi_max_regions
+        self.roi_stats = {'roi_frames': 0, 'full_frames': 0, 'coverage_sum': 0.0}
+
         # Detection results
         self.current_detections = {}
+        self.overlay_compositor = StatusOverlayCompositor()
+
+        # Debounced detection events for websocket clients, with real per-day counters
+        self.event_aggregator = DetectionEventAggregator()
+        # Event history on disk, for questions like "how many people came by last week"
+        self.event_store = DetectionEventStore(event_db_path or os.path.join(output_folder, "detection_events.db"))
+        self.segments.on_evict = self.event_store.unlink_recording
 
     async def websocket_handler(self, websocket, path):
         """Handle WebSocket connections"""
         self.websocket_clients.add(websocket)
+        client = StreamClient(websocket)
+        self.stream_clients[websocket] = client
+        sender = asyncio.ensure_future(client.run())
         try:
             async for message in websocket:
                 try:
                     data = json.loads(message)
+                    if not isinstance(data, dict):
+                        print("Ignoring non-object message from WebSocket client")
+                        continue
                     if data.get('type') == 'arm':
-                        self.armed = data.get('value', False)
+                        self.handle_control_command({'command': 'arm', 'value': data.get('value', False)})
                         print(f"System {'armed' if self.armed else 'disarmed'} via WebSocket")
                         # Broadcast arm status to all clients
                         arm_data = {
                             'type': 'status',
                             'armed': self.armed
                         }
-                        for client in self.websocket_clients:
-                            try:
-                                await client.send(json.dumps(arm_data))
-                            except:
-                                pass
+                        self.broadcast_json(arm_data)
+                    elif data.get('type') == 'control':
+                        # Recording and screenshots touch the disk, so keep them off the event loop
+                        result = await asyncio.get_running_loop().run_in_executor(
+                            None, self.handle_control_command, data)
+                        client.offer_message(json.dumps({'type': 'control_result', **result}))
+                    elif data.get('type') == 'stream_config':
+                        accepted = client.configure(data)
+                        client.offer_message(json.dumps({'type': 'stream_config', **accepted}))
+                    elif data.get('type') == 'metrics':
+                        client.offer_message(json.dumps({'type': 'metrics', **self.get_metrics()}))
                 except json.JSONDecodeError:
                     print("Invalid JSON received from WebSocket client")
+                except Exception as e:
+                    # A bad message must not drop the client
+                    print(f"Error handling WebSocket message: {e}")
         except websockets.exceptions.ConnectionClosed:
             print("WebSocket client disconnected")
         finally:
-            self.websocket_clients.remove(websocket)
+            client.closed = True
+            sender.cancel()
+            self.stream_clients.pop(websocket, None)
+            self.websocket_clients.discard(websocket)
+
+    def broadcast_json(self, data):
+        """Queue a JSON message for every connected client"""
+        text = json.dumps(data)
+        for client in list(self.stream_clients.values()):
+            client.offer_message(text)
+
+    def publish_detection_events(self, frame_shape):
+        """
+        Feed every camera's latest detections to the aggregator and broadcast the resulting events
+
+        Args:
+            frame_shape: Shape of the primary camera's frame; the other cameras use their own
+        """
+        now = time.time()
+        for camera_id, feed in self.cameras.items():
+            shape = frame_shape
+            if camera_id != self.primary_camera_id:
+                # Boxes are in each camera's own coordinates, which differ at native display size
+                packet = feed.frame_bus.latest()
+                if packet is None:
+                    continue
+                shape = packet.frame.shape
+            events = self.event_aggregator.update(camera_id, self.get_camera_detections(camera_id),
+                                                  shape, now)
+            recording_path = self.recorder.output_path if self.recorder.is_recording else None
+            for kind, event in events:
+                self.event_store.record(kind, event, recording_path)
+                self.broadcast_detection_event(kind, event)
+
+    def broadcast_detection_event(self, kind, event):
+        """Send one detection event to all websocket clients"""
+        if self.loop is None or not self.stream_clients:
+            return
+        method_name = event['method']
+        detection_data = {
+            'type': 'detection',
+            'event': kind,
+            'eventId': event['id'],
+            'cameraId': event['camera_id'],
+            'detectionType': method_name.capitalize(),
+            'location': self.detection_methods[method_name].name,
+            'class': event['class'],
+            'count': event['count'],
+            'confidence': event['confidence'],
+            'box': event['box'],
+            'duration': round(event['last_seen'] - event['start_time'], 2),
+            'stats': {
+                'today': self.event_aggregator.get_daily_count(event['camera_id'], event['class']),
+                'falsePositives': 0  # Placeholder, update with actual logic
+            },
+            'timestamp': datetime.now().strftime("%H:%M:%S")
+        }
+        # Client queues belong to the event loop thread
+        try:
+            self.loop.call_soon_threadsafe(self.broadcast_json, detection_data)
+        except RuntimeError:
+            pass  # Event loop already closed
+
+    def get_metrics(self):
+        """Snapshot of stage timings, detector queues, drops and websocket clients"""
+        return {
+            'enabled': self.metrics.enabled,
+            'timestamp': time.time(),
+            'stages': self.metrics.get_stage_stats(),
+            'frame_latency': self.frame_latency.summary(),
+            'cameras': {camera_id: feed.get_stats() for camera_id, feed in self.cameras.items()},
+            'detectors': self.get_detector_stats(),
+            'batch': self.batch_worker.get_stats() if self.batch_worker is not None else None,
+            'scheduler': self.scheduler.get_stats() if self.scheduler is not None else None,
+            'recorder': self.recorder.get_stats(),
+            'events': self.event_store.get_stats(),
+            'storage': self.segments.get_storage_report(),
+            'alerts': self.alert_dispatcher.get_stats(),
+            'websocket': {'clients': len(self.stream_clients), 'streams': self.get_stream_stats()},
+        }
+
+    def render_metrics(self):
+        """Render get_metrics() in the Prometheus text format"""
+        snapshot = self.get_metrics()
+        text = PrometheusText()
+        for stage, summary in snapshot['stages'].items():
+            text.add_summary("stage_seconds", summary, {'stage': stage}, "Time spent per pipeline stage")
+        text.add_summary("frame_seconds", snapshot['frame_latency'], help_text="Surveillance loop time per frame")
 
-    async def broadcast_detections(self):
-        """Broadcast detection results and frames to all connected clients"""
+        for camera_id, camera in snapshot['cameras'].items():
+            labels = {'camera': camera_id}
+            text.add("camera_up", int(camera['open']), labels, help_text="Whether the camera is capturing")
+            text.add("camera_frames_total", camera['frames'], labels, "counter", "Frames published by the camera")
+
+        for method_name, stats in snapshot['detectors'].items():
+            labels = {'method': method_name}
+            text.add("detector_queue_depth", stats['queue_depth'], labels, help_text="Frames waiting in the detector mailbox")
+            text.add("detector_busy", int(stats['busy']), labels, help_text="Whether the detector is running")
+            for key in ('submitted', 'processed', 'dropped', 'skipped', 'errors'):
+                text.add(f"detector_frames_{key}_total", stats[key], labels, "counter")
+            text.add_summary("detector_seconds", stats['latency'], labels, "Detection time per frame")
+
+        if snapshot['batch'] is not None:
+            text.add("batch_total", snapshot['batch']['batches'], kind="counter", help_text="Batched YOLO passes")
+            text.add("batch_frames_total", snapshot['batch']['frames'], kind="counter")
+            text.add_summary("batch_seconds", snapshot['batch']['latency'], help_text="Time per batched YOLO pass")
+
+        if snapshot['scheduler'] is not None:
+            text.add("motion_active", int(snapshot['scheduler']['motion_active']))
+            for method_name, count in snapshot['scheduler']['dispatched'].items():
+                text.add("scheduler_dispatched_total", count, {'method': method_name}, "counter")
+            for method_name, count in snapshot['scheduler']['gated'].items():
+                text.add("scheduler_gated_total", count, {'method': method_name}, "counter")
+
+        recorder = snapshot['recorder']
+        text.add("recording", int(recorder['recording']), help_text="Whether a recording is in progress")
+        text.add("recorder_queue_depth", recorder['queue_depth'], help_text="Frames waiting for the video encoder")
+        text.add("recorder_frames_written_total", recorder['frames_written'], kind="counter")
+        text.add("recorder_frames_dropped_total", recorder['frames_dropped'], kind="counter")
+
+        storage = snapshot['storage']
+        text.add("recording_segments", storage['segments'], help_text="Indexed recording segments on disk")
+        text.add("recording_bytes", storage['bytes'], help_text="Bytes used by recording segments")
+        for priority, usage in storage['by_priority'].items():
+            text.add("recording_priority_bytes", usage['bytes'], {'priority': priority})
+        if storage['budget_bytes']:
+            text.add("recording_budget_bytes", storage['budget_bytes'], help_text="Disk budget for recordings")
+        text.add("recording_disk_free_bytes", storage['disk_free_bytes'])
+        text.add("recording_evicted_total", storage['evicted'], kind="counter")
+        text.add("recording_evicted_bytes_total", storage['evicted_bytes'], kind="counter")
+
+        events = snapshot['events']
+        text.add("event_store_queued", events['queued'], help_text="Event operations waiting for the writer")
+        for key in ('events_written', 'batches', 'dropped', 'errors'):
+            text.add(f"event_store_{key}_total", events[key], kind="counter")
+
+        alerts = snapshot['alerts']
+        text.add("alerts_pending", alerts['pending'])
+        for key in ('submitted', 'spoken', 'coalesced', 'rate_limited', 'expired', 'errors'):
+            text.add(f"alerts_{key}_total", alerts[key], kind="counter")
+
+        text.add("websocket_clients", snapshot['websocket']['clients'], help_text="Connected websocket clients")
+        for stream in snapshot['websocket']['streams']:
+            labels = {'client': stream['client']}
+            for key in ('frames_sent', 'frames_dropped', 'messages_dropped', 'bytes_sent'):
+                text.add(f"websocket_{key}_total", stream[key], labels, "counter")
+            text.add_summary("websocket_send_seconds", stream['send_latency'], labels,
+                             "Time for a client to accept one message")
+        return text.render()
+
+    def get_stream_stats(self):
+        """Get per-client stream settings and send statistics"""
+        return [client.get_stats() for client in list(self.stream_clients.values())]
+
+    @staticmethod
+    def _encode_jpeg(frame, quality):
+        """Encode a frame as JPEG bytes"""
+        ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        return buffer.tobytes() if ok else None
+
+    async def broadcast_detections(self, camera_id=1):
+        """Broadcast detection results and frames for one camera to all connected clients"""
+        subscription = None
+        frame_bus = None
+        feed = self.cameras[camera_id]
         while self.running:
-            if not self.cap or not self.cap.isOpened():
-                await asyncio.sleep(0.1)
-                continue
+            # The bus is replaced on every start(), so re-subscribe when it changes
+            if frame_bus is not feed.frame_bus:
+                frame_bus = feed.frame_bus
+                subscription = frame_bus.subscribe("websocket")
 
-            ret, frame = self.cap.read()
-            if not ret:
-                print("Failed to capture frame")
-                await asyncio.sleep(0.1)
+            # Wait for the next frame without blocking the event loop
+            loop = asyncio.get_running_loop()
+            packet = await loop.run_in_executor(None, subscription.get, 0.1)
+            if packet is None:
+                continue
+            frame = packet.frame
+            if not self.stream_clients or not packet.retain():
                 continue
 
-            frame = cv2.resize(frame, (1100, 600))  # Resize for consistency
-
-            # Process detections
-            for method_name in self.active_methods:
-                detector = self.async_detectors[method_name]
-                if detector.is_ready():
-                    detector.process_frame(frame)
-
-                if detector.get_results() is not None:
-                    detections, _ = detector.get_results()
-                    self.current_detections[method_name] = detector.get_results()
-
-                    if detections:
-                        # Prepare detection data
-                        detection_data = {
-                            'type': 'detection',
-                            'detectionType': method_name.capitalize(),
-                            'location': self.detection_methods[method_name].name,
-                            'stats': {
-                                'today': len(detections),
-                                'falsePositives': 0  # Placeholder, update with actual logic
-                            },
-                            'timestamp': datetime.now().strftime("%H:%M:%S")
-                        }
-                        # Broadcast detection data
-                        for client in list(self.websocket_clients):
-                            try:
-                                await client.send(json.dumps(detection_data))
-                            except:
-                                self.websocket_clients.discard(client)  # Remove disconnected client
-
-            # Encode and send frame
+            # Detection messages are sent as events by publish_detection_events()
+
+            # Encode once per requested quality and hand the result to every due client
+            start = self.metrics.start()
+            now = time.time()
+            due_clients = [client for client in list(self.stream_clients.values())
+                           if client.wants_frame(camera_id, now)]
+            jpegs = {}
+            messages = {}
             try:
-                _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
-                frame_base64 = base64.b64encode(buffer).decode('utf-8')
-                frame_data = {
-                    'type': 'frame',
-                    'cameraId': 1,  # Update with actual camera ID for multi-camera support
-                    'frame': f'data:image/jpeg;base64,{frame_base64}'
-                }
-                for client in list(self.websocket_clients):
-                    try:
-                        await client.send(json.dumps(frame_data))
-                    except:
-                        self.websocket_clients.discard(client)  # Remove disconnected client
+                for client in due_clients:
+                    key = (client.quality, client.binary)
+                    if key not in messages:
+                        if client.quality not in jpegs:
+                            jpegs[client.quality] = await loop.run_in_executor(
+                                None, self._encode_jpeg, frame, client.quality)
+                        jpeg = jpegs[client.quality]
+                        if jpeg is None:
+                            continue
+                        if client.binary:
+                            header = StreamClient.BINARY_HEADER.pack(
+                                StreamClient.FRAME_MESSAGE, camera_id, packet.seq, packet.timestamp)
+                            messages[key] = header + jpeg
+                        else:
+                            frame_base64 = base64.b64encode(jpeg).decode('utf-8')
+                            messages[key] = json.dumps({
+                                'type': 'frame',
+                                'cameraId': camera_id,
+                                'frame': f'data:image/jpeg;base64,{frame_base64}'
+                            })
+                    client.offer_frame(camera_id, messages[key], now)
             except Exception as e:
                 print(f"Error encoding frame: {e}")
+            finally:
+                packet.release()
+            if due_clients:
+                self.metrics.observe('broadcast', start)
 
-            await asyncio.sleep(0.033)  # ~30 FPS
+    async def broadcast_metrics(self):
+        """Push a metrics snapshot to clients that asked for periodic metrics"""
+        while self.running:
+            await asyncio.sleep(self.metrics_interval)
+            subscribers = [client for client in list(self.stream_clients.values()) if client.metrics]
+            if subscribers:
+                text = json.dumps({'type': 'metrics', **self.get_metrics()})
+                for client in subscribers:
+                    client.offer_message(text)
 
     def start_websocket_server(self):
         """Start the WebSocket server in a separate thread"""
         def run_loop():
-            self.loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(self.loop)
-            self.websocket_server = websockets.serve(self.websocket_handler, "localhost", 8765)
-            self.loop.run_until_complete(self.websocket_server)
-            self.loop.create_task(self.broadcast_detections())
+            loop = asyncio.new_event_loop()
+            self.loop = loop
+            asyncio.set_event_loop(loop)
+            self.websocket_server = loop.run_until_complete(
+                websockets.serve(self.websocket_handler, "localhost", 8765))
+            for camera_id, feed in self.cameras.items():
+                if feed.is_open():
+                    loop.create_task(self.broadcast_detections(camera_id))
+            if self.metrics.enabled:
+                loop.create_task(self.broadcast_metrics())
             try:
-                self.loop.run_forever()
-            except KeyboardInterrupt:
-                self.stop_websocket_server()
+                loop.run_forever()
+            finally:
+                # Shut down on the loop's own thread once stop() has been requested
+                self.websocket_server.close()
+                tasks = asyncio.all_tasks(loop)
+                for task in tasks:
+                    task.cancel()
+                loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+                loop.run_until_complete(self.websocket_server.wait_closed())
+                loop.run_until_complete(loop.shutdown_asyncgens())
+                loop.close()
 
-        ws_thread = threading.Thread(target=run_loop, daemon=True)
-        ws_thread.start()
+        self.websocket_thread = threading.Thread(target=run_loop, daemon=True)
+        self.websocket_thread.start()
 
     def stop_websocket_server(self):
         """Stop the WebSocket server and clean up"""
         self.running = False
-        if self.loop:
-            tasks = asyncio.all_tasks(self.loop)
-            for task in tasks:
-                task.cancel()
-            self.loop.run_until_complete(self.loop.shutdown_asyncgens())
-            self.loop.close()
-        if self.websocket_server:
-            self.websocket_server.close()
+        if self.loop and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.websocket_thread and self.websocket_thread.is_alive() and self.websocket_thread is not threading.current_thread():
+            self.websocket_thread.join(timeout=2.0)
+        self.websocket_thread = None
+        self.loop = None
 
     def start(self):
         """Start the surveillance system and connect to the camera"""
-        self.cap = cv2.VideoCapture(self.camera_source)
-        if not self.cap.isOpened():
-            raise ValueError(f"Unable to open camera source {self.camera_source}")
+        # Start a capture thread per camera; only the primary camera is mandatory
+        for camera_id, feed in self.cameras.items():
+            try:
+                feed.open()
+            except ValueError as e:
+                if camera_id == self.primary_camera_id:
+                    raise
+                print(f"Camera {camera_id} unavailable: {e}")
+        self.running = True
+
+        primary = self.cameras[self.primary_camera_id]
+        self.cap = primary.cap
+        self.frame_bus = primary.frame_bus
+        self.capture_worker = primary.capture_worker
+        for detector in self.async_detectors.values():
+            detector.attach(self.frame_bus)
+        self._launch_detector_processes()
+
+        # One batched YOLO pass over every camera instead of one call per camera
+        if self.batch_inference:
+            engine = self.detection_methods["yolo"].engine
+            feeds = [feed for feed in self.cameras.values() if feed.is_open()]
+            self.batch_worker = BatchInferenceWorker(engine, feeds, self._route_batch_results,
+                                                     self.max_batch_size)
+            self.batch_worker.start()
+
+        # Start the recorder as its own frame bus consumer
+        self.recorder.start(self.frame_bus)
+        self.event_store.start()
+        self.segments.start()
+        self.alert_dispatcher.start()
 
         # Start WebSocket server
         self.start_websocket_server()
 
+        # Start the local control socket
+        if self.control_port is not None:
+            self.control_server = ControlSocketServer(self.handle_control_command, port=self.control_port)
+            self.control_server.start()
+
+        if self.metrics_port is not None:
+            self.metrics_server = MetricsHTTPServer(self.render_metrics, port=self.metrics_port)
+            self.metrics_server.start()
+
+        if len(self.cameras) > 1:
+            print(f"Watching {sum(feed.is_open() for feed in self.cameras.values())} cameras"
+                  f"{' with batched inference' if self.batch_inference else ''}.")
         print("Multi-Detection Surveillance System started.")
+        if self.headless:
+            print("Running headless. Control commands: toggle <method>, record [on|off], screenshot,"
+                  " arm [on|off], events, storage, status, shutdown")
+            return self.cap
         print("Press 'q' to quit.")
         print("Press '1-9' to toggle detection methods:")
         print("  1: Motion Detection")
@@ -843,33 +4526,121 @@ class MultiSurveillanceSystem:
 
         return self.cap
 
-    def start_recording(self, frame):
-        """Start recording video"""
-        if self.is_recording:
-            return
-
-        height, width, _ = frame.shape
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_path = os.path.join(self.output_folder, f"recording_{timestamp}.mp4")
+    @property
+    def is_recording(self):
+        """Whether a recording is in progress"""
+        return self.recorder.is_recording
 
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        self.video_writer = cv2.VideoWriter(
-            output_path, fourcc, 20.0, (width, height)
-        )
+    @property
+    def recording_start_time(self):
+        """When the current recording started"""
+        return self.recorder.recording_start_time
 
-        self.is_recording = True
-        self.recording_start_time = time.time()
-        print(f"Started recording: {output_path}")
+    def start_recording(self, frame=None):
+        """Start recording video, including the buffered pre-roll"""
+        if frame is not None and self.recorder.frame_size is None:
+            self.recorder.frame_size = (frame.shape[1], frame.shape[0])
+        self.recorder.start_recording(manual=True)
 
     def stop_recording(self):
         """Stop recording video"""
-        if not self.is_recording:
-            return
+        self.recorder.stop_recording()
 
-        self.video_writer.release()
-        self.is_recording = False
-        duration = time.time() - self.recording_start_time
-        print(f"Recording stopped. Duration: {duration:.2f} seconds")
+    def _route_batch_results(self, packet, detections):
+        """Hand one camera's share of a batched YOLO pass back to that camera"""
+        if packet.camera_id == self.primary_camera_id:
+            # The result is cached for this frame, so the primary detectors only filter and draw
+            for method_name in self.BATCHED_METHODS:
+                if method_name in self.active_methods:
+                    self.async_detectors[method_name].process_packet(packet)
+        else:
+            camera_results = {}
+            for method_name in self.BATCHED_METHODS:
+                if method_name not in self.active_methods:
+                    continue
+                method = self.detection_methods[method_name]
+                camera_results[method_name] = method.filter_detections(detections)
+                if method_name == "person":
+                    # Each camera keeps its own tracks and IDs
+                    camera_results[method_name] = method.track(camera_results[method_name], packet.camera_id)
+            self.camera_detections[packet.camera_id] = camera_results
+
+    def get_camera_detections(self, camera_id=1):
+        """Get the latest detections per active method for one camera"""
+        if camera_id == self.primary_camera_id:
+            return {method_name: self.current_detections[method_name]
+                    for method_name in self.active_methods
+                    if method_name in self.current_detections}
+        return dict(self.camera_detections.get(camera_id, {}))
+
+    def dispatch_detectors(self):
+        """Feed the newest frame to each active detector, gating the expensive ones on motion"""
+        now = time.time()
+        motion_detections = None
+        if self.scheduler is not None or self.roi_inference:
+            # The gate needs motion results even when the motion overlay is switched off
+            motion_detector = self.async_detectors["motion"]
+            if "motion" not in self.active_methods:
+                motion_detector.poll()
+            motion_detections = motion_detector.get_results()
+            if self.scheduler is not None:
+                self.scheduler.update_motion(motion_detections, now)
+
+        rois = self.get_motion_rois(motion_detections) if self.roi_inference else None
+
+        for method_name in self.active_methods:
+            detector = self.async_detectors[method_name]
+            # In batch mode the batch worker feeds the YOLO-based detectors
+            if self.batch_worker and method_name in self.BATCHED_METHODS:
+                continue
+            method_rois = rois if method_name in self.ROI_METHODS else None
+            if method_name == "face":
+                method_rois = self.get_face_rois(method_rois)
+            if self.scheduler is None or method_name not in self.scheduler.gated_methods:
+                detector.poll(method_rois)
+            elif not detector.is_ready():
+                continue
+            elif self.scheduler.should_run(method_name, now):
+                if detector.poll(method_rois):
+                    self.scheduler.mark_dispatched(method_name, now)
+            else:
+                self.scheduler.mark_gated(method_name)
+
+    def get_face_rois(self, rois):
+        """Restrict the face search to the upper half of detected people while the person detector is on"""
+        people = self.current_detections.get("person") if "person" in self.active_methods else None
+        packet = self.frame_bus.latest()
+        if not people or packet is None:
+            return rois
+        # Person boxes may be a few frames old, so pad them
+        upper_bodies = [[x, y, w, max(1, h // 2)] for x, y, w, h in (d["box"] for d in people)]
+        return merge_boxes(upper_bodies, packet.frame.shape, padding=self.roi_padding, min_size=60)
+
+    def get_motion_rois(self, motion_detections):
+        """Merge motion boxes into inference regions, or None to use the full frame"""
+        packet = self.frame_bus.latest()
+        if not motion_detections or packet is None:
+            self.roi_stats['full_frames'] += 1
+            return None
+
+        frame_shape = packet.frame.shape
+        rois = merge_boxes([d["box"] for d in motion_detections], frame_shape,
+                           padding=self.roi_padding, min_size=self.roi_min_size,
+                           max_regions=self.roi_max_regions)
+        coverage = sum(w * h for _, _, w, h in rois) / float(frame_shape[0] * frame_shape[1])
+        if coverage > self.roi_max_coverage:
+            # Cropping a large share of the frame saves nothing
+            self.roi_stats['full_frames'] += 1
+            return None
+
+        self.roi_stats['roi_frames'] += 1
+        self.roi_stats['coverage_sum'] += coverage
+        return rois
+
+    def get_latest_frame(self):
+        """Get the most recent camera frame without touching the capture device"""
+        packet = self.frame_bus.latest()
+        return packet.frame if packet is not None else None
 
     def save_screenshot(self, frame):
         """Save a screenshot of the current frame"""
@@ -877,6 +4648,8 @@ class MultiSurveillanceSystem:
         output_path = os.path.join(self.output_folder, f"screenshot_{timestamp}.jpg")
         cv2.imwrite(output_path, frame)
         print(f"Screenshot saved: {output_path}")
+        self.event_store.link_screenshot(output_path)
+        return output_path
 
     def toggle_detection_method(self, method_key):
         """Toggle a detection method on/off"""
@@ -886,114 +4659,183 @@ class MultiSurveillanceSystem:
                 print(f"Disabled: {self.detection_methods[method_key].name}")
             else:
                 self.active_methods.append(method_key)
+                # Frames published while the method was off were never meant for it
+                subscription = self.async_detectors[method_key].subscription
+                if subscription is not None:
+                    subscription.seek_latest()
                 print(f"Enabled: {self.detection_methods[method_key].name}")
 
-    def combine_detections(self, frame, annotated_frames):
-        """Combine multiple annotated frames into a single display frame"""
-        combined_frame = frame.copy()
+    def handle_control_command(self, command):
+        """
+        Apply a control command from the keyboard, websocket or control socket
 
-        for method_name in self.active_methods:
-            if method_name in self.current_detections:
-                detections, annotated_frame = self.current_detections[method_name]
-                diff = cv2.absdiff(annotated_frame, frame)
-                mask = cv2.cvtColor(diff, cv2.COLOR_BGR2GRAY)
-                _, mask = cv2.threshold(mask, 20, 255, cv2.THRESH_BINARY)
-                masked_annotations = cv2.bitwise_and(annotated_frame, annotated_frame, mask=mask)
-                combined_frame = cv2.add(combined_frame, masked_annotations)
+        Args:
+            command: Dict with a 'command' key (toggle, record, screenshot, arm,
+                     events, storage, status or shutdown) plus 'method' or 'value' where needed;
+                     events takes optional 'since' (seconds ago), 'class', 'camera' and 'limit'
 
-        return combined_frame
+        Returns:
+            result: Dict with 'ok' plus either the new state or an 'error'
+        """
+        if not isinstance(command, dict):
+            return {'ok': False, 'error': "Command must be a JSON object"}
+        try:
+            return self._apply_control_command(command)
+        except Exception as e:
+            return {'ok': False, 'error': f"{type(e).__name__}: {e}"}
 
-    def add_status_overlay(self, frame):
-        """Add stylish status information overlay to the frame"""
-        overlay_frame = frame.copy()
-        height, width, _ = frame.shape
+    def _apply_control_command(self, command):
+        """Apply a command dict; see handle_control_command"""
+        action = str(command.get('command', '')).lower()
+        value = command.get('value')
+        if isinstance(value, str):
+            value = value.lower() in ('1', 'true', 'on', 'yes', 'start')
 
-        overlay = overlay_frame.copy()
-        cv2.rectangle(overlay, (0, 0), (width, 60), (30, 30, 30), -1)
-        cv2.addWeighted(overlay, 0.7, overlay_frame, 0.3, 0, overlay_frame)
+        if action == 'toggle':
+            method_key = command.get('method')
+            if method_key not in self.detection_methods:
+                return {'ok': False, 'error': f"Unknown detection method: {method_key}"}
+            self.toggle_detection_method(method_key)
+        elif action == 'record':
+            start = not self.is_recording if value is None else value
+            if start and not self.is_recording:
+                frame = self.get_latest_frame()
+                if frame is None:
+                    return {'ok': False, 'error': "No frame available to record"}
+                self.start_recording(frame)
+            elif not start and self.is_recording:
+                self.stop_recording()
+        elif action == 'screenshot':
+            frame = self.get_latest_frame()
+            if frame is None:
+                return {'ok': False, 'error': "No frame available for a screenshot"}
+            return {'ok': True, 'path': self.save_screenshot(self.render_frame(frame))}
+        elif action == 'arm':
+            self.armed = (not self.armed) if value is None else bool(value)
+        elif action == 'storage':
+            return {'ok': True, **self.segments.get_storage_report()}
+        elif action == 'events':
+            try:
+                since = float(command.get('since', 86400))
+                camera_id = int(command['camera']) if command.get('camera') is not None else None
+                limit = int(command.get('limit', 50))
+            except (TypeError, ValueError):
+                return {'ok': False, 'error': "since, camera and limit must be numbers"}
+            start = time.time() - since
+            return {'ok': True,
+                    'counts': self.event_store.count_by_class(start=start, camera_id=camera_id),
+                    'events': self.event_store.query(start=start, class_name=command.get('class'),
+                                                     camera_id=camera_id, limit=limit)}
+        elif action in ('shutdown', 'quit'):
+            self.stop()
+        elif action != 'status':
+            return {'ok': False, 'error': f"Unknown command: {action}"}
 
-        title_text = "MULTI-DETECTION SURVEILLANCE"
-        title_size = cv2.getTextSize(title_text, cv2.FONT_HERSHEY_TRIPLEX, 0.7, 2)[0]
-        title_x = (width - title_size[0]) // 2
+        return {
+            'ok': True,
+            'armed': self.armed,
+            'recording': self.is_recording,
+            'active_methods': list(self.active_methods),
+            'running': self.running,
+            'frame_latency': self.frame_latency.summary(),
+            'alerts': self.alert_dispatcher.get_stats(),
+        }
 
-        cv2.putText(
-            overlay_frame,
-            title_text,
-            (title_x + 2, 22),
-            cv2.FONT_HERSHEY_TRIPLEX,
-            0.7,
-            (0, 0, 0),
-            2,
-        )
-        cv2.putText(
-            overlay_frame,
-            title_text,
-            (title_x, 20),
-            cv2.FONT_HERSHEY_TRIPLEX,
-            0.7,
-            (255, 255, 255),
-            2,
-        )
+    def stop(self):
+        """Ask the surveillance loop to exit; it cleans up on its own thread"""
+        self.running = False
 
-        x_offset = 10
-        for i, method_name in enumerate(self.active_methods):
-            if method_name in self.current_detections:
-                detections, _ = self.current_detections[method_name]
-                method = self.detection_methods[method_name]
-                status_text = method.get_status_text(detections)
+    def _select_process_methods(self, detector_processes):
+        """Work out which detectors run in worker processes"""
+        if not detector_processes:
+            return []
+        requested = self.PROCESS_METHODS if detector_processes is True else detector_processes
+        selected = []
+        for name in requested:
+            if name not in self.PROCESS_METHODS:
+                print(f"{name} can't run in a worker process; keeping it in-process")
+            elif self.batch_inference and name in self.BATCHED_METHODS:
+                # These only filter the batch worker's cached pass; a worker would infer again
+                print(f"{name} uses the batched YOLO pass; keeping it in-process")
+            else:
+                selected.append(name)
+        return selected
+
+    def _create_detector_workers(self):
+        """Map each worker-process method to its DetectorProcess"""
+        workers = {}
+        by_model = {}
+        for name in self.process_methods:
+            method_class, kwargs = self.method_specs[name]
+            # Methods on the same weights share a worker, and so one engine and one inference per frame
+            group = kwargs.get("model_path", name)
+            worker = by_model.get(group)
+            if worker is None:
+                worker = by_model[group] = DetectorProcess(f"detector-{name}")
+            else:
+                worker.name += f"-{name}"
+            worker.method_specs[name] = (method_class, kwargs)
+            workers[name] = worker
+        return workers
 
-                indicator_color = method.color
-                cv2.rectangle(overlay_frame, (x_offset, 35), (x_offset + 10, 45), indicator_color, -1)
-                cv2.rectangle(overlay_frame, (x_offset, 35), (x_offset + 10, 45), (255, 255, 255), 1)
+    def _launch_detector_processes(self):
+        """Start the detector worker processes in parallel, so model loading overlaps"""
+        def launch(worker):
+            try:
+                worker.launch()
+            except Exception as e:
+                print(f"{worker.name} failed to start: {e}")
 
-                cv2.putText(
-                    overlay_frame,
-                    status_text,
-                    (x_offset + 15, 44),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.5,
-                    (0, 0, 0),
-                    2,
-                )
-                cv2.putText(
-                    overlay_frame,
-                    status_text,
-                    (x_offset + 14, 43),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.5,
-                    method.color,
-                    1,
-                )
+        for worker in {id(worker): worker for worker in self.detector_workers.values()}.values():
+            threading.Thread(target=launch, args=(worker,), daemon=True).start()
 
-                text_width = cv2.getTextSize(status_text, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)[0][0]
-                x_offset += text_width + 35
+    def get_detector_stats(self):
+        """Get worker statistics for every detection method that has processed frames"""
+        return {name: detector.get_stats()
+                for name, detector in self.async_detectors.items()
+                if detector.frames_submitted > 0}
 
-        if self.is_recording:
-            current_time = time.time()
-            if int(current_time * 2) % 2 == 0:
-                cv2.circle(overlay_frame, (width - 30, 20), 10, (0, 0, 255), -1)
-                cv2.circle(overlay_frame, (width - 30, 20), 10, (255, 255, 255), 1)
-                cv2.putText(
-                    overlay_frame,
-                    "REC",
-                    (width - 70, 25),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.6,
-                    (255, 255, 255),
-                    2,
-                )
+    def render_detections(self, frame):
+        """Draw every active method's overlays onto a single copy of the frame"""
+        rendered_frame = frame.copy()
 
-                rec_time = time.time() - self.recording_start_time
-                time_text = f"{int(rec_time // 60):02d}:{int(rec_time % 60):02d}"
-                cv2.putText(
-                    overlay_frame,
-                    time_text,
-                    (width - 70, 45),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.5,
-                    (255, 255, 255),
-                    1,
-                )
+        for method_name in self.active_methods:
+            detections = self.current_detections.get(method_name)
+            if detections:
+                self.detection_methods[method_name].draw(rendered_frame, detections)
+
+        return rendered_frame
+
+    def render_frame(self, frame):
+        """Render detections and the status overlay for display or screenshots"""
+        start = self.metrics.start()
+        rendered_frame = self.render_detections(frame)
+        self.metrics.observe('combine', start)
+
+        # render_detections already returns a private copy
+        start = self.metrics.start()
+        rendered_frame = self.add_status_overlay(rendered_frame, in_place=True)
+        self.metrics.observe('overlay', start)
+        return rendered_frame
+
+    def add_status_overlay(self, frame, in_place=False):
+        """Add stylish status information overlay to the frame"""
+        overlay_frame = frame if in_place else frame.copy()
+        height = overlay_frame.shape[0]
+
+        statuses = []
+        for method_name in self.active_methods:
+            if method_name in self.current_detections:
+                method = self.detection_methods[method_name]
+                statuses.append((method.get_status_text(self.current_detections[method_name]), method.color))
+
+        # The REC badge blinks twice a second
+        recording_text = None
+        if self.is_recording and int(time.time() * 2) % 2 == 0:
+            rec_time = time.time() - self.recording_start_time
+            recording_text = f"{int(rec_time // 60):02d}:{int(rec_time % 60):02d}"
+
+        self.overlay_compositor.compose(overlay_frame, statuses, recording_text)
 
         current_datetime = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         cv2.putText(
@@ -1008,76 +4850,89 @@ class MultiSurveillanceSystem:
 
         return overlay_frame
 
-    def run(self):
+    def update_detections(self, frame):
+        """Feed the detectors, collect their latest results and trigger alerts and recording"""
+        self.dispatch_detectors()
+        for method_name in self.active_methods:
+            detector = self.async_detectors[method_name]
+            if detector.get_results() is not None:
+                self.current_detections[method_name] = detector.get_results()
+                detections = self.current_detections[method_name]
+                if detections and self.armed:
+                    status_text = self.detection_methods[method_name].get_status_text(detections)
+                    self.alert_dispatcher.submit(method_name, f"Detection alert: {status_text}")
+
+        self.publish_detection_events(frame.shape)
+
+        triggered = [method for method in self.active_methods if self.current_detections.get(method)]
+        if triggered and self.armed:
+            # Starts an event recording, or keeps the current one from timing out; the
+            # methods set how long the recording is kept
+            self.recorder.trigger(triggered)
+
+    def _install_signal_handlers(self):
+        """Stop cleanly on SIGINT/SIGTERM (only possible from the main thread)"""
+        if threading.current_thread() is not threading.main_thread():
+            return
+
+        def handle_signal(signum, _frame):
+            print(f"Received signal {signum}, shutting down")
+            self.stop()
+
+        signal.signal(signal.SIGINT, handle_signal)
+        if hasattr(signal, "SIGTERM"):
+            signal.signal(signal.SIGTERM, handle_signal)
+
+    def run(self, headless=None):
         """Run the multi-detection surveillance system"""
+        if headless is not None:
+            self.headless = headless
         if self.cap is None:
             self.start()
+        if self.headless:
+            self._install_signal_handlers()
 
+        subscription = self.frame_bus.subscribe("display")
         try:
             while self.running:
-                ret, frame = self.cap.read()
-                if not ret:
-                    print("Failed to read frame")
-                    break
+                packet = subscription.get(timeout=1.0)
+                if packet is None:
+                    if self.frame_bus.closed:
+                        break
+                    continue
+                if not packet.retain():
+                    continue
+                frame = packet.frame
+                loop_start = time.perf_counter()
+
+                try:
+                    start = self.metrics.start()
+                    self.update_detections(frame)
+                    self.metrics.observe('detect', start)
 
-                frame = cv2.resize(frame, (1100, 600))
-                for method_name in self.active_methods:
-                    detector = self.async_detectors[method_name]
-                    if detector.is_ready():
-                        detector.process_frame(frame)
-
-                    if detector.get_results() is not None:
-                        self.current_detections[method_name] = detector.get_results()
-                        detections, _ = self.current_detections[method_name]
-                        if detections and self.speak_callback:
-                            status_text = self.detection_methods[method_name].get_status_text(detections)
-                            self.speak_callback(f"Detection alert: {status_text}")
-
-                frame = cv2.resize(frame, (1100, 600))  # Resize for consistency
-                for method_name in self.active_methods:
-                    detector = self.async_detectors[method_name]
-                    if detector.is_ready():
-                        detector.process_frame(frame)
-
-                    if detector.get_results() is not None:
-                        self.current_detections[method_name] = detector.get_results()
-
-                annotated_frames = {method: self.current_detections.get(method, ([], frame))[1]
-                                   for method in self.active_methods}
-                display_frame = self.combine_detections(frame, annotated_frames)
-                display_frame = self.add_status_overlay(display_frame)
-
-                any_detections = any(len(self.current_detections.get(method, ([], None))[0]) > 0
-                                    for method in self.active_methods)
-                if any_detections and not self.is_recording:
-                    self.start_recording(frame)
-
-                if self.is_recording:
-                    self.video_writer.write(frame)
+                    # Pixels are only drawn here, where the display needs them; headless
+                    # mode only renders overlays for screenshots or streams
+                    display_frame = None if self.headless else self.render_frame(frame)
+                finally:
+                    packet.release()
+                if self.headless:
+                    self.frame_latency.add(time.perf_counter() - loop_start)
+                    continue
 
+                start = self.metrics.start()
                 cv2.imshow("Multi-Detection Surveillance System", display_frame)
+                self.window_open = True
 
                 key = cv2.waitKey(1) & 0xFF
+                self.metrics.observe('display', start)
+                self.frame_latency.add(time.perf_counter() - loop_start)
                 if key == ord('q'):
                     self.running = False
                     break
-                elif key == ord('r'):
-                    if self.is_recording:
-                        self.stop_recording()
-                    else:
-                        self.start_recording(frame)
                 elif key == ord('s'):
                     self.save_screenshot(display_frame)
-                elif key == ord('1'):
-                    self.toggle_detection_method("motion")
-                elif key == ord('2'):
-                    self.toggle_detection_method("yolo")
-                elif key == ord('3'):
-                    self.toggle_detection_method("person")
-                elif key == ord('4'):
-                    self.toggle_detection_method("face")
-                elif key == ord('5'):
-                    self.toggle_detection_method("noise")
+                elif key in self.KEY_COMMANDS:
+                    self.handle_control_command(self.KEY_COMMANDS[key])
 
         finally:
             self.cleanup()
@@ -1085,11 +4940,32 @@ class MultiSurveillanceSystem:
     def cleanup(self):
         """Clean up resources"""
         self.running = False
-        if self.is_recording:
-            self.stop_recording()
-        if self.cap is not None:
-            self.cap.release()
-        cv2.destroyAllWindows()
+        if self.batch_worker is not None:
+            self.batch_worker.stop()
+            self.batch_worker = None
+        for feed in self.cameras.values():
+            feed.close()
+        self.capture_worker = None
+        self.frame_bus.close()
+        for name, detector in self.async_detectors.items():
+            # A broken detector worker must not keep the recorder and event store from flushing
+            try:
+                detector.stop()
+            except Exception as e:
+                print(f"Error stopping {name} detector: {e}")
+        self.recorder.stop()
+        self.segments.stop()
+        self.event_store.stop()
+        self.alert_dispatcher.stop()
+        if self.control_server is not None:
+            self.control_server.stop()
+            self.control_server = None
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+            self.metrics_server = None
+        if self.window_open:
+            cv2.destroyAllWindows()
+            self.window_open = False
         self.stop_websocket_server()
 
     def __del__(self):
@@ -1098,8 +4974,58 @@ class MultiSurveillanceSystem:
 
 def main():
     """Main function to run the multi-detection surveillance system"""
+    parser = argparse.ArgumentParser(description="Multi-detection surveillance system")
+    parser.add_argument('--camera', action='append', default=None,
+                        help='Camera index, /dev/video path, RTSP URL, video file or image directory (repeat for multiple cameras)')
+    parser.add_argument('--headless', action='store_true', help='Run without a display window')
+    parser.add_argument('--control-port', type=int, default=None,
+                        help='Local TCP port for control commands (default 8766 when headless)')
+    parser.add_argument('--output', default="multi_surveillance", help='Folder for recordings and screenshots')
+    parser.add_argument('--display-size', default="1100x600",
+                        help='Display/stream frame size as WIDTHxHEIGHT, or "native" for the capture size')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='Serve Prometheus metrics on this local port (enables stage timing)')
+    parser.add_argument('--inference-size', type=int, default=640,
+                        help='Square letterboxed YOLO input size (0 to run YOLO on the display frame)')
+    parser.add_argument('--frame-pool-slots', type=int, default=0,
+                        help='Publish frames from this many shared-memory buffers per output (0 disables)')
+    parser.add_argument('--rtsp-transport', choices=['tcp', 'udp'], default='tcp',
+                        help='RTSP transport for network cameras')
+    parser.add_argument('--loop-video', action='store_true',
+                        help='Replay video files and image directories in a loop')
+    parser.add_argument('--segment-seconds', type=float, default=60.0, help='Length of each recording file')
+    parser.add_argument('--max-storage-gb', type=float, default=20.0,
+                        help='Disk budget for recordings; the lowest-priority, oldest segments go first (0 disables)')
+    parser.add_argument('--max-age-days', type=float, default=30.0, help='Delete recordings older than this (0 keeps them)')
+    parser.add_argument('--detector-processes', nargs='?', const='all', default=None,
+                        help='Run detectors in worker processes: "all" or comma separated method names')
+    args = parser.parse_args()
+
+    detector_processes = None
+    if args.detector_processes:
+        detector_processes = True if args.detector_processes == 'all' else \
+            [name.strip() for name in args.detector_processes.split(',') if name.strip()]
+
+    display_size = None
+    if args.display_size != "native":
+        display_size = tuple(int(v) for v in args.display_size.lower().split('x'))
+
+    sources = [int(source) if source.isdigit() else source for source in (args.camera or ["0"])]
+    control_port = args.control_port
+    if control_port is None and args.headless:
+        control_port = 8766
+
     try:
-        surveillance = MultiSurveillanceSystem(camera_source=0)
+        surveillance = MultiSurveillanceSystem(camera_source=sources, output_folder=args.output,
+                                               headless=args.headless, control_port=control_port,
+                                               display_size=display_size, inference_size=args.inference_size,
+                                               metrics_port=args.metrics_port,
+                                               capture_options={'transport': args.rtsp_transport,
+                                                                'loop': args.loop_video},
+                                               frame_pool_slots=args.frame_pool_slots,
+                                               detector_processes=detector_processes,
+                                               segment_seconds=args.segment_seconds,
+                                               max_storage_gb=args.max_storage_gb, max_age_days=args.max_age_days)
         surveillance.run()
     except Exception as e:
         print(f"Error running surveillance system: {e}")